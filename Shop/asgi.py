@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Shop.settings')
+# Serve the async catalog and cart views (main/async_views.py)
+os.environ.setdefault('SHOP_URLCONF', 'Shop.urls_async')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Static and media files are answered before Django (main/fileserver.py)
+from main.fileserver import ServeFilesASGI  # noqa: E402
+
+application = ServeFilesASGI(django_application)
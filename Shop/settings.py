@@ -44,8 +44,10 @@ INSTALLED_APPS = [
     ]
 
 MIDDLEWARE = [
+    'main.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'main.middleware.ThrottleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -53,7 +55,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'Shop.urls'
+# Shop/asgi.py switches to Shop.urls_async (async catalog and cart views)
+ROOT_URLCONF = os.environ.get('SHOP_URLCONF', 'Shop.urls')
 
 TEMPLATES = [
     {
@@ -76,12 +79,117 @@ WSGI_APPLICATION = 'Shop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Applied to every new SQLite connection (see main/db.py)
+SQLITE_PRAGMAS = {
+    # Readers don't block the writer and vice versa
+    'journal_mode': 'WAL',
+    # fsync at checkpoints only; with WAL a crash can't corrupt the file
+    'synchronous': 'NORMAL',
+    # Concurrent checkouts queue for the write lock instead of failing
+    # with "database is locked"
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative: KiB, so 64 MB of page cache per connection
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_INIT_COMMAND = ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items())
+# Seconds a connection is reused across requests (0 closes it after each
+# request). Under ASGI connections are per-request regardless.
+CONN_MAX_AGE = int(os.environ.get('SHOP_CONN_MAX_AGE', 600))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock up front so concurrent checkouts queue on
+            # busy_timeout instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_INIT_COMMAND,
+        },
+    },
+    # Same file, read-only; catalog and report views read from it
+    # (main.db.ReadOnlyRouter)
+    'readonly': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND + ';PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['main.db.ReadOnlyRouter']
+
+# Cache
+# Catalog pages and fragments are cached here (see main/cache.py).
+# SHOP_CACHE selects the backend: 'locmem' (per process, default),
+# 'file' (shared by processes on one host) or 'redis' (shared by hosts).
+SHOP_CACHE = os.environ.get('SHOP_CACHE', 'locmem')
+if SHOP_CACHE == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('SHOP_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif SHOP_CACHE == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'shop',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
     }
+
+# Sessions: pre-login state (OTP) in the cache only, logged-in sessions
+# written through to the database (userapp/sessions.py). Prune expired
+# rows with `manage.py reap_sessions`.
+SESSION_ENGINE = 'userapp.sessions'
+
+# Request throttling (main/throttle.py): URL name -> (key, limit, window
+# seconds) rules, applied to POSTs before the view runs. Counters live in
+# THROTTLE_CACHE, so with several processes use a shared SHOP_CACHE.
+THROTTLE_CACHE = 'default'
+# Header carrying the client address when behind a trusted proxy, e.g.
+# 'HTTP_X_REAL_IP'; REMOTE_ADDR is used when unset
+THROTTLE_IP_HEADER = os.environ.get('SHOP_THROTTLE_IP_HEADER') or None
+THROTTLE_RULES = {
+    'login': [('ip', 20, 60), ('account', 10, 15 * 60)],
+    'verify_otp': [('ip', 30, 60), ('account', 5, 10 * 60)],
+    'add_to_cart': [('ip', 120, 60), ('account', 60, 60)],
+    'api_cart_add': [('ip', 120, 60), ('account', 60, 60)],
+    'api_cart_set': [('ip', 120, 60), ('account', 60, 60)],
+    'api_cart_batch': [('ip', 120, 60), ('account', 60, 60)],
 }
+
+# Minutes a cart line holds its stock (main.services.reserve_stock);
+# expired holds are deleted by `manage.py release_expired_reservations`
+STOCK_RESERVATION_MINUTES = 15
+
+# Addresses emailed (through the outbound mail queue) when products drop
+# below their reorder threshold (main/inventory.py); empty logs only
+INVENTORY_ALERT_EMAILS = [
+    address for address in os.environ.get('SHOP_INVENTORY_ALERT_EMAILS', '').split(',') if address
+]
+
+# Product search (main/search.py): 'fts5' (SQLite full-text table),
+# 'memory' (in-process inverted index) or 'auto' (fts5 when available)
+PRODUCT_SEARCH_BACKEND = os.environ.get('PRODUCT_SEARCH_BACKEND', 'auto')
+
 #email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -97,6 +205,49 @@ SERVER_EMAIL = EMAIL_HOST_USER
 EMAIL_TIMEOUT = 10
 
 
+# Performance instrumentation (main.middleware.PerformanceMiddleware)
+# One JSON line per request; summarise with `manage.py perf_report`
+PERF_LOG_FILE = BASE_DIR / 'perf.log'
+# tracemalloc-based peak memory per request; adds noticeable overhead
+PERF_TRACE_MEMORY = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'raw': {'format': '%(message)s'},
+        'alert': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'alert',
+        },
+        'perf_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': PERF_LOG_FILE,
+            'maxBytes': 20 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'raw',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'shop.perf': {
+            'handlers': ['perf_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # Low-stock alerts (main.signals); also mailed to INVENTORY_ALERT_EMAILS
+        'shop.inventory': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -136,6 +287,16 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
     
 ]
+# collectstatic output: hashed names plus .gz/.br siblings (main/storage.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'main.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 MEDIA_URL= '/media/'
 MEDIA_ROOT= os.path.join(BASE_DIR, 'media') 
 
@@ -0,0 +1,10 @@
+"""
+URL configuration used by Shop/asgi.py: the same routes as Shop/urls.py,
+with the catalog and cart views served by main.async_views.
+"""
+
+from main import async_views
+
+from .urls import build_urlpatterns
+
+urlpatterns = build_urlpatterns(async_views)
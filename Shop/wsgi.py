@@ -13,4 +13,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Shop.settings')
 
-application = get_wsgi_application()
+django_application = get_wsgi_application()
+
+# Static and media files are answered before Django (main/fileserver.py)
+from main.fileserver import ServeFilesWSGI  # noqa: E402
+
+application = ServeFilesWSGI(django_application)
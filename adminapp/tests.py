@@ -1,3 +1,151 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from main.inventory import stock_changed
+from main.models import Category, Order, OrderItem, Product
+from main.rollups import rebuild_customer_stats
+from main.testing import QueryBudgetTestCase, make_shopper, seed_shop
+
+
+class AdminPanelQueryBudgetTests(QueryBudgetTestCase):
+    query_budgets = {
+        'admin_dashboard': 7,
+        'admin_users': 4,
+        'admin_products': 4,
+        # POST: includes the search index write and the transaction's savepoint
+        'admin_add_product': 7,
+        'admin_orders': 5,
+        # POST: previous status lookup plus two sales rollup upserts
+        'update_order_status': 7,
+        'admin_reports': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_shop()
+        Product.objects.filter(id__in=Product.objects.values('id')[:20]).update(stock=2)
+        stock_changed(Product.objects.all())
+        cls.staff = make_shopper('staff@example.com', is_staff=True)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def test_read_pages(self):
+        response = self.request_within_budget('admin_dashboard', reverse('admin_dashboard'))
+        self.assertEqual(len(response.context['low_stock_products']), 10)
+        for name in ('admin_dashboard', 'admin_users', 'admin_products',
+                     'admin_add_product', 'admin_orders', 'admin_reports'):
+            response = self.request_within_budget(name, reverse(name))
+            self.assertEqual(response.status_code, 200)
+
+    def test_filters_and_search(self):
+        self.request_within_budget('admin_users', reverse('admin_users') + '?search=customer1')
+        self.request_within_budget('admin_products', reverse('admin_products') + '?search=boots')
+        self.request_within_budget('admin_orders', reverse('admin_orders') + '?status=shipped')
+        response = self.request_within_budget('admin_reports', reverse('admin_reports') + '?days=365')
+        self.assertEqual(len(json.loads(response.context['daily_orders'])), 365)
+        self.assertEqual(sum(json.loads(response.context['daily_orders'])), Order.objects.count())
+
+    def test_add_product(self):
+        category = Category.objects.first()
+        response = self.request_within_budget('admin_add_product', reverse('admin_add_product'), method='post', data={
+            'name': 'Trail Runner', 'category': category.id, 'price': '4999.00',
+            'description': 'Grippy', 'stock': 12,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Product.objects.filter(name='Trail Runner').exists())
+
+    def test_add_product_rejects_non_image_upload(self):
+        category = Category.objects.first()
+        upload = SimpleUploadedFile('shoe.png', b'not an image', content_type='image/png')
+        response = self.client.post(reverse('admin_add_product'), {
+            'name': 'Broken Upload', 'category': category.id, 'price': '4999.00',
+            'description': 'Grippy', 'stock': 12, 'image': upload,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Upload a valid image', response.context['error'])
+        self.assertFalse(Product.objects.filter(name='Broken Upload').exists())
+
+    def test_update_order_status(self):
+        order = Order.objects.filter(status='pending').first()
+        self.request_within_budget('update_order_status', reverse('update_order_status', args=[order.id]),
+                                   method='post', data={'status': 'shipped'})
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'shipped')
+
+    def test_orders_paginate_with_filters(self):
+        week_ago = timezone.now() - timedelta(days=7)
+        Order.objects.filter(id__in=Order.objects.values('id')[:300]).update(created_at=week_ago)
+        params = {'status': 'shipped', 'from': (timezone.localdate() - timedelta(days=1)).isoformat()}
+        expected = list(
+            Order.objects.filter(status='shipped', created_at__gte=week_ago + timedelta(days=2))
+            .order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        seen = []
+        url = reverse('admin_orders')
+        cursor = {}
+        while True:
+            response = self.request_within_budget('admin_orders', url + '?' + '&'.join(
+                f'{k}={v}' for k, v in dict(params, **cursor).items()))
+            page = response.context['orders']
+            self.assertLessEqual(len(page), 50)
+            seen.extend(order.id for order in page)
+            if not page.has_next:
+                break
+            cursor = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+        self.assertEqual(page.total, len(expected))
+
+    def test_customer_directory_pages_and_searches(self):
+        # Seeded orders are free; give them totals and rebuild the stats
+        Order.objects.update(total_price=F('id'))
+        rebuild_customer_stats()
+        url = reverse('admin_users')
+        response = self.request_within_budget('admin_users', url + '?sort=spend')
+        spend = [customer.lifetime_spend for customer in response.context['customers']]
+        self.assertEqual(len(spend), 50)
+        self.assertEqual(spend, sorted(spend, reverse=True))
+        top = Order.objects.exclude(status='cancelled').values('user').annotate(
+            total=Sum('total_price')).order_by('-total').first()
+        self.assertEqual(spend[0], top['total'])
+
+        seen = []
+        cursor = ''
+        while True:
+            response = self.request_within_budget('admin_users', f'{url}?search=Customer1{cursor}')
+            page = response.context['customers']
+            seen.extend(customer.username for customer in page)
+            if not page.has_next:
+                break
+            cursor = f'&after={page.next_cursor}'
+        self.assertEqual(seen, sorted(f'customer{i}@example.com' for i in range(500)
+                                      if str(i).startswith('1')))
+
+    def test_export_streams_orders_with_items(self):
+        url = reverse('admin_orders_export')
+        response = self.client.get(url, {'status': 'pending', 'format': 'csv'})
+        self.assertTrue(response.streaming)
+        # Rows are read while streaming: one orders query plus one items
+        # prefetch per chunk of EXPORT_CHUNK_SIZE orders
+        with self.assertNumQueries(2):
+            body = b''.join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(body)))
+        pending = Order.objects.filter(status='pending')
+        self.assertEqual(rows[0][0], 'order_id')
+        self.assertEqual(len(rows) - 1, OrderItem.objects.filter(order__in=pending).count())
+        self.assertEqual({int(row[0]) for row in rows[1:]}, set(pending.values_list('id', flat=True)))
+
+        response = self.client.get(url, {'format': 'jsonl'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), Order.objects.count())
+        first = json.loads(lines[0])
+        self.assertEqual(first['id'], Order.objects.order_by('-created_at', '-id').first().id)
+        self.assertEqual(len(first['items']), 3)
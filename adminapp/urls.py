@@ -14,6 +14,7 @@ urlpatterns = [
     
     # Orders
     path('orders/', views.admin_orders, name='admin_orders'),
+    path('orders/export/', views.admin_orders_export, name='admin_orders_export'),
     path('orders/<int:order_id>/update-status/', views.update_order_status, name='update_order_status'),
     
     # Reports
@@ -1,12 +1,24 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.views.decorators.http import require_POST
-from main.models import Product, Category, Order, OrderItem, Cart
+from main.db import read_only_view
+from main.inventory import low_stock_products
+from main.models import Product, Category, Order, OrderItem, Cart, CustomerStats
+from main.pagination import InvalidCursor, KeysetPage
+from main.rollups import daily_orders, sales_totals, status_counts, top_products
+from main.search import search_products
 from userapp.models import UserProfile
+import csv
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from urllib.parse import urlencode
 
 # Admin authentication decorator
 def admin_required(view_func):
@@ -19,21 +31,29 @@ def admin_required(view_func):
     return wrapper
 
 # ============ PHASE 1: ADMIN DASHBOARD ============
+LOW_STOCK_PER_PAGE = 10
+
 @admin_required
+@read_only_view
 def admin_dashboard(request):
     """Admin dashboard with key statistics"""
     
     # Calculate stats
     total_users = User.objects.count()
     total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    total_revenue = Order.objects.aggregate(Sum('total_price'))['total_price__sum'] or 0
+    total_orders, total_revenue = sales_totals()
     
     # Recent orders (last 5)
     recent_orders = Order.objects.select_related('user').order_by('-created_at')[:5]
     
-    # Low stock products
-    low_stock_products = Product.objects.filter(stock__lt=5)
+    # Low stock products, flagged by main.inventory, a page at a time
+    low_stock = low_stock_products().select_related('category')
+    ordering = ('stock', 'id')
+    try:
+        low_stock_page = KeysetPage(low_stock, ordering, after=request.GET.get('low_after'),
+                                    before=request.GET.get('low_before'), per_page=LOW_STOCK_PER_PAGE)
+    except InvalidCursor:
+        low_stock_page = KeysetPage(low_stock, ordering, per_page=LOW_STOCK_PER_PAGE)
     
     context = {
         'total_users': total_users,
@@ -41,26 +61,60 @@ def admin_dashboard(request):
         'total_orders': total_orders,
         'total_revenue': total_revenue,
         'recent_orders': recent_orders,
-        'low_stock_products': low_stock_products,
+        'low_stock_products': low_stock_page,
     }
     
     return render(request, 'adminapp/dashboard.html', context)
 
 # ============ PHASE 2: VIEW USERS ============
+CUSTOMERS_PER_PAGE = 50
+# Sort choices, each served by an index on CustomerStats
+CUSTOMER_SORTS = {
+    'newest': ('-user_id',),
+    'spend': ('-lifetime_spend', '-user_id'),
+    'orders': ('-order_count', '-user_id'),
+}
+
+def _prefix(field, text):
+    """Values of ``field`` starting with ``text``, as an index range"""
+    return Q(**{f'{field}__gte': text, f'{field}__lt': text + '\U0010ffff'})
+
 @admin_required
+@read_only_view
 def admin_users(request):
-    """View all users with details"""
+    """Customer directory with order stats, one page at a time.
+
+    Reads CustomerStats, so order counts and spend come precomputed and
+    search is a prefix match on the lowercased username or email.
+    """
     
-    users = User.objects.select_related('profile').all().order_by('-date_joined')
+    customers = CustomerStats.objects.select_related('user', 'user__profile')
+    filters = {}
     
-    # Search functionality
-    search_query = request.GET.get('search', '')
+    search_query = request.GET.get('search', '').strip()
+    sort = request.GET.get('sort', '')
+    if sort not in CUSTOMER_SORTS:
+        sort = 'newest'
     if search_query:
-        users = users.filter(username__icontains=search_query) | users.filter(email__icontains=search_query)
+        prefix = search_query.lower()
+        customers = customers.filter(_prefix('username', prefix) | _prefix('email', prefix))
+        filters['search'] = search_query
+        ordering = ('username', 'user_id')
+    else:
+        ordering = CUSTOMER_SORTS[sort]
+        filters['sort'] = sort
+    
+    try:
+        page = KeysetPage(customers, ordering, after=request.GET.get('after'),
+                          before=request.GET.get('before'), per_page=CUSTOMERS_PER_PAGE)
+    except InvalidCursor:
+        page = KeysetPage(customers, ordering, per_page=CUSTOMERS_PER_PAGE)
     
     context = {
-        'users': users,
+        'customers': page,
         'search_query': search_query,
+        'sort': sort,
+        'filter_query': urlencode(filters),
     }
     
     return render(request, 'adminapp/users.html', context)
@@ -78,24 +132,32 @@ def admin_add_product(request):
         price = request.POST.get('price')
         description = request.POST.get('description')
         stock = request.POST.get('stock')
+        reorder_threshold = request.POST.get('reorder_threshold') or 5
         image = request.FILES.get('image')
         
         try:
+            if image:
+                # Reject files Pillow can't read before anything is saved
+                forms.ImageField().clean(image)
             category = Category.objects.get(id=category_id)
-            product = Product.objects.create(
-                name=name,
-                category=category,
-                price=price,
-                description=description,
-                stock=stock,
-                image=image,
-                is_active=True
-            )
+            # A failure in a post_save receiver rolls the product back too,
+            # so resubmitting the form can't leave a duplicate
+            with transaction.atomic():
+                product = Product.objects.create(
+                    name=name,
+                    category=category,
+                    price=price,
+                    description=description,
+                    stock=stock,
+                    reorder_threshold=reorder_threshold,
+                    image=image,
+                    is_active=True
+                )
             return redirect('admin_products')
         except Exception as e:
             context = {
                 'categories': categories,
-                'error': str(e),
+                'error': ' '.join(e.messages) if isinstance(e, ValidationError) else str(e),
             }
             return render(request, 'adminapp/add_product.html', context)
     
@@ -106,16 +168,18 @@ def admin_add_product(request):
     return render(request, 'adminapp/add_product.html', context)
 
 # ============ PHASE 2: VIEW PRODUCTS ============
+ADMIN_SEARCH_LIMIT = 200
+
 @admin_required
 def admin_products(request):
     """View all products"""
     
     products = Product.objects.select_related('category').all().order_by('-created_at')
     
-    # Search functionality
+    # Search functionality (ranked full-text search, inactive products included)
     search_query = request.GET.get('search', '')
     if search_query:
-        products = products.filter(name__icontains=search_query) | products.filter(category__name__icontains=search_query)
+        products = search_products(search_query, limit=ADMIN_SEARCH_LIMIT, queryset=Product.objects.all())
     
     context = {
         'products': products,
@@ -125,28 +189,124 @@ def admin_products(request):
     return render(request, 'adminapp/products.html', context)
 
 # ============ PHASE 3: VIEW ORDERS ============
+ORDERS_PER_PAGE = 50
+EXPORT_CHUNK_SIZE = 2000
+
+def _filter_orders(request):
+    """Orders matching the status and date range in the query string.
+
+    Returns (queryset, filters). Dates are inclusive calendar days in the
+    current time zone, applied as a created_at range so the
+    order_created_idx / order_status_created_idx indexes serve them.
+    """
+    orders = Order.objects.all()
+    filters = {}
+    
+    status_filter = request.GET.get('status', '')
+    if status_filter in dict(Order.STATUS_CHOICES):
+        orders = orders.filter(status=status_filter)
+        filters['status'] = status_filter
+    
+    for param, lookup, offset in (('from', 'created_at__gte', 0), ('to', 'created_at__lt', 1)):
+        try:
+            day = date.fromisoformat(request.GET.get(param, ''))
+        except ValueError:
+            continue
+        start = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+        orders = orders.filter(**{lookup: start})
+        filters[param] = day.isoformat()
+    
+    return orders, filters
+
 @admin_required
 def admin_orders(request):
-    """View all orders"""
+    """View orders, newest first, one page at a time"""
     
-    orders = Order.objects.select_related('user').prefetch_related('items').order_by('-created_at')
+    orders, filters = _filter_orders(request)
+    orders = orders.select_related('user').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
     
-    # Filter by status
-    status_filter = request.GET.get('status', '')
-    if status_filter:
-        orders = orders.filter(status=status_filter)
+    ordering = ('-created_at', '-id')
+    try:
+        page = KeysetPage(orders, ordering, after=request.GET.get('after'),
+                          before=request.GET.get('before'), per_page=ORDERS_PER_PAGE)
+    except InvalidCursor:
+        page = KeysetPage(orders, ordering, per_page=ORDERS_PER_PAGE)
     
     # Get status choices
     status_choices = Order._meta.get_field('status').choices
     
     context = {
-        'orders': orders,
-        'status_filter': status_filter,
+        'orders': page,
+        'status_filter': filters.get('status', ''),
+        'date_from': filters.get('from', ''),
+        'date_to': filters.get('to', ''),
+        'filter_query': urlencode(filters),
         'status_choices': status_choices,
     }
     
     return render(request, 'adminapp/orders.html', context)
 
+class _Echo:
+    """File-like object whose write() hands the line back to the caller"""
+    def write(self, value):
+        return value
+
+def _export_orders_csv(orders):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['order_id', 'created_at', 'status', 'customer', 'email', 'phone',
+                           'order_total', 'product_id', 'product', 'quantity', 'price'])
+    for order in orders:
+        head = [order.id, order.created_at.isoformat(), order.status, order.user.username,
+                order.user.email, order.phone, order.total_price]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(head + ['', '', '', ''])
+        for item in items:
+            yield writer.writerow(head + [item.product_id or '', item.product.name if item.product else '',
+                                          item.quantity, item.price])
+
+def _export_orders_jsonl(orders):
+    for order in orders:
+        yield json.dumps({
+            'id': order.id,
+            'created_at': order.created_at.isoformat(),
+            'status': order.status,
+            'customer': order.user.username,
+            'email': order.user.email,
+            'phone': order.phone,
+            'shipping_address': order.shipping_address,
+            'total_price': str(order.total_price),
+            'items': [
+                {'product_id': item.product_id, 'product': item.product.name if item.product else None,
+                 'quantity': item.quantity, 'price': str(item.price)}
+                for item in order.items.all()
+            ],
+        }) + '\n'
+
+@admin_required
+def admin_orders_export(request):
+    """Stream the filtered orders with their items as CSV or JSON lines.
+
+    Orders are read with iterator(chunk_size) and items are prefetched per
+    chunk, so memory stays flat however many orders are exported.
+    """
+    orders, filters = _filter_orders(request)
+    orders = orders.select_related('user').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+    ).order_by('-created_at', '-id').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    
+    stamp = timezone.localdate().isoformat()
+    if request.GET.get('format') == 'jsonl':
+        response = StreamingHttpResponse(_export_orders_jsonl(orders), content_type='application/x-ndjson')
+        filename = f'orders-{stamp}.jsonl'
+    else:
+        response = StreamingHttpResponse(_export_orders_csv(orders), content_type='text/csv')
+        filename = f'orders-{stamp}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 # ============ PHASE 3: UPDATE ORDER STATUS ============
 @admin_required
 @require_POST
@@ -166,48 +326,47 @@ def update_order_status(request, order_id):
     return redirect('admin_orders')
 
 # ============ PHASE 3: SALES REPORT ============
+REPORT_RANGES = (7, 30, 90, 365)
+
 @admin_required
+@read_only_view
 def admin_reports(request):
     """Sales report with charts"""
     
-    # Total stats
-    total_revenue = Order.objects.aggregate(Sum('total_price'))['total_price__sum'] or 0
-    total_orders = Order.objects.count()
+    # Every figure reads a rollup (OrderDailyStats, ProductSalesStats), so
+    # the page's cost doesn't grow with order history
+    total_orders, total_revenue = sales_totals()
     avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
     
-    # Orders per day (last 7 days)
-    today = datetime.now().date()
-    last_7_days = []
-    daily_orders = []
-    
-    for i in range(6, -1, -1):
-        date = today - timedelta(days=i)
-        count = Order.objects.filter(created_at__date=date).count()
-        last_7_days.append(date.strftime('%a'))
-        daily_orders.append(count)
+    # Orders per day over the selected range
+    try:
+        days = int(request.GET.get('days', REPORT_RANGES[0]))
+    except ValueError:
+        days = REPORT_RANGES[0]
+    if days not in REPORT_RANGES:
+        days = REPORT_RANGES[0]
+    label_format = '%a' if days <= 7 else '%d %b'
+    series = daily_orders(days)
     
-    # Top products
-    top_products = OrderItem.objects.values('product__name').annotate(
-        total_qty=Sum('quantity')
-    ).order_by('-total_qty')[:5]
+    # Top products, from the ProductSalesStats rollup
+    best_sellers = top_products(5)
     
     # Order status breakdown
-    pending = Order.objects.filter(status='pending').count()
-    confirmed = Order.objects.filter(status='confirmed').count()
-    shipped = Order.objects.filter(status='shipped').count()
-    delivered = Order.objects.filter(status='delivered').count()
+    statuses = status_counts()
     
     context = {
         'total_revenue': total_revenue,
         'total_orders': total_orders,
         'avg_order_value': avg_order_value,
-        'last_7_days': json.dumps(last_7_days),
-        'daily_orders': json.dumps(daily_orders),
-        'top_products': top_products,
-        'pending': pending,
-        'confirmed': confirmed,
-        'shipped': shipped,
-        'delivered': delivered,
+        'days': days,
+        'report_ranges': REPORT_RANGES,
+        'day_labels': json.dumps([day.strftime(label_format) for day, orders, revenue in series]),
+        'daily_orders': json.dumps([orders for day, orders, revenue in series]),
+        'top_products': best_sellers,
+        'pending': statuses['pending'],
+        'confirmed': statuses['confirmed'],
+        'shipped': statuses['shipped'],
+        'delivered': statuses['delivered'],
     }
     
     return render(request, 'adminapp/reports.html', context)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Order, OrderItem
+from .models import Category, Product, Cart, CartItem, Order, OrderDailyStats, OrderItem, StockReservation
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -9,15 +9,16 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'price', 'stock', 'is_active', 'created_at']
-    list_filter = ['category', 'is_active', 'created_at']
-    search_fields = ['name', 'description']
+    list_display = ['name', 'category', 'price', 'stock', 'reorder_threshold', 'low_stock', 'is_active',
+                    'created_at']
+    list_filter = ['category', 'is_active', 'low_stock', 'created_at']
+    search_fields = ['name', 'sku', 'description']
     fieldsets = (
         ('Product Info', {
-            'fields': ('name', 'category', 'description')
+            'fields': ('name', 'sku', 'category', 'description')
         }),
         ('Pricing & Stock', {
-            'fields': ('price', 'stock')
+            'fields': ('price', 'stock', 'reorder_threshold')
         }),
         ('Media', {
             'fields': ('image',)
@@ -31,22 +32,20 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['user', 'get_total_items', 'get_total_price', 'created_at']
+    list_display = ['user', 'total_items', 'get_total_price', 'created_at']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['created_at', 'updated_at']
-
-    def get_total_items(self, obj):
-        return obj.get_total_items()
-    get_total_items.short_description = 'Total Items'
+    readonly_fields = ['total_items', 'total_price', 'created_at', 'updated_at']
 
     def get_total_price(self, obj):
-        return f"${obj.get_total_price()}"
+        return f"${obj.total_price}"
     get_total_price.short_description = 'Total Price'
+    get_total_price.admin_order_field = 'total_price'
 
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'get_item_total']
+    list_select_related = ['cart__user', 'product']
     search_fields = ['product__name']
 
     def get_item_total(self, obj):
@@ -54,6 +53,13 @@ class CartItemAdmin(admin.ModelAdmin):
     get_item_total.short_description = 'Item Total'
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'cart', 'quantity', 'expires_at']
+    list_select_related = ['product', 'cart__user']
+    raw_id_fields = ['cart', 'product']
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'total_price', 'status', 'created_at']
@@ -84,3 +90,11 @@ class OrderItemAdmin(admin.ModelAdmin):
     def get_item_total(self, obj):
         return f"${obj.get_item_total()}"
     get_item_total.short_description = 'Item Total'
+
+
+@admin.register(OrderDailyStats)
+class OrderDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'status', 'order_count', 'revenue']
+    list_filter = ['status']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'status', 'order_count', 'revenue']
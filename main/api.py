@@ -0,0 +1,158 @@
+import json
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from .models import Cart, Product
+from .services import InsufficientStock, add_cart_item, set_cart_quantities
+
+# Cart JSON API (/api/cart/...)
+#
+# Every call answers with the changed lines and the cart totals, so
+# cart.html updates in place instead of posting a form and re-rendering
+# the page. Bodies are JSON objects (form-encoded bodies also work);
+# Django's CSRF check applies, so scripts send the X-CSRFToken header.
+#
+#   GET  /api/cart/         {"lines": [...], "cart": {...}}
+#   POST /api/cart/add/     {"product_id", "quantity"=1}  adds to the line
+#   POST /api/cart/set/     {"product_id", "quantity"}    0 removes it
+#   POST /api/cart/remove/  {"product_id"}
+#   POST /api/cart/batch/   {"lines": [{"product_id", "quantity"}, ...]}
+#                           sets every quantity, all or nothing
+#
+# Errors are {"error": message} with status 400 (bad input), 401 (not
+# logged in), 404 (unknown product) or 409 (not enough stock, with the
+# short "product_ids").
+MAX_BATCH_LINES = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def cart_api(view):
+    """JSON errors and a login check for cart API views; passes the user's cart"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        try:
+            return view(request, cart, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        except InsufficientStock as e:
+            return JsonResponse({'error': str(e), 'product_ids': [p.id for p in e.products]}, status=409)
+    return wrapper
+
+
+def _payload(request):
+    if request.content_type != 'application/json':
+        return request.POST
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError('Invalid JSON body')
+    if not isinstance(data, dict):
+        raise ApiError('Expected a JSON object')
+    return data
+
+
+def _int(data, key, default=None, minimum=0):
+    value = data.get(key, default)
+    if value is None:
+        raise ApiError(f'{key} is required')
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f'{key} must be an integer')
+    if value < minimum:
+        raise ApiError(f'{key} must be at least {minimum}')
+    return value
+
+
+def _products(product_ids, quantities=None):
+    """{id: Product} in one query; products added to the cart must be active"""
+    products = Product.objects.only('id', 'name', 'price', 'is_active').in_bulk(product_ids)
+    for product_id in product_ids:
+        product = products.get(product_id)
+        if product is None or (not product.is_active and (quantities or {}).get(product_id, 0) > 0):
+            raise ApiError(f'No product {product_id}', status=404)
+    return products
+
+
+def _line(product, item):
+    quantity = item.quantity if item else 0
+    return {
+        'product_id': product.id,
+        'item_id': item.id if item else None,
+        'quantity': quantity,
+        'price': str(product.price),
+        'line_total': str(product.price * quantity),
+    }
+
+
+def _response(cart, lines):
+    total_items, total_price = Cart.objects.filter(pk=cart.pk).values_list('total_items', 'total_price').get()
+    return JsonResponse({
+        'lines': lines,
+        'cart': {'total_items': total_items, 'total_price': str(total_price)},
+    })
+
+
+@require_http_methods(['GET'])
+@cart_api
+def cart(request, cart):
+    items = cart.items.select_related('product').order_by('id')
+    return JsonResponse({
+        'lines': [_line(item.product, item) for item in items],
+        'cart': {'total_items': cart.total_items, 'total_price': str(cart.total_price)},
+    })
+
+
+@require_http_methods(['POST'])
+@cart_api
+def add(request, cart):
+    data = _payload(request)
+    product_id = _int(data, 'product_id')
+    product = _products([product_id], {product_id: 1})[product_id]
+    item = add_cart_item(cart, product, _int(data, 'quantity', default=1, minimum=1))
+    return _response(cart, [_line(product, item)])
+
+
+def _set(cart, quantities):
+    products = _products(list(quantities), quantities)
+    items = set_cart_quantities(cart.pk, {products[pk]: quantity for pk, quantity in quantities.items()})
+    return _response(cart, [_line(products[pk], items[pk]) for pk in quantities])
+
+
+@require_http_methods(['POST'])
+@cart_api
+def set_quantity(request, cart):
+    data = _payload(request)
+    return _set(cart, {_int(data, 'product_id'): _int(data, 'quantity')})
+
+
+@require_http_methods(['POST'])
+@cart_api
+def remove(request, cart):
+    return _set(cart, {_int(_payload(request), 'product_id'): 0})
+
+
+@require_http_methods(['POST'])
+@cart_api
+def batch(request, cart):
+    lines = _payload(request).get('lines')
+    if not isinstance(lines, list) or not lines:
+        raise ApiError('lines must be a non-empty list')
+    if len(lines) > MAX_BATCH_LINES:
+        raise ApiError(f'At most {MAX_BATCH_LINES} lines per batch')
+    quantities = {}
+    for line in lines:
+        if not isinstance(line, dict):
+            raise ApiError('Each line must be an object')
+        quantities[_int(line, 'product_id')] = _int(line, 'quantity')
+    return _set(cart, quantities)
@@ -0,0 +1,147 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_http_methods
+
+from .cache import acached_categories, acached_listing_stamp, acached_product, acatalog_key
+from .conditional import conditional_page
+from .db import read_only_view
+from .models import Cart, CartItem, Product
+from .recommendations import arelated_products
+from .services import InsufficientStock, add_cart_item
+from .views import (
+    _listed_products, _listing_context, _posted_quantity, listing_validators, product_validators,
+)
+
+# Async versions of the catalog and cart views
+#
+# Shop/asgi.py routes home, products, product_detail, view_cart and
+# add_to_cart here (Shop/urls_async.py); WSGI keeps main.views. Templates
+# cannot run queries from an async view, so everything a template reads is
+# fetched up front with the async ORM, except what a cached fragment
+# already holds. Cache reads use the backends' a*() methods.
+#
+# The async ORM (and the default a*() cache methods) run each call on the
+# one thread-sensitive worker, so independent calls would still execute
+# one after another if gathered; they are simply awaited in turn.
+
+
+async def _cached_fragment(name, *vary_on):
+    """The stored {% cache %} fragment, or None.
+
+    Read once: the view renders this value (as ``fragment``) instead of
+    letting the tag look again, because an entry that expires in between
+    would be re-rendered from data that was never loaded.
+    """
+    try:
+        fragment_cache = caches['template_fragments']
+    except InvalidCacheBackendError:
+        fragment_cache = caches['default']
+    fragment = await fragment_cache.aget(make_template_fragment_key(name, vary_on))
+    return mark_safe(fragment) if fragment is not None else None
+
+
+async def _load_user(request):
+    # Templates read request.user (nav, context processors); resolve it
+    # asynchronously so the lazy sync lookup never runs on the event loop
+    request.user = await request.auser()
+    return request.user
+
+
+@read_only_view
+async def home(request):
+    await _load_user(request)
+    key = await acatalog_key('products')
+    featured_products = []
+    fragment = await _cached_fragment('featured_products', key)
+    if fragment is None:
+        featured_products = [product async for product in Product.objects.filter(is_active=True)[:8]]
+    context = {
+        'products': featured_products,
+        'catalog_key': key,
+        'fragment': fragment,
+    }
+    return render(request, 'index.html', context)
+
+
+@read_only_view
+@conditional_page(listing_validators)
+async def products(request):
+    await _load_user(request)
+    categories = await acached_categories()
+    scope = _listed_products(request.GET.get('category', ''), categories)[2]
+    version = await acatalog_key('categories', scope)
+    context = _listing_context(request, categories, (version, await acached_listing_stamp(version)))
+    page = context['page']
+    context['fragment'] = await _cached_fragment('product_listing', context['catalog_key'],
+                                                 context['category_param'], context['sort'],
+                                                 context['cursor_key'])
+    if context['fragment'] is None:
+        await page.aload()
+        await page.atotal()
+    return render(request, 'products.html', context)
+
+
+@read_only_view
+@conditional_page(product_validators)
+async def product_detail(request, product_id):
+    await _load_user(request)
+    product = await acached_product(product_id)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    related_key = await acatalog_key('products', 'recommendations')
+    related_products = []
+    fragment = await _cached_fragment('related_products', related_key, product.id)
+    if fragment is None:
+        related_products = await arelated_products(product)
+    context = {
+        'product': product,
+        'related_products': related_products,
+        'related_key': related_key,
+        'fragment': fragment,
+    }
+    return render(request, 'product_detail.html', context)
+
+
+@login_required(login_url='/login/')
+@require_http_methods(["POST"])
+async def add_to_cart(request, product_id):
+    """Add product to cart"""
+    user = await _load_user(request)
+    try:
+        product = await Product.objects.aget(id=product_id, is_active=True)
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+    cart, created = await Cart.objects.aget_or_create(user=user)
+
+    quantity = _posted_quantity(request)
+    if quantity is None:
+        return redirect('view_cart')
+
+    # The service runs in a transaction, which the async ORM can't open
+    try:
+        await sync_to_async(add_cart_item)(cart, product, quantity)
+    except InsufficientStock as e:
+        messages.error(request, str(e))
+
+    return redirect('view_cart')
+
+
+@login_required(login_url='/login/')
+async def view_cart(request):
+    """View shopping cart"""
+    user = await _load_user(request)
+    cart, created = await Cart.objects.aget_or_create(user=user)
+    items = CartItem.objects.filter(cart__user=user).select_related('product').order_by('id')
+    cart_items = [item async for item in items]
+    context = {
+        'cart': cart,
+        'cart_items': cart_items,
+        'total_price': cart.total_price
+    }
+    return render(request, 'cart.html', context)
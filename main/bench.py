@@ -0,0 +1,48 @@
+import math
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection, connections
+
+
+# Helpers shared by the bench_* management commands
+@contextmanager
+def isolated_database(verbosity=0):
+    """Run against a freshly migrated throwaway SQLite file.
+
+    Benchmarks write a lot of rows, so they never touch the real database.
+    A file (not ``:memory:``) is used so worker threads see the same data.
+    """
+    tmpdir = tempfile.mkdtemp(prefix='shop-bench-')
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    # Point mirrors (the read-only alias) at the same throwaway file
+    mirrors = {alias: connections[alias].settings_dict['NAME'] for alias in connections
+               if connections[alias].settings_dict.get('TEST', {}).get('MIRROR') == connection.alias}
+    for alias in mirrors:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        for alias, name in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity)
+        test_settings['NAME'] = old_test_name
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
@@ -0,0 +1,156 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Category, Product
+
+# Catalog caching
+#
+# Cached catalog data is keyed by version counters instead of being
+# deleted. Each scope below has a counter; bumping it makes every key built
+# from it unreachable and the old entries simply expire.
+#
+#   'categories'         any Category change (sidebar, category names)
+#   'products'           any Product change (home, unfiltered listing)
+#   'category:<id>'      a product in that category changed
+#   'product:<id>'       that product changed
+#   'epoch'              everything; part of every key, bumped after bulk
+#                        loads that bypass model signals
+CATALOG_TIMEOUT = 60 * 60
+
+
+def _version_key(scope):
+    return f'catalog:v:{scope}'
+
+
+def _fresh_version():
+    # Counters may be evicted; restarting from the clock (rather than 1)
+    # guarantees a restarted counter never matches a stale entry.
+    return int(time.time() * 1000)
+
+
+def catalog_key(*scopes):
+    """Version string for the given scopes, for use in cache keys"""
+    keys = [_version_key(scope) for scope in ('epoch',) + scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_catalog(*scopes):
+    """Invalidate everything cached under the given scopes"""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+
+
+def invalidate_products(products):
+    """Invalidate cached pages showing any of the given products"""
+    scopes = {'products'}
+    for product in products:
+        scopes.add(f'product:{product.id}')
+        scopes.add(f'category:{product.category_id}')
+    bump_catalog(*scopes)
+
+
+def invalidate_catalog():
+    """Invalidate the whole catalog (after bulk loads that skip signals)"""
+    bump_catalog('epoch')
+
+
+def _categories_key():
+    return f'catalog:categories:{catalog_key("categories")}'
+
+
+def _product_key(product_id):
+    return f'catalog:product:{product_id}:{catalog_key(f"product:{product_id}", "categories")}'
+
+
+def _listing_key(version):
+    return f'catalog:listing:{version}'
+
+
+def _product_queryset(product_id):
+    return Product.objects.select_related('category').filter(id=product_id, is_active=True)
+
+
+def cached_categories():
+    """All categories, served from cache"""
+    key = _categories_key()
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by('id'))
+        cache.set(key, categories, CATALOG_TIMEOUT)
+    return categories
+
+
+def cached_product(product_id):
+    """Active product with its category, served from cache. None if missing."""
+    key = _product_key(product_id)
+    product = cache.get(key)
+    if product is None:
+        product = _product_queryset(product_id).first()
+        if product is None:
+            return None
+        cache.set(key, product, CATALOG_TIMEOUT)
+    return product
+
+
+def cached_listing_stamp(version, products=None):
+    """Count and newest updated_at of a listing, for conditional GET.
+
+    ``version`` is the listing's catalog_key(). One aggregate over the
+    partial updated_at indexes; the count catches products leaving the
+    filter, which don't move the max. Without ``products`` only the cache
+    is read (None on a miss).
+    """
+    key = _listing_key(version)
+    stamp = cache.get(key)
+    if stamp is None and products is not None:
+        stamp = products.aggregate(count=Count('*'), modified=Max('updated_at'))
+        cache.set(key, stamp, CATALOG_TIMEOUT)
+    return stamp
+
+
+# Async variants for main.async_views
+async def acatalog_key(*scopes):
+    keys = [_version_key(scope) for scope in ('epoch',) + scopes]
+    versions = await cache.aget_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, None)
+        versions.update(missing)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+async def acached_categories():
+    key = f'catalog:categories:{await acatalog_key("categories")}'
+    categories = await cache.aget(key)
+    if categories is None:
+        categories = [category async for category in Category.objects.order_by('id')]
+        await cache.aset(key, categories, CATALOG_TIMEOUT)
+    return categories
+
+
+async def acached_product(product_id):
+    version = await acatalog_key(f'product:{product_id}', 'categories')
+    key = f'catalog:product:{product_id}:{version}'
+    product = await cache.aget(key)
+    if product is None:
+        product = await _product_queryset(product_id).afirst()
+        if product is None:
+            return None
+        await cache.aset(key, product, CATALOG_TIMEOUT)
+    return product
+
+
+async def acached_listing_stamp(version):
+    """Cache-only cached_listing_stamp(): None on a miss"""
+    return await cache.aget(_listing_key(version))
@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .cache import invalidate_catalog
+from .inventory import stock_changed
+from .models import Cart, Category, Product
+from .search import index_products
+from .services import recompute_cart_totals
+
+# Catalog import (manage.py import_catalog)
+#
+# Rows are dicts keyed by column: a CSV header or JSONL object keys. Every
+# row needs a 'sku'; missing or blank columns are left untouched, so a
+# "sku,price,stock" file is a price-and-stock refresh.
+#
+#   - rows are upserted on sku with bulk_create(update_conflicts=True):
+#     existing products get the provided columns, new SKUs are created
+#   - creating a product needs name, category and price; other rows for
+#     unknown SKUs are rejected
+#
+# Upserting partial rows beats bulk_update, whose CASE WHEN per column
+# costs O(batch) per updated row on SQLite.
+#
+# Input is read lazily and written one batch per transaction, so memory
+# stays flat and the write lock is held briefly. Bulk writes skip model
+# signals; the importer does their work itself per batch (cart totals,
+# search index, low-stock flags) and invalidates the catalog cache once
+# at the end.
+COLUMNS = ('name', 'category', 'price', 'stock', 'reorder_threshold', 'description', 'is_active',
+           'image')
+# Model fields, once the category column is resolved to category_id
+REQUIRED_FIELDS = {'name', 'category_id', 'price'}
+SEARCH_FIELDS = {'name', 'category_id', 'description'}
+STOCK_FIELDS = {'stock', 'reorder_threshold'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+PRICE_STEP = Decimal('0.01')
+
+
+class RowError(ValueError):
+    """A row that can't be imported; the rest of the file still is"""
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row) from a CSV or JSONL text stream.
+
+    Unparseable JSONL lines are yielded as RowError instances.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            row = RowError(f'invalid JSON: {e.msg}')
+        else:
+            if not isinstance(row, dict):
+                row = RowError('expected a JSON object')
+        yield line_number, row
+
+
+def clean_row(row):
+    """(sku, {column: value}) for the columns the row provides"""
+    sku = str(row.get('sku') or '').strip()
+    if not sku:
+        raise RowError('missing sku')
+    values = {}
+    for column in COLUMNS:
+        value = row.get(column)
+        if value is None or value == '':
+            continue
+        if column == 'price':
+            try:
+                value = Decimal(str(value)).quantize(PRICE_STEP)
+            except InvalidOperation:
+                raise RowError(f'invalid price {value!r}')
+            if value < 0:
+                raise RowError('negative price')
+        elif column in ('stock', 'reorder_threshold'):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise RowError(f'invalid {column} {value!r}')
+            if value < 0:
+                raise RowError(f'negative {column}')
+        elif column == 'is_active':
+            if not isinstance(value, bool):
+                flag = str(value).strip().lower()
+                if flag not in TRUE_VALUES | FALSE_VALUES:
+                    raise RowError(f'invalid is_active {value!r}')
+                value = flag in TRUE_VALUES
+        else:
+            value = str(value).strip()
+        values[column] = value
+    if len(values.get('name', '')) > 200:
+        raise RowError('name longer than 200 characters')
+    return sku, values
+
+
+class CatalogImporter:
+    def __init__(self, batch_size=1000, images_dir=None, category_map=None, create_categories=True):
+        self.batch_size = batch_size
+        self.images_dir = images_dir
+        self.category_map = category_map or {}
+        self.create_categories = create_categories
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'errors': 0, 'images': 0}
+        # (line, message) for the first few bad rows
+        self.errors = []
+
+    def error(self, line, message):
+        self.stats['errors'] += 1
+        if len(self.errors) < 20:
+            self.errors.append((line, message))
+
+    def run(self, rows, progress=None):
+        """Import (line, row) pairs; returns the stats dict"""
+        began = time.perf_counter()
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            self.stats['rows'] += len(batch)
+            prepared = {}
+            for line, row in batch:
+                try:
+                    if isinstance(row, RowError):
+                        raise row
+                    sku, values = self.prepare(row)
+                except RowError as e:
+                    self.error(line, str(e))
+                    continue
+                # A SKU repeated within a batch: later columns win
+                prepared.setdefault(sku, [line, {}])[1].update(values)
+            self.write_batch(prepared)
+            if progress:
+                progress(self.stats, time.perf_counter() - began)
+        invalidate_catalog()
+        self.stats['seconds'] = time.perf_counter() - began
+        return self.stats
+
+    def prepare(self, row):
+        sku, values = clean_row(row)
+        if 'category' in values:
+            values['category_id'] = self.category_id(values.pop('category'))
+        if 'image' in values:
+            values['image'] = self.attach_image(values['image'])
+        return sku, values
+
+    def category_id(self, name):
+        name = self.category_map.get(name, name)
+        if name not in self.categories:
+            if not self.create_categories:
+                raise RowError(f'unknown category {name!r}')
+            self.categories[name] = Category.objects.create(name=name).id
+        return self.categories[name]
+
+    def attach_image(self, filename):
+        if not self.images_dir:
+            raise RowError('image given but no images directory')
+        filename = os.path.basename(filename)
+        source = os.path.join(self.images_dir, filename)
+        if not os.path.isfile(source):
+            raise RowError(f'image {filename!r} not found')
+        target = f'products/{filename}'
+        if not default_storage.exists(target):
+            with open(source, 'rb') as f:
+                target = default_storage.save(target, File(f))
+            self.stats['images'] += 1
+        return target
+
+    def write_batch(self, prepared):
+        if not prepared:
+            return
+        with transaction.atomic():
+            existing = {row['sku']: row for row in Product.objects.filter(sku__in=prepared).values(
+                'sku', 'id', 'image', *REQUIRED_FIELDS)}
+            upserts = defaultdict(list)
+            for sku, (line, values) in prepared.items():
+                current = existing.get(sku)
+                if current is None and not REQUIRED_FIELDS <= values.keys():
+                    self.error(line, 'unknown sku (name, category and price are needed to create it)')
+                    continue
+                if 'image' in values and values['image'] != (current and current['image']):
+                    # New image: rebuild_product_images --missing renders it
+                    values['image_renditions'] = {}
+                # Partial rows go through the same upsert; the INSERT half
+                # needs the NOT NULL columns, which conflict resolution
+                # then leaves alone
+                required = {field: current[field] for field in REQUIRED_FIELDS} if current else {}
+                upserts[frozenset(values)].append(Product(sku=sku, **{**required, **values}))
+
+            for fields, products in upserts.items():
+                Product.objects.bulk_create(
+                    products, update_conflicts=True, unique_fields=['sku'],
+                    update_fields=_field_names(fields),
+                )
+
+            written = sum(map(len, upserts.values()))
+            created = sum(1 for group in upserts.values() for p in group if p.sku not in existing)
+            self.stats['created'] += created
+            self.stats['updated'] += written - created
+
+            # What the skipped Product signals would have done
+            repriced = [existing[sku]['id'] for sku, (line, values) in prepared.items()
+                        if sku in existing and 'price' in values]
+            if repriced:
+                recompute_cart_totals(Cart.objects.filter(items__product_id__in=repriced))
+            reindex = [sku for sku, (line, values) in prepared.items() if SEARCH_FIELDS & values.keys()]
+            if reindex:
+                index_products(Product.objects.filter(sku__in=reindex).select_related('category'))
+            restocked = [sku for sku, (line, values) in prepared.items()
+                         if sku not in existing or STOCK_FIELDS & values.keys()]
+            if restocked:
+                stock_changed(Product.objects.filter(sku__in=restocked))
+
+
+def _field_names(fields):
+    names = {'category' if field == 'category_id' else field for field in fields}
+    return sorted(names | {'updated_at'})
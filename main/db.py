@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read-only routing
+#
+# Settings define a second alias, READ_ONLY_DATABASE, on the same SQLite
+# file with PRAGMA query_only. Views that never write (catalog pages,
+# reports) are wrapped in @read_only_view; while one runs, ReadOnlyRouter
+# sends their reads there. With WAL, readers on that connection neither
+# wait for nor block the checkout writer on the default connection.
+#
+# Reads stay on the default connection inside a transaction on it, so
+# code always sees its own uncommitted writes (this also keeps TestCase,
+# which wraps every test in a transaction, on a single connection).
+# Writes always go to the default connection, including saves of
+# instances that were loaded from the read-only one.
+READ_ONLY_DATABASE = 'readonly'
+
+_read_only = ContextVar('read_only', default=False)
+
+
+@contextmanager
+def read_only():
+    """Route ORM reads in this block to the read-only connection"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def read_only_view(view_func):
+    """Decorator for views that only read from the database"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            with read_only():
+                return await view_func(request, *args, **kwargs)
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            with read_only():
+                return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadOnlyRouter:
+    def db_for_read(self, model, **hints):
+        if (_read_only.get() and READ_ONLY_DATABASE in settings.DATABASES
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return READ_ONLY_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READ_ONLY_DATABASE
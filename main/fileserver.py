@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+
+from django.conf import settings
+
+# Static and media file serving
+#
+# ServeFilesWSGI / ServeFilesASGI wrap the Django application (see
+# Shop/wsgi.py and Shop/asgi.py) and answer requests under STATIC_URL and
+# MEDIA_URL without entering Django:
+#
+#   - collected static files are indexed once at startup with content-hash
+#     ETags; media files are indexed on first request and re-checked with
+#     a stat() so uploads and replacements are picked up
+#   - If-None-Match / If-Modified-Since answer 304
+#   - single "Range: bytes=..." requests answer 206 (416 when unsatisfiable)
+#   - .br / .gz siblings written by collectstatic are chosen by
+#     Accept-Encoding
+#   - content-hashed names (styles.3f2a9c1b7d0e.css) are cached for a year
+#   - bodies go out through wsgi.file_wrapper (sendfile on most servers) or
+#     the ASGI zero-copy send extension when the server offers it
+#
+# Anything not found falls through to Django.
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=300'
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Accept-Encoding token -> sibling file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class FileInfo:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'last_modified', 'content_type',
+                 'cache_control', 'variants')
+
+    def __init__(self, path, st, etag, content_type, cache_control):
+        self.path = path
+        self.size = st.st_size
+        self.mtime = st.st_mtime_ns
+        self.etag = etag
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.content_type = content_type
+        self.cache_control = cache_control
+        # encoding -> FileInfo of the precompressed sibling
+        self.variants = {}
+
+
+class FileIndex:
+    """Files below ``root`` served under ``prefix`` (a URL path)."""
+
+    def __init__(self, root, prefix, hash_contents=False, revalidate=False):
+        self.root = os.path.realpath(root) if root else None
+        self.prefix = '/' + prefix.strip('/') + '/'
+        self.hash_contents = hash_contents
+        self.revalidate = revalidate
+        self.files = {}
+
+    def scan(self):
+        """Index every file up front (for trees that only change on deploy)"""
+        if not self.root or not os.path.isdir(self.root):
+            return self
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(('.gz', '.br')):
+                    relative = os.path.relpath(os.path.join(directory, name), self.root)
+                    self._load(relative.replace(os.sep, '/'))
+        return self
+
+    def _stat_file(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st if stat.S_ISREG(st.st_mode) else None
+
+    def _etag(self, path, st):
+        if self.hash_contents:
+            digest = hashlib.blake2b(digest_size=10)
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            return f'"{digest.hexdigest()}"'
+        return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+    def _load(self, relative):
+        path = os.path.realpath(os.path.join(self.root, relative))
+        # Refuse anything that resolves outside the root (../, symlinks)
+        if not path.startswith(self.root + os.sep):
+            return None
+        st = self._stat_file(path)
+        if st is None:
+            self.files.pop(relative, None)
+            return None
+        content_type, _ = mimetypes.guess_type(relative)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+            content_type += '; charset=utf-8'
+        cache_control = IMMUTABLE_CACHE if HASHED_NAME_RE.search(relative) else DEFAULT_CACHE
+        info = FileInfo(path, st, self._etag(path, st), content_type, cache_control)
+        for encoding, suffix in ENCODINGS:
+            sibling_st = self._stat_file(path + suffix)
+            if sibling_st is not None:
+                # Variants share the identity ETag with an encoding suffix
+                etag = f'{info.etag[:-1]}-{encoding}"'
+                info.variants[encoding] = FileInfo(path + suffix, sibling_st, etag, content_type, cache_control)
+        self.files[relative] = info
+        return info
+
+    def lookup(self, url_path):
+        if not self.root or not url_path.startswith(self.prefix):
+            return None
+        relative = unquote(url_path[len(self.prefix):])
+        if not relative or '\x00' in relative:
+            return None
+        info = self.files.get(relative)
+        if info is None:
+            return self._load(relative)
+        if self.revalidate:
+            st = self._stat_file(info.path)
+            if st is None or st.st_mtime_ns != info.mtime or st.st_size != info.size:
+                return self._load(relative)
+        return info
+
+
+def default_indexes():
+    """Indexes for collected static files and uploaded media"""
+    return [
+        FileIndex(settings.STATIC_ROOT, settings.STATIC_URL, hash_contents=True).scan(),
+        FileIndex(settings.MEDIA_ROOT, settings.MEDIA_URL, revalidate=True),
+    ]
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to ignore, or 'invalid'"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None  # multiple or malformed ranges: send the whole file
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _not_modified(info, headers):
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or info.etag in tags
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= info.mtime // 10**9
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def plan_response(info, method, headers):
+    """Decide status, headers and byte range for a request.
+
+    ``headers`` maps lower-case header names to values. Returns
+    (status, header list, file info to read or None, offset, length).
+    """
+    if method not in ('GET', 'HEAD'):
+        return 405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')], None, 0, 0
+
+    vary = bool(info.variants)
+    selected = info
+    range_header = headers.get('range')
+    # Ranges address the identity bytes, so compressed variants are only
+    # used for whole-file responses
+    if not range_header and info.variants:
+        accepted = {token.split(';')[0].strip() for token in headers.get('accept-encoding', '').split(',')}
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in info.variants:
+                selected = info.variants[encoding]
+                break
+
+    response_headers = [
+        ('ETag', selected.etag),
+        ('Last-Modified', info.last_modified),
+        ('Cache-Control', info.cache_control),
+        ('Accept-Ranges', 'bytes'),
+    ]
+    if vary:
+        response_headers.append(('Vary', 'Accept-Encoding'))
+
+    if _not_modified(selected, headers):
+        return 304, response_headers, None, 0, 0
+
+    response_headers.append(('Content-Type', info.content_type))
+    if selected is not info:
+        response_headers.append(('Content-Encoding', 'br' if selected.path.endswith('.br') else 'gzip'))
+
+    if range_header and headers.get('if-range', info.etag) in (info.etag, info.last_modified):
+        byte_range = _parse_range(range_header, info.size)
+        if byte_range == 'invalid':
+            return 416, [('Content-Range', f'bytes */{info.size}'), ('Content-Length', '0')], None, 0, 0
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response_headers += [('Content-Range', f'bytes {start}-{end}/{info.size}'),
+                                 ('Content-Length', str(length))]
+            return 206, response_headers, info, start, length
+
+    response_headers.append(('Content-Length', str(selected.size)))
+    return 200, response_headers, selected, 0, selected.size
+
+
+STATUS_LINES = {200: '200 OK', 206: '206 Partial Content', 304: '304 Not Modified',
+                405: '405 Method Not Allowed', 416: '416 Range Not Satisfiable'}
+
+
+def _read_range(path, offset, length):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class ServeFilesWSGI:
+    """WSGI middleware serving static and media files ahead of Django"""
+
+    def __init__(self, application, indexes=None):
+        self.application = application
+        self.indexes = default_indexes() if indexes is None else indexes
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        for index in self.indexes:
+            info = index.lookup(path)
+            if info is not None:
+                return self.serve(info, environ, start_response)
+        return self.application(environ, start_response)
+
+    def serve(self, info, environ, start_response):
+        headers = {
+            key[5:].replace('_', '-').lower(): value
+            for key, value in environ.items() if key.startswith('HTTP_')
+        }
+        status, response_headers, body, offset, length = plan_response(
+            info, environ.get('REQUEST_METHOD', 'GET'), headers
+        )
+        start_response(STATUS_LINES[status], response_headers)
+        if body is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and offset == 0 and length == body.size:
+            # Whole file: servers implement file_wrapper with sendfile()
+            return file_wrapper(open(body.path, 'rb'), CHUNK_SIZE)
+        return _read_range(body.path, offset, length)
+
+
+class ServeFilesASGI:
+    """ASGI middleware serving static and media files ahead of Django"""
+
+    def __init__(self, application, indexes=None):
+        self.application = application
+        self.indexes = default_indexes() if indexes is None else indexes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            for index in self.indexes:
+                info = index.lookup(scope['path'])
+                if info is not None:
+                    return await self.serve(info, scope, send)
+        return await self.application(scope, receive, send)
+
+    async def serve(self, info, scope, send):
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                   for name, value in scope.get('headers', [])}
+        method = scope.get('method', 'GET')
+        status, response_headers, body, offset, length = plan_response(info, method, headers)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response_headers],
+        })
+        if body is None or method == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        if 'http.response.zerocopysend' in scope.get('extensions', {}):
+            f = open(body.path, 'rb')
+            try:
+                await send({'type': 'http.response.zerocopysend', 'file': f,
+                            'offset': offset, 'count': length})
+            finally:
+                f.close()
+            return
+        chunks = _read_range(body.path, offset, length)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
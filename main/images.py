@@ -0,0 +1,77 @@
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# Product image renditions
+#
+# Every product image is resized into a fixed set of renditions and
+# re-encoded as WebP (and AVIF when Pillow supports it). Files are named
+# after a hash of their bytes, so they can be cached forever and identical
+# uploads share files. Paths and dimensions are stored on
+# Product.image_renditions:
+#
+#   {'card': {'width': 480, 'height': 480,
+#             'webp': 'products/renditions/shoe-card.1a2b3c4d5e6f.webp',
+#             'avif': 'products/renditions/shoe-card.9f8e7d6c5b4a.avif'}, ...}
+#
+# Encoding WebP/AVIF takes seconds per image, so it never runs in a
+# request: `manage.py rebuild_product_images --missing` (run on a schedule
+# and after catalog imports) renders every product whose renditions are
+# empty. When a product's image changes, main.signals empties its
+# renditions; pages show the original upload until they are rendered.
+
+# Bounding box (px) per rendition; images are never upscaled
+RENDITIONS = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1000,
+}
+RENDITION_DIR = 'products/renditions'
+QUALITY = {'webp': 80, 'avif': 55}
+
+
+def output_formats():
+    return ['avif', 'webp'] if features.check('avif') else ['webp']
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), quality=QUALITY[fmt])
+    return buffer.getvalue()
+
+
+def _store(stem, name, fmt, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    path = f'{RENDITION_DIR}/{stem}-{name}.{digest}.{fmt}'
+    # Content-addressed: an existing file already has these exact bytes
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(data))
+    return path
+
+
+def render_renditions(image_name):
+    """Render every rendition of a stored image. Returns the renditions dict.
+
+    Takes a storage name rather than a model instance so it can run in a
+    worker process.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    with default_storage.open(image_name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    renditions = {}
+    for name, size in RENDITIONS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        entry = {'width': image.width, 'height': image.height}
+        for fmt in output_formats():
+            entry[fmt] = _store(stem, name, fmt, _encode(image, fmt))
+        renditions[name] = entry
+    return renditions
+
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+
+from .models import Product
+
+# Inventory alerts
+#
+# Product.low_stock is true while stock is below the product's
+# reorder_threshold. Every writer of stock or thresholds calls
+# stock_changed() for the products it touched (checkout, Product saves
+# from either admin, catalog imports), which corrects just those flags and
+# sends low_stock_reached for products that crossed into low stock. The
+# flag only turns on once per crossing, so an alert is never repeated
+# while a product stays low. The dashboard pages through the flagged
+# products on the partial index product_low_stock_idx, so it reads only
+# low products whatever the catalog size.
+
+# sender=Product, products=[Product]; sent after the transaction commits
+low_stock_reached = Signal()
+
+
+def stock_changed(products):
+    """Re-evaluate low_stock for a Product queryset.
+
+    One SELECT of the products whose flag is wrong, and an UPDATE only when
+    one is. Returns the products that just went low.
+    """
+    below = Q(stock__lt=F('reorder_threshold'))
+    stale = list(
+        products.filter((below & Q(low_stock=False)) | (~below & Q(low_stock=True)))
+        .order_by().only('id', 'name', 'stock', 'reorder_threshold', 'low_stock')
+    )
+    went_low = [product for product in stale if not product.low_stock]
+    recovered = [product.id for product in stale if product.low_stock]
+    with transaction.atomic(savepoint=False):
+        if went_low:
+            # Conditions repeated so a concurrent writer can't flag twice
+            Product.objects.filter(below, id__in=[product.id for product in went_low],
+                                   low_stock=False).update(low_stock=True)
+        if recovered:
+            Product.objects.filter(id__in=recovered, low_stock=True).exclude(below).update(
+                low_stock=False)
+    for product in went_low:
+        product.low_stock = True
+    if went_low:
+        transaction.on_commit(lambda: low_stock_reached.send(sender=Product, products=went_low))
+    return went_low
+
+
+def low_stock_products():
+    """Active products below their threshold, lowest stock first: order
+    by ('stock', 'id') to page on product_low_stock_idx"""
+    return Product.objects.filter(low_stock=True, is_active=True)
@@ -0,0 +1,218 @@
+import random
+import re
+import time
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import Client
+from django.urls import resolve, reverse
+
+from userapp.mail import send_batch
+
+from .bench import percentile
+from .testing import TEST_PASSWORD
+
+# Load generation (manage.py loadtest)
+#
+# Each worker process runs shopper journeys back to back with Django's
+# test Client until its time is up, picking a scenario by weight for
+# every journey:
+#
+#   browse   home -> products -> a category -> product_detail x2
+#   buy      logged in: home -> products -> product_detail -> add_to_cart
+#            -> view_cart -> checkout -> checkout POST
+#            -> order_confirmation -> my_orders
+#   otp_buy  logged out first: login -> OTP email -> verify_otp, then buy
+#
+# Every request is timed and recorded under its URL name. A request fails
+# on an exception, a 4xx/5xx, or a response other than the one the
+# journey needs (a checkout that doesn't land on order_confirmation).
+#
+# OTP mail goes through the real queue: the worker delivers due messages
+# with send_batch() to the locmem backend. Another worker's message can be
+# delivered here, so delivered bodies go into a mailbox shared by all
+# workers, keyed by recipient.
+SCENARIOS = ('browse', 'buy', 'otp_buy')
+DEFAULT_WEIGHTS = {'browse': 6, 'buy': 3, 'otp_buy': 1}
+OTP_RE = re.compile(r'OTP for Nexus Store login is: (\d{6})')
+OTP_WAIT = 10
+
+
+class JourneyFailed(Exception):
+    """The response can't be followed; the journey stops here"""
+
+
+class Recorder:
+    """Latencies (ms) and error counts per URL name"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, ms, ok):
+        self.latencies[name].append(ms)
+        if not ok:
+            self.errors[name] += 1
+
+    def merge(self, other):
+        for name, values in other.latencies.items():
+            self.latencies[name].extend(values)
+        for name, count in other.errors.items():
+            self.errors[name] += count
+
+
+class Shopper:
+    def __init__(self, email, catalog, recorder, mailbox, rng):
+        self.email = email
+        self.catalog = catalog
+        self.recorder = recorder
+        self.mailbox = mailbox
+        self.rng = rng
+        self.client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        self.logged_in = False
+
+    def request(self, name, url, method='get', data=None, expect=200, redirect_to=None):
+        """Timed request recorded under ``name``; ``redirect_to`` is the URL
+        name a 302 must point at"""
+        began = time.perf_counter()
+        try:
+            response = getattr(self.client, method)(url, data or {})
+        except Exception:
+            response = None
+        ms = (time.perf_counter() - began) * 1000
+        ok = response is not None and response.status_code == expect
+        if ok and redirect_to:
+            ok = resolve(response.url.split('?')[0]).url_name == redirect_to
+        self.recorder.add(name, ms, ok)
+        if not ok:
+            raise JourneyFailed(f'{name}: {response.status_code if response else "exception"}')
+        return response
+
+    def product_url(self):
+        return reverse('product_detail', args=[self.rng.choice(self.catalog['products'])])
+
+    def browse(self):
+        self.request('home', reverse('home'))
+        self.request('products', reverse('products'))
+        category = self.rng.choice(self.catalog['categories'])
+        self.request('products', reverse('products') + f'?category={category}')
+        for _ in range(2):
+            self.request('product_detail', self.product_url())
+
+    def buy(self):
+        if not self.logged_in:
+            self.client.force_login(User.objects.get(username=self.email))
+            self.logged_in = True
+        self.request('home', reverse('home'))
+        self.request('products', reverse('products'))
+        product_id = self.rng.choice(self.catalog['products'])
+        self.request('product_detail', reverse('product_detail', args=[product_id]))
+        self.request('add_to_cart', reverse('add_to_cart', args=[product_id]), method='post',
+                     data={'quantity': self.rng.randint(1, 2)}, expect=302,
+                     redirect_to='view_cart')
+        self.request('view_cart', reverse('view_cart'))
+        self.request('checkout', reverse('checkout'))
+        response = self.request('checkout', reverse('checkout'), method='post', data={
+            'shipping_address': '221B Baker Street', 'phone': '9000000000',
+        }, expect=302, redirect_to='order_confirmation')
+        self.request('order_confirmation', response.url)
+        self.request('my_orders', reverse('my_orders'))
+
+    def otp_buy(self):
+        if self.logged_in:
+            self.request('logout', reverse('logout'), expect=302)
+            self.logged_in = False
+        self.request('login', reverse('login'))
+        self.request('login', reverse('login'), method='post',
+                     data={'email': self.email, 'password': TEST_PASSWORD},
+                     expect=302, redirect_to='verify_otp')
+        otp = self.read_otp()
+        self.request('verify_otp', reverse('verify_otp'))
+        self.request('verify_otp', reverse('verify_otp'), method='post', data={'otp': otp},
+                     expect=302, redirect_to='home')
+        self.logged_in = True
+        self.buy()
+
+    def read_otp(self):
+        deadline = time.monotonic() + OTP_WAIT
+        while True:
+            send_batch()
+            outbox = getattr(mail, 'outbox', [])
+            for message in outbox:
+                for recipient in message.to:
+                    self.mailbox[recipient] = message.body
+            del outbox[:]
+            body = self.mailbox.pop(self.email, None)
+            if body is not None:
+                return OTP_RE.search(body).group(1)
+            if time.monotonic() > deadline:
+                raise JourneyFailed(f'no OTP email for {self.email}')
+            time.sleep(0.01)
+
+
+def run_worker(emails, catalog, weights, seconds, mailbox, seed=0):
+    """Run journeys for ``seconds``, cycling through ``emails``.
+
+    Returns (Recorder, completed journeys, failed journeys).
+    """
+    rng = random.Random(seed)
+    recorder = Recorder()
+    shoppers = [Shopper(email, catalog, recorder, mailbox, rng) for email in emails]
+    scenarios = list(weights)
+    completed = failed = 0
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        shopper = shoppers[i % len(shoppers)]
+        i += 1
+        scenario = rng.choices(scenarios, [weights[name] for name in scenarios])[0]
+        try:
+            getattr(shopper, scenario)()
+            completed += 1
+        except JourneyFailed:
+            failed += 1
+    return recorder, completed, failed
+
+
+# Reporting
+def summarize(recorder, seconds):
+    """Per-URL-name and overall requests/s, error rate and latency percentiles"""
+    def stats(latencies, errors):
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4) if latencies else 0.0,
+            'rps': round(len(latencies) / seconds, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+        }
+
+    urls = {name: stats(values, recorder.errors.get(name, 0))
+            for name, values in sorted(recorder.latencies.items())}
+    everything = [ms for values in recorder.latencies.values() for ms in values]
+    return {'total': stats(everything, sum(recorder.errors.values())), 'urls': urls}
+
+
+def compare(result, baseline, tolerance):
+    """Rows of (url name, metric, baseline, current, change) for every
+    metric worse than the baseline by more than ``tolerance`` (a fraction;
+    error rates are compared in absolute points)"""
+    regressions = []
+    for name, current in [('total', result['total'])] + sorted(result['urls'].items()):
+        before = baseline['total'] if name == 'total' else baseline.get('urls', {}).get(name)
+        if not before:
+            continue
+        if before['rps'] and current['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append((name, 'rps', before['rps'], current['rps'],
+                                current['rps'] / before['rps'] - 1))
+        for metric in ('p50_ms', 'p95_ms'):
+            if before[metric] and current[metric] > before[metric] * (1 + tolerance):
+                regressions.append((name, metric, before[metric], current[metric],
+                                    current[metric] / before[metric] - 1))
+        if current['error_rate'] > before['error_rate'] + tolerance / 10:
+            regressions.append((name, 'error_rate', before['error_rate'], current['error_rate'],
+                                current['error_rate'] - before['error_rate']))
+    return regressions
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from add_sample_data import create_sample_data
+from main.bench import isolated_database, percentile
+from main.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Compare sync (WSGI) and async (ASGI) catalog views under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=20,
+                            help='Copies of the sample catalog to load')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[100, 500, 1000],
+                            help='Concurrent connections to simulate')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per run')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Clear the cache before each request so every view hits the ORM')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        self.no_cache = options['no_cache']
+        with isolated_database():
+            create_sample_data(scale=options['scale'])
+            urls = [reverse('home'), reverse('products')]
+            urls += [reverse('product_detail', args=[pk])
+                     for pk in Product.objects.values_list('id', flat=True)[:20]]
+
+            rows = []
+            for concurrency in options['concurrency']:
+                cache.clear()
+                rows.append(('wsgi', concurrency, *self.run_wsgi(urls, options['requests'], concurrency)))
+                cache.clear()
+                with override_settings(ROOT_URLCONF='Shop.urls_async', ALLOWED_HOSTS=['testserver']):
+                    rows.append(('asgi', concurrency,
+                                 *asyncio.run(self.run_asgi(urls, options['requests'], concurrency))))
+
+        self.stdout.write(f"{'app':<6}{'conns':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for app, concurrency, rps, p50, p95 in rows:
+            self.stdout.write(f'{app:<6}{concurrency:>7}{rps:>10.1f}{p50:>10.2f}{p95:>10.2f}')
+        self.stdout.write('Both apps run in-process through the test clients; SQLite queries from '
+                          'async views are serialized on a single thread.')
+
+    def summarize(self, latencies, elapsed):
+        return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 95)
+
+    def run_wsgi(self, urls, total, concurrency):
+        def fetch(i):
+            if self.no_cache:
+                cache.clear()
+            began = time.perf_counter()
+            response = Client(HTTP_HOST='localhost').get(urls[i % len(urls)])
+            assert response.status_code == 200, response.status_code
+            return (time.perf_counter() - began) * 1000
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(fetch, range(total)))
+        return self.summarize(latencies, time.perf_counter() - began)
+
+    async def run_asgi(self, urls, total, concurrency):
+        slots = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def fetch(i):
+            async with slots:
+                if self.no_cache:
+                    cache.clear()
+                began = time.perf_counter()
+                response = await client.get(urls[i % len(urls)])
+                assert response.status_code == 200, response.status_code
+                return (time.perf_counter() - began) * 1000
+
+        began = time.perf_counter()
+        latencies = await asyncio.gather(*(fetch(i) for i in range(total)))
+        return self.summarize(latencies, time.perf_counter() - began)
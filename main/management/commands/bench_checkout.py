@@ -0,0 +1,104 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from main.bench import isolated_database, percentile
+from main.models import Cart, CartItem, Category, Order, Product
+from main.services import InsufficientStock, place_order
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent checkouts of the same SKUs on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=50, help='Parallel buyer threads')
+        parser.add_argument('--orders', type=int, default=20, help='Orders placed per buyer')
+        parser.add_argument('--skus', type=int, default=3, help='Shared products in every cart')
+        parser.add_argument('--stock', type=int, default=None,
+                            help='Starting stock per SKU (default: enough for every order)')
+
+    def handle(self, *args, **options):
+        buyers = options['buyers']
+        orders_per_buyer = options['orders']
+        stock = options['stock']
+        if stock is None:
+            stock = buyers * orders_per_buyer
+
+        with isolated_database():
+            category = Category.objects.create(name='Bench')
+            products = Product.objects.bulk_create([
+                Product(name=f'Bench SKU {i}', category=category,
+                        price=Decimal('100.00'), stock=stock)
+                for i in range(options['skus'])
+            ])
+            users = User.objects.bulk_create([
+                User(username=f'buyer{i}@bench.local') for i in range(buyers)
+            ])
+            carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+
+            latencies = []
+            counts = {'placed': 0, 'rejected': 0, 'errors': 0}
+            lock = threading.Lock()
+            start_gate = threading.Barrier(buyers)
+
+            def buyer(user, cart):
+                local_latencies = []
+                local = {'placed': 0, 'rejected': 0, 'errors': 0}
+                try:
+                    start_gate.wait()
+                    for _ in range(orders_per_buyer):
+                        CartItem.objects.bulk_create([
+                            CartItem(cart=cart, product=product, quantity=1)
+                            for product in products
+                        ])
+                        began = time.perf_counter()
+                        try:
+                            place_order(user, 'Bench address', '0000000000')
+                            local['placed'] += 1
+                        except InsufficientStock:
+                            CartItem.objects.filter(cart=cart).delete()
+                            local['rejected'] += 1
+                        except OperationalError:
+                            CartItem.objects.filter(cart=cart).delete()
+                            local['errors'] += 1
+                        local_latencies.append(time.perf_counter() - began)
+                finally:
+                    connections.close_all()
+                with lock:
+                    latencies.extend(local_latencies)
+                    for key, value in local.items():
+                        counts[key] += value
+
+            threads = [
+                threading.Thread(target=buyer, args=(user, cart))
+                for user, cart in zip(users, carts)
+            ]
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+            remaining = {p.id: p.stock for p in Product.objects.filter(id__in=[p.id for p in products])}
+            placed_in_db = Order.objects.count()
+
+        self.stdout.write(f'Buyers: {buyers}  orders/buyer: {orders_per_buyer}  '
+                          f'SKUs: {len(products)}  stock/SKU: {stock}')
+        self.stdout.write(f'Placed: {counts["placed"]}  rejected (out of stock): {counts["rejected"]}  '
+                          f'errors: {counts["errors"]}')
+        self.stdout.write(f'Wall time: {elapsed:.2f}s  throughput: {counts["placed"] / elapsed:.1f} orders/s')
+        self.stdout.write(f'Checkout latency p50={percentile(latencies, 50) * 1000:.1f}ms '
+                          f'p95={percentile(latencies, 95) * 1000:.1f}ms '
+                          f'p99={percentile(latencies, 99) * 1000:.1f}ms')
+
+        oversold = any(value < 0 for value in remaining.values())
+        consistent = all(stock - value == placed_in_db for value in remaining.values())
+        if oversold or not consistent:
+            self.stdout.write(self.style.ERROR(f'Stock mismatch: {remaining} for {placed_in_db} orders'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Stock consistent: no lost updates, nothing oversold'))
@@ -0,0 +1,65 @@
+import gzip
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from main.bench import isolated_database, percentile
+from main.models import Category, Order, Product
+from main.testing import seed_shop
+
+
+class Command(BaseCommand):
+    help = 'Bytes and CPU per repeat visit with and without conditional GET'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=20,
+                            help='Copies of the sample catalog to load')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per page and mode')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        with isolated_database():
+            customer = seed_shop(scale=options['scale'], users=1, orders=1)[0]
+            product = Product.objects.filter(is_active=True).first()
+            category = Category.objects.first()
+            order = Order.objects.filter(user=customer).first()
+            pages = [
+                ('products', reverse('products'), False),
+                ('products?category', reverse('products') + f'?category={category.id}', False),
+                ('product_detail', reverse('product_detail', args=[product.id]), False),
+                ('product_detail*', reverse('product_detail', args=[product.id]), True),
+                ('order_confirm*', reverse('order_confirmation', args=[order.id]), True),
+            ]
+            anonymous = Client(HTTP_HOST='localhost')
+            shopper = Client(HTTP_HOST='localhost')
+            shopper.force_login(customer)
+
+            self.stdout.write(f"{'page':<19}{'200 bytes':>10}{'gz':>8}{'304 bytes':>10}"
+                              f"{'200 cpu ms':>12}{'304 cpu ms':>12}{'cpu saved':>11}")
+            for name, url, logged_in in pages:
+                client = shopper if logged_in else anonymous
+                first = client.get(url)
+                assert first.status_code == 200, (url, first.status_code)
+                full_cpu = self.run(client, url, {}, 200, options['requests'])
+                revalidate_cpu = self.run(client, url, {'If-None-Match': first['ETag']}, 304,
+                                          options['requests'])
+                not_modified = client.get(url, headers={'If-None-Match': first['ETag']})
+                self.stdout.write(
+                    f'{name:<19}{len(first.content):>10}{len(gzip.compress(first.content)):>8}'
+                    f'{len(not_modified.content):>10}{full_cpu:>12.2f}{revalidate_cpu:>12.2f}'
+                    f'{1 - revalidate_cpu / full_cpu:>11.0%}'
+                )
+        self.stdout.write('Full responses are timed with warm caches; * = logged in. Bytes are '
+                          'the response body; headers are the same either way.')
+
+    def run(self, client, url, headers, status, total):
+        timings = []
+        for _ in range(total):
+            began = time.process_time()
+            response = client.get(url, headers=headers)
+            timings.append((time.process_time() - began) * 1000)
+            assert response.status_code == status, (url, response.status_code)
+        return percentile(timings, 50)
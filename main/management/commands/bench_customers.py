@@ -0,0 +1,103 @@
+import logging
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Min, Q, Sum
+from django.test import Client
+from django.urls import reverse
+
+from adminapp.views import CUSTOMER_SORTS, CUSTOMERS_PER_PAGE
+from main.bench import isolated_database, percentile
+from main.models import CustomerStats, Order
+from main.pagination import KeysetPage
+from main.rollups import COUNTED_STATUSES, rebuild_customer_stats
+
+SEARCHES = ['customer1', 'customer42', 'customer99999', 'nobody']
+
+
+class Command(BaseCommand):
+    help = 'Time the admin customer directory against aggregating orders per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000)
+        parser.add_argument('--orders', type=int, default=500000)
+        parser.add_argument('--requests', type=int, default=40, help='Requests per page kind')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        with isolated_database():
+            began = time.perf_counter()
+            self.seed(options['users'], options['orders'])
+            self.stdout.write(f"{options['users']} users, {options['orders']} orders "
+                              f"seeded in {time.perf_counter() - began:.1f}s")
+            began = time.perf_counter()
+            rebuild_customer_stats()
+            self.stdout.write(f'rebuild_customer_stats: {time.perf_counter() - began:.1f}s')
+
+            staff = User.objects.create_user(username='staff@bench.local', is_staff=True)
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(staff)
+            url = reverse('admin_users')
+            pages = {
+                'newest': [url],
+                'spend': [url + '?sort=spend'],
+                'search': [f'{url}?search={term}' for term in SEARCHES],
+            }
+            # The next page of the spend sort, to show cursors cost the same
+            first = KeysetPage(CustomerStats.objects.all(), CUSTOMER_SORTS['spend'],
+                               per_page=CUSTOMERS_PER_PAGE)
+            pages['spend p2'] = [f'{url}?sort=spend&after={first.next_cursor}']
+
+            self.stdout.write(f"{'page':<16}{'p50 ms':>9}{'p95 ms':>9}")
+            for name, urls in pages.items():
+                timings = []
+                for i in range(options['requests']):
+                    began = time.perf_counter()
+                    response = client.get(urls[i % len(urls)])
+                    timings.append((time.perf_counter() - began) * 1000)
+                    assert response.status_code == 200, response.status_code
+                self.stdout.write(f'{name:<16}{percentile(timings, 50):>9.1f}'
+                                  f'{percentile(timings, 95):>9.1f}')
+
+            began = time.perf_counter()
+            self.aggregated_page()
+            self.stdout.write(f"{'aggregate/req':<16}{(time.perf_counter() - began) * 1000:>9.1f}"
+                              '  (stats computed from Order, top spenders page)')
+
+            self.stdout.write('Search plan:')
+            prefix = 'customer1'
+            self.stdout.write(CustomerStats.objects.filter(
+                Q(username__gte=prefix, username__lt=prefix + '\U0010ffff')
+                | Q(email__gte=prefix, email__lt=prefix + '\U0010ffff')
+            ).order_by('username', 'user_id')[:51].explain())
+
+    def aggregated_page(self):
+        counted = Q(orders__status__in=COUNTED_STATUSES)
+        return list(
+            User.objects.annotate(order_count=Count('orders', filter=counted),
+                                  lifetime_spend=Sum('orders__total_price', filter=counted),
+                                  last_order_at=Max('orders__created_at', filter=counted))
+            .order_by('-lifetime_spend', '-id')[:50]
+        )
+
+    def seed(self, users, orders):
+        rng = random.Random(22)
+        batch = 20000
+        for start in range(0, users, batch):
+            User.objects.bulk_create([
+                User(username=f'customer{i}@bench.local', email=f'customer{i}@bench.local',
+                     password='!')
+                for i in range(start, min(users, start + batch))
+            ], batch_size=2000)
+        ids = User.objects.aggregate(low=Min('id'), high=Max('id'))
+        statuses = [value for value, label in Order.STATUS_CHOICES]
+        for start in range(0, orders, batch):
+            Order.objects.bulk_create([
+                Order(user_id=rng.randint(ids['low'], ids['high']),
+                      total_price=Decimal(rng.randint(500, 20000)), status=rng.choice(statuses),
+                      shipping_address='Bench address', phone='0000000000')
+                for _ in range(min(batch, orders - start))
+            ], batch_size=2000)
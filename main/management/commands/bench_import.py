@@ -0,0 +1,78 @@
+import csv
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.bench import isolated_database
+from main.catalog_import import CatalogImporter, read_rows
+from main.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Time import_catalog on a generated catalog: full load, then a price-and-stock refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Products in the generated catalog')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per transaction')
+        parser.add_argument('--naive-rows', type=int, default=2000,
+                            help='Rows refreshed one save() at a time for comparison')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        tmpdir = tempfile.mkdtemp(prefix='shop-import-')
+        rng = random.Random(19)
+        try:
+            full = os.path.join(tmpdir, 'catalog.csv')
+            refresh = os.path.join(tmpdir, 'refresh.csv')
+            self.write_csv(full, ['sku', 'name', 'category', 'price', 'stock', 'description'], (
+                [f'SKU{i:07d}', f'Bench shoe {i}', f'Category {i % 12}',
+                 f'{rng.uniform(20, 300):.2f}', rng.randrange(100), f'Generated product number {i}']
+                for i in range(options['rows'])
+            ))
+            self.write_csv(refresh, ['sku', 'price', 'stock'], (
+                [f'SKU{i:07d}', f'{rng.uniform(20, 300):.2f}', rng.randrange(100)]
+                for i in range(options['rows'])
+            ))
+
+            with isolated_database():
+                results = [('full load', self.run(full, options)),
+                           ('refresh', self.run(refresh, options))]
+                naive = self.naive(options['naive_rows'], rng)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write(f"{'run':<16}{'rows':>9}{'created':>9}{'updated':>9}{'seconds':>9}{'rows/s':>9}")
+        for name, stats in results:
+            self.stdout.write(f"{name:<16}{stats['rows']:>9}{stats['created']:>9}{stats['updated']:>9}"
+                              f"{stats['seconds']:>9.2f}{stats['rows'] / stats['seconds']:>9.0f}")
+        self.stdout.write(f"{'refresh, save()':<16}{options['naive_rows']:>9}{0:>9}{options['naive_rows']:>9}"
+                          f"{naive:>9.2f}{options['naive_rows'] / naive:>9.0f}")
+        self.stdout.write(f'At that rate save() would need {options["rows"] / options["naive_rows"] * naive:.0f}s '
+                          f'for the {options["rows"]}-row refresh.')
+
+    def write_csv(self, path, header, rows):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def run(self, path, options):
+        with open(path, newline='') as f:
+            stats = CatalogImporter(batch_size=options['batch_size']).run(read_rows(f, 'csv'))
+        assert not stats['errors'], stats
+        return stats
+
+    def naive(self, rows, rng):
+        """The per-row alternative: look each SKU up and save() it"""
+        began = time.perf_counter()
+        for i in range(rows):
+            product = Product.objects.get(sku=f'SKU{i:07d}')
+            product.price = f'{rng.uniform(20, 300):.2f}'
+            product.stock = rng.randrange(100)
+            product.save()
+        return time.perf_counter() - began
@@ -0,0 +1,74 @@
+import logging
+import random
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from main.bench import isolated_database
+from main.models import Category, Order, OrderItem, Product
+from main.recommendations import (
+    RELATED_LIMIT, build_recommendations, stored_recommendations, vectorized_available,
+)
+
+
+class Command(BaseCommand):
+    help = 'Time build_recommendations on generated order history with each engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=300000)
+        parser.add_argument('--window', type=int, default=50000, help='Order ids read per query')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        with isolated_database():
+            lines = self.seed(options)
+            self.stdout.write(f"{options['orders']} orders, {lines} order lines, "
+                              f"{options['products']} products")
+            engines = [False] + ([True] if vectorized_available() else [])
+            self.stdout.write(f"{'engine':<8}{'seconds':>9}{'peak MB':>9}{'rows':>9}")
+            for vectorized in engines:
+                stats = build_recommendations(window=options['window'], vectorized=vectorized)
+                # Traced separately: tracemalloc roughly doubles the run time
+                tracemalloc.start()
+                build_recommendations(window=options['window'], vectorized=vectorized)
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+                self.stdout.write(f"{'numpy' if vectorized else 'python':<8}{stats['seconds']:>9.2f}"
+                                  f"{peak:>9.1f}{stats['rows']:>9}")
+            if not vectorized_available():
+                self.stdout.write('NumPy/SciPy not installed: only the pure-Python engine ran.')
+
+            product = Product.objects.order_by('id').first()
+            self.stdout.write('product_detail lookup plan:')
+            self.stdout.write(stored_recommendations(product)[:RELATED_LIMIT].explain())
+
+    def seed(self, options):
+        """Orders drawn from overlapping "outfits" of products, so there is
+        real co-purchase structure to find"""
+        rng = random.Random(21)
+        categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(20)])
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', category=categories[i % 20], price=Decimal('10.00'), stock=10)
+            for i in range(options['products'])
+        ], batch_size=1000)
+        outfits = [rng.sample(products, 8) for _ in range(options['products'] // 4)]
+        user = User.objects.create_user(username='bench@bench.local')
+        lines = 0
+        batch = 20000
+        for start in range(0, options['orders'], batch):
+            orders = Order.objects.bulk_create([
+                Order(user=user, total_price=Decimal('0'), status='delivered',
+                      shipping_address='Bench address', phone='0000000000')
+                for _ in range(min(batch, options['orders'] - start))
+            ], batch_size=1000)
+            items = []
+            for order in orders:
+                outfit = rng.choice(outfits)
+                basket = rng.sample(outfit, rng.randint(1, 4)) + rng.sample(products, rng.randint(0, 2))
+                items += [OrderItem(order=order, product=p, quantity=1, price=p.price) for p in set(basket)]
+            OrderItem.objects.bulk_create(items, batch_size=2000)
+            lines += len(items)
+        return lines
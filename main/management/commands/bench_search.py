@@ -0,0 +1,92 @@
+import logging
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from main.bench import isolated_database, percentile
+from main.models import Category, Product
+from main.search import Fts5Engine, MemoryEngine, fts5_available
+
+BRANDS = ['Nike', 'Adidas', 'Puma', 'Reebok', 'Asics', 'Vans', 'Converse', 'Skechers',
+          'Bata', 'Woodland', 'Crocs', 'Fila', 'Campus', 'Sparx', 'Liberty', 'Red Tape']
+STYLES = ['Running', 'Sneaker', 'Loafer', 'Boot', 'Sandal', 'Slipper', 'Trainer', 'Oxford',
+          'Derby', 'Moccasin', 'Slip-On', 'High-Top', 'Walking', 'Hiking', 'Court', 'Basketball']
+COLOURS = ['Black', 'White', 'Red', 'Blue', 'Grey', 'Brown', 'Tan', 'Navy', 'Olive', 'Beige']
+WORDS = ['comfortable', 'lightweight', 'cushioned', 'breathable', 'durable', 'leather', 'mesh',
+         'suede', 'rubber', 'sole', 'grip', 'everyday', 'classic', 'premium', 'casual', 'sport']
+QUERIES = ['nike', 'run', 'black sneaker', 'leath', 'adidas runn', 'men', 'women boot',
+           'breathable mesh', 'red', 'slip', 'puma trainer white', 'zzz']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product search engines against icontains on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000,
+                            help='Synthetic products to index')
+        parser.add_argument('--rounds', type=int, default=20,
+                            help='Times each query is run per engine')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        rng = random.Random(42)
+        with isolated_database():
+            self.load_catalog(options['products'], rng)
+            engines = [('icontains', self.icontains)]
+            memory = MemoryEngine()
+            began = time.perf_counter()
+            memory.rebuild()
+            self.stdout.write(f'memory index built in {time.perf_counter() - began:.2f}s')
+            engines.append(('memory', memory.search))
+            if fts5_available():
+                fts5 = Fts5Engine()
+                began = time.perf_counter()
+                fts5.rebuild()
+                self.stdout.write(f'fts5 index built in {time.perf_counter() - began:.2f}s')
+                engines.append(('fts5', fts5.search))
+            else:
+                self.stdout.write(self.style.WARNING('FTS5 unavailable in this SQLite build'))
+
+            results = {name: self.run(search, options['rounds']) for name, search in engines}
+
+        self.stdout.write(f"{'engine':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, timings in results.items():
+            self.stdout.write(
+                f'{name:<12}{percentile(timings, 50):>10.2f}'
+                f'{percentile(timings, 95):>10.2f}{max(timings):>10.2f}'
+            )
+
+    def load_catalog(self, total, rng):
+        categories = [Category.objects.create(name=name) for name in ('Men', 'Women', 'Unisex')]
+        batch = []
+        for i in range(total):
+            name = f'{rng.choice(BRANDS)} {rng.choice(COLOURS)} {rng.choice(STYLES)} {i}'
+            batch.append(Product(
+                name=name,
+                category=rng.choice(categories),
+                price=rng.randint(499, 14999),
+                description=' '.join(rng.choices(WORDS, k=12)),
+                stock=rng.randint(0, 50),
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+    def icontains(self, query, limit):
+        # What the admin product search used to do (substring match on the whole phrase)
+        return list(
+            Product.objects.filter(Q(name__icontains=query) | Q(category__name__icontains=query))
+            .values_list('id', flat=True)[:limit]
+        )
+
+    def run(self, search, rounds):
+        timings = []
+        for _ in range(rounds):
+            for query in QUERIES:
+                began = time.perf_counter()
+                search(query, 48)
+                timings.append((time.perf_counter() - began) * 1000)
+        return timings
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from add_sample_data import create_sample_data
+from main.bench import isolated_database, percentile
+from main.models import Cart, CartItem, Category, Product
+from main.services import InsufficientStock, place_order
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# The pre-tuning configuration: rollback journal, full fsync, a fresh
+# connection per request and every read on the writable connection
+BASELINE = {
+    'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 20000},
+    'conn_max_age': 0,
+    'routers': [],
+}
+
+
+def _init_command(pragmas):
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+class Command(BaseCommand):
+    help = 'Measure checkout write throughput and catalog read latency under contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=5,
+                            help='Copies of the sample catalog to load')
+        parser.add_argument('--writers', type=int, default=8, help='Threads placing orders')
+        parser.add_argument('--readers', type=int, default=8, help='Threads browsing the catalog')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        tuned = {
+            'pragmas': settings.SQLITE_PRAGMAS,
+            'conn_max_age': settings.CONN_MAX_AGE,
+            'routers': settings.DATABASE_ROUTERS,
+        }
+        self.aliases = [alias for alias in ('default', 'readonly') if alias in connections]
+        self.saved = {alias: (connections[alias].settings_dict['CONN_MAX_AGE'],
+                              dict(connections[alias].settings_dict['OPTIONS']))
+                      for alias in self.aliases}
+
+        with isolated_database(), override_settings(CACHES=NO_CACHE):
+            create_sample_data(scale=options['scale'])
+            Product.objects.update(stock=10 ** 6)
+            category = Category.objects.first()
+            self.skus = list(Product.objects.filter(category=category)[:3])
+            self.urls = [reverse('products'), reverse('home')]
+            self.urls += [reverse('product_detail', args=[pk])
+                          for pk in Product.objects.values_list('id', flat=True)[:10]]
+            try:
+                results = [('baseline', self.run(BASELINE, options)),
+                           ('tuned', self.run(tuned, options))]
+            finally:
+                self.configure(None)
+
+        self.stdout.write(f"{'mode':<10}{'orders/s':>10}{'write p95':>11}{'locked':>8}"
+                          f"{'reads/s':>9}{'read p50':>10}{'read p95':>10}{'read p99':>10}")
+        for mode, r in results:
+            self.stdout.write(
+                f"{mode:<10}{r['orders'] / r['elapsed']:>10.1f}{percentile(r['writes'], 95):>11.1f}"
+                f"{r['locked']:>8}{len(r['reads']) / r['elapsed']:>9.1f}"
+                f"{percentile(r['reads'], 50):>10.1f}{percentile(r['reads'], 95):>10.1f}"
+                f"{percentile(r['reads'], 99):>10.1f}"
+            )
+        self.stdout.write('Latencies in ms. "locked" counts checkouts that failed with '
+                          '"database is locked".')
+
+    def configure(self, config):
+        """Apply a configuration to every alias (None restores settings)"""
+        connections.close_all()
+        for alias in self.aliases:
+            settings_dict = connections[alias].settings_dict
+            conn_max_age, options = self.saved[alias]
+            settings_dict['CONN_MAX_AGE'] = conn_max_age
+            settings_dict['OPTIONS'] = dict(options)
+            if config is not None:
+                settings_dict['CONN_MAX_AGE'] = config['conn_max_age']
+                init_command = _init_command(config['pragmas'])
+                if alias != 'default':
+                    init_command += ';PRAGMA query_only=ON'
+                settings_dict['OPTIONS']['init_command'] = init_command
+        if config is not None:
+            # journal_mode is stored in the file; switch it while idle
+            connections['default'].ensure_connection()
+
+    def run(self, config, options):
+        self.configure(config)
+        with override_settings(DATABASE_ROUTERS=config['routers']):
+            users = User.objects.bulk_create([
+                User(username=f'writer{i}-{time.monotonic_ns()}@bench.local')
+                for i in range(options['writers'])
+            ])
+            carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+            result = {'orders': 0, 'locked': 0, 'writes': [], 'reads': []}
+            lock = threading.Lock()
+            stop = threading.Event()
+
+            def writer(user, cart):
+                orders, locked, latencies = 0, 0, []
+                try:
+                    while not stop.is_set():
+                        began = time.perf_counter()
+                        try:
+                            CartItem.objects.bulk_create([
+                                CartItem(cart=cart, product=product, quantity=1) for product in self.skus
+                            ])
+                            place_order(user, 'Bench address', '0000000000')
+                            orders += 1
+                        except (OperationalError, InsufficientStock):
+                            locked += 1
+                            CartItem.objects.filter(cart=cart).delete()
+                        latencies.append((time.perf_counter() - began) * 1000)
+                        close_old_connections()
+                finally:
+                    connections.close_all()
+                with lock:
+                    result['orders'] += orders
+                    result['locked'] += locked
+                    result['writes'] += latencies
+
+            def reader(offset):
+                client = Client(HTTP_HOST='localhost')
+                latencies = []
+                i = offset
+                try:
+                    while not stop.is_set():
+                        began = time.perf_counter()
+                        response = client.get(self.urls[i % len(self.urls)])
+                        assert response.status_code == 200, response.status_code
+                        latencies.append((time.perf_counter() - began) * 1000)
+                        i += 1
+                finally:
+                    connections.close_all()
+                with lock:
+                    result['reads'] += latencies
+
+            threads = [threading.Thread(target=writer, args=pair) for pair in zip(users, carts)]
+            threads += [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(options['seconds'])
+            stop.set()
+            for thread in threads:
+                thread.join()
+            result['elapsed'] = time.perf_counter() - began
+        return result
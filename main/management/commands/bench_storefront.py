@@ -0,0 +1,55 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from add_sample_data import create_sample_data
+from main.bench import isolated_database
+from main.models import Category, Product
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark anonymous catalog browsing with and without the catalog cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=20,
+                            help='Copies of the sample catalog to load')
+        parser.add_argument('--requests', type=int, default=300,
+                            help='Requests per mode')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        with isolated_database():
+            create_sample_data(scale=options['scale'])
+            urls = [reverse('home'), reverse('products')]
+            urls += [reverse('products') + f'?category={c.name}' for c in Category.objects.all()]
+            urls += [reverse('product_detail', args=[pk])
+                     for pk in Product.objects.values_list('id', flat=True)[:20]]
+
+            with override_settings(CACHES=NO_CACHE):
+                uncached = self.run(urls, options['requests'])
+            cache.clear()
+            self.run(urls, len(urls))  # warm up
+            cached = self.run(urls, options['requests'])
+
+        self.stdout.write(f"{'mode':<10}{'req/s':>10}{'ms/req':>10}{'queries/req':>14}")
+        for mode, (rps, ms, queries) in (('uncached', uncached), ('cached', cached)):
+            self.stdout.write(f'{mode:<10}{rps:>10.1f}{ms:>10.2f}{queries:>14.2f}')
+        self.stdout.write(self.style.SUCCESS(f'Speed-up: {cached[0] / uncached[0]:.1f}x'))
+
+    def run(self, urls, total):
+        client = Client(HTTP_HOST='localhost')
+        with CaptureQueriesContext(connection) as queries:
+            began = time.perf_counter()
+            for i in range(total):
+                response = client.get(urls[i % len(urls)])
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - began
+        return total / elapsed, elapsed / total * 1000, len(queries) / total
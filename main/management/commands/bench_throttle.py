@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from main.bench import isolated_database, percentile
+from main.testing import TEST_PASSWORD, make_shopper
+
+
+class Command(BaseCommand):
+    help = 'Simulate a credential-stuffing burst on login with and without throttling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attackers', type=int, default=16, help='Attacking threads')
+        parser.add_argument('--ips', type=int, default=2, help='Source addresses the attack uses')
+        parser.add_argument('--accounts', type=int, default=200, help='Targeted accounts')
+        parser.add_argument('--seconds', type=float, default=30, help='Duration of each run')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        # Each 429 would otherwise log a warning
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with isolated_database():
+            password = make_password(TEST_PASSWORD)
+            accounts = [f'victim{i}@bench.local' for i in range(options['accounts'])]
+            User.objects.bulk_create([User(username=email, email=email, password=password)
+                                      for email in accounts])
+            self.shopper = make_shopper('shopper@bench.local')
+            began = time.process_time()
+            check_password('wrong', password)
+            hash_cost = time.process_time() - began
+            self.accounts = accounts
+
+            with override_settings(THROTTLE_RULES={}):
+                unthrottled = self.run(options)
+            throttled = self.run(options)
+
+        self.stdout.write(f"{'mode':<13}{'attempts/s':>11}{'rejected':>10}{'hashes/s':>10}"
+                          f"{'hash cores':>12}{'shopper p50':>13}{'shopper p95':>13}")
+        for mode, r in (('unthrottled', unthrottled), ('throttled', throttled)):
+            self.stdout.write(
+                f"{mode:<13}{r['attempts'] / r['elapsed']:>11.1f}{r['rejected']:>10}"
+                f"{r['hashes'] / r['elapsed']:>10.1f}{r['hashes'] * hash_cost / r['elapsed']:>12.2f}"
+                f"{percentile(r['shopper'], 50):>13.1f}{percentile(r['shopper'], 95):>13.1f}"
+            )
+        self.stdout.write(f'One password hash costs {hash_cost * 1000:.0f}ms of CPU; "hash cores" is the '
+                          'CPU spent hashing per wall-clock second. Shopper latencies (ms) are for '
+                          'a real customer logging in during the attack.')
+
+    def run(self, options):
+        cache.clear()
+        result = {'attempts': 0, 'rejected': 0, 'hashes': 0, 'shopper': []}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def attacker(n):
+            client = Client(HTTP_HOST='localhost', REMOTE_ADDR=f'203.0.113.{n % options["ips"] + 1}')
+            attempts = rejected = 0
+            i = n
+            try:
+                while not stop.is_set():
+                    response = client.post(reverse('login'), {
+                        'email': self.accounts[i % len(self.accounts)], 'password': f'guess-{i}',
+                    })
+                    attempts += 1
+                    rejected += response.status_code == 429
+                    i += options['attackers']
+            finally:
+                connections.close_all()
+            with lock:
+                result['attempts'] += attempts
+                result['rejected'] += rejected
+                # Every request that got past the throttle hashed a password
+                result['hashes'] += attempts - rejected
+
+        def shopper():
+            client = Client(HTTP_HOST='localhost', REMOTE_ADDR='198.51.100.7')
+            try:
+                while not stop.is_set():
+                    began = time.perf_counter()
+                    response = client.post(reverse('login'), {
+                        'email': self.shopper.username, 'password': TEST_PASSWORD,
+                    })
+                    assert response.status_code == 302, response.status_code
+                    result['shopper'].append((time.perf_counter() - began) * 1000)
+                    stop.wait(0.5)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=attacker, args=(n,)) for n in range(options['attackers'])]
+        threads.append(threading.Thread(target=shopper))
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        result['elapsed'] = time.perf_counter() - began
+        return result
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.recommendations import ORDER_WINDOW, build_recommendations, vectorized_available
+
+
+class Command(BaseCommand):
+    help = 'Recompute "bought together" recommendations for every product from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=ORDER_WINDOW,
+                            help='Order ids read per query (bounds memory)')
+        parser.add_argument('--engine', choices=['auto', 'numpy', 'python'], default='auto',
+                            help='Co-occurrence counter (default: numpy when installed)')
+
+    def handle(self, *args, **options):
+        vectorized = {'auto': None, 'numpy': True, 'python': False}[options['engine']]
+        if vectorized and not vectorized_available():
+            raise CommandError('NumPy and SciPy are not installed')
+        stats = build_recommendations(window=options['window'], vectorized=vectorized)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stats['rows']} recommendations for {stats['products']} products "
+            f"({stats['with_history']} with order history) in {stats['seconds']:.2f}s"
+        ))
@@ -0,0 +1,50 @@
+import re
+import textwrap
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+STYLE_RE = re.compile(r'^([ \t]*)<style>\n?(.*?)^[ \t]*</style>[ \t]*\n', re.S | re.M)
+# A <style> left open runs to </head> (browsers would swallow the page)
+UNCLOSED_STYLE_RE = re.compile(r'^([ \t]*)<style>\n?(.*?)(?=^[ \t]*</head>)', re.S | re.M)
+STATIC_TAG_RE = re.compile(r"""\{%\s*static\s+['"]([^'"]+)['"]\s*%\}""")
+LOAD_STATIC_RE = re.compile(r'\{%\s*load\s+[^%]*\bstatic\b[^%]*%\}')
+
+
+class Command(BaseCommand):
+    help = ('Move inline <style> blocks out of templates into static/css/<template>.css '
+            'and link them with {% static %} so browsers can cache them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be extracted without writing')
+
+    def handle(self, *args, **options):
+        template_dir = Path(settings.BASE_DIR) / 'templates'
+        css_dir = Path(settings.BASE_DIR) / 'static' / 'css'
+        for path in sorted(template_dir.rglob('*.html')):
+            source = path.read_text()
+            match = STYLE_RE.search(source) or UNCLOSED_STYLE_RE.search(source)
+            if not match:
+                continue
+            indent, css = match.groups()
+            # Static references become relative to static/css/ so the
+            # manifest storage can rewrite them to hashed names
+            css = STATIC_TAG_RE.sub(lambda m: f'../{m.group(1)}', css)
+            if '{%' in css or '{{' in css:
+                self.stderr.write(f'{path.relative_to(template_dir)}: template syntax in <style>, skipped')
+                continue
+
+            name = '-'.join(path.relative_to(template_dir).with_suffix('.css').parts)
+            css = textwrap.dedent(css).strip() + '\n'
+            link = f'{indent}<link href="{{% static \'css/{name}\' %}}" rel="stylesheet">\n'
+            updated = source[:match.start()] + link + source[match.end():]
+            if not LOAD_STATIC_RE.search(updated):
+                updated = '{% load static %}\n' + updated
+
+            self.stdout.write(f'{path.relative_to(template_dir)} -> static/css/{name} '
+                              f'({len(css.encode())} bytes)')
+            if not options['dry_run']:
+                (css_dir / name).write_text(css)
+                path.write_text(updated)
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.catalog_import import CatalogImporter, read_rows
+
+PROGRESS_EVERY = 50000
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or JSONL file, upserting on sku'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, or - for stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows written per transaction')
+        parser.add_argument('--images', metavar='DIR',
+                            help='Directory holding the files named in the image column')
+        parser.add_argument('--category-map', metavar='FILE',
+                            help='JSON object mapping source category names to store categories')
+        parser.add_argument('--no-create-categories', action='store_true',
+                            help='Reject rows whose category does not exist instead of creating it')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            if path == '-':
+                raise CommandError('--format is required when reading stdin')
+            fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if options['images'] and not os.path.isdir(options['images']):
+            raise CommandError(f"{options['images']} is not a directory")
+        category_map = None
+        if options['category_map']:
+            with open(options['category_map']) as f:
+                category_map = json.load(f)
+
+        self.reported = 0
+        importer = CatalogImporter(
+            batch_size=options['batch_size'], images_dir=options['images'],
+            category_map=category_map, create_categories=not options['no_create_categories'],
+        )
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            stats = importer.run(read_rows(stream, fmt), progress=self.progress)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, message in importer.errors:
+            self.stderr.write(f'line {line}: {message}')
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['rows']} rows in {stats['seconds']:.2f}s ({rate:.0f} rows/s): "
+            f"{stats['created']} created, {stats['updated']} updated, {stats['errors']} rejected"
+        ))
+        if stats['images']:
+            self.stdout.write(f"Copied {stats['images']} images; run rebuild_product_images --missing "
+                              'to render them')
+
+    def progress(self, stats, elapsed):
+        if stats['rows'] - self.reported >= PROGRESS_EVERY:
+            self.reported = stats['rows']
+            self.stdout.write(f"  {stats['rows']} rows ({stats['rows'] / elapsed:.0f} rows/s)")
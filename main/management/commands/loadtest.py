@@ -0,0 +1,187 @@
+import json
+import logging
+import multiprocessing
+import queue
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from main.bench import isolated_database
+from main.loadtest import DEFAULT_WEIGHTS, SCENARIOS, Recorder, compare, run_worker, summarize
+from main.models import Category, Product
+from main.testing import seed_shop
+
+LOCMEM_EMAIL = 'django.core.mail.backends.locmem.EmailBackend'
+# Seconds past --duration a worker may take to finish its last journey
+WORKER_GRACE = 120
+
+
+def _worker(index, emails, catalog, weights, seconds, mailbox, start_gate, results):
+    try:
+        start_gate.wait()
+        began = time.perf_counter()
+        recorder, completed, failed = run_worker(emails, catalog, weights, seconds, mailbox,
+                                                 seed=index)
+        results.put((dict(recorder.latencies), dict(recorder.errors), completed, failed,
+                     time.perf_counter() - began))
+    except Exception as e:
+        results.put(e)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Drive shopper journeys from several worker processes against a throwaway database '
+            'and report throughput and latency per URL name')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds each worker runs')
+        parser.add_argument('--shoppers', type=int, default=10, help='Customer accounts per worker')
+        defaults = ' '.join(f'{name}={weight}' for name, weight in DEFAULT_WEIGHTS.items())
+        parser.add_argument('--scenario', action='append', default=[], metavar='NAME=WEIGHT',
+                            help=f'Journey weight, repeatable; scenarios: {", ".join(SCENARIOS)} '
+                                 f'(default {defaults})')
+        parser.add_argument('--scale', type=int, default=5, help='Copies of the sample catalog')
+        parser.add_argument('--output', help='Write the JSON result here')
+        parser.add_argument('--baseline', help='JSON result of an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Allowed regression against the baseline, as a fraction')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep THROTTLE_RULES (every worker shares one client address)')
+
+    def handle(self, *args, **options):
+        weights = self.weights(options['scenario'])
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read baseline {options['baseline']}: {e}")
+
+        logging.getLogger('shop.perf').disabled = True
+        overrides = {'EMAIL_BACKEND': LOCMEM_EMAIL}
+        if not options['throttle']:
+            overrides['THROTTLE_RULES'] = {}
+        with isolated_database(), override_settings(**overrides):
+            workers = options['workers']
+            customers = seed_shop(scale=options['scale'], users=workers * options['shoppers'],
+                                  orders=workers * options['shoppers'])
+            # Nobody runs out of stock mid-run
+            Product.objects.update(stock=10 ** 6)
+            catalog = {
+                'products': list(Product.objects.filter(is_active=True)
+                                 .values_list('id', flat=True)),
+                'categories': list(Category.objects.values_list('id', flat=True)),
+            }
+            emails = [user.username for user in customers]
+            self.stdout.write(f"{workers} workers x {options['duration']:g}s, "
+                              f"{len(emails)} shoppers, {len(catalog['products'])} products, "
+                              f"weights {weights}")
+            recorder, journeys, elapsed = self.run(workers, emails, catalog, weights,
+                                                   options['duration'])
+
+        result = summarize(recorder, elapsed)
+        result['journeys'] = journeys
+        result['config'] = {
+            'workers': workers, 'duration': options['duration'], 'shoppers': options['shoppers'],
+            'scale': options['scale'], 'weights': weights, 'throttle': options['throttle'],
+        }
+        self.report(result)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(f"Result written to {options['output']}")
+        if baseline is not None:
+            self.compare(result, baseline, options['tolerance'])
+
+    def weights(self, pairs):
+        if not pairs:
+            return dict(DEFAULT_WEIGHTS)
+        weights = {}
+        for pair in pairs:
+            name, _, weight = pair.partition('=')
+            if name not in SCENARIOS:
+                raise CommandError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+            try:
+                weights[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight in {pair!r}')
+            if weights[name] < 0:
+                raise CommandError(f'Invalid weight in {pair!r}')
+        if not any(weights.values()):
+            raise CommandError('At least one scenario needs a positive weight')
+        return weights
+
+    def run(self, workers, emails, catalog, weights, seconds):
+        # Forked workers share the seeded database file; none may inherit
+        # an open connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        manager = context.Manager()
+        mailbox = manager.dict()
+        start_gate = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(
+                index, emails[index::workers], catalog, weights, seconds, mailbox,
+                start_gate, results,
+            ))
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        recorder = Recorder()
+        journeys = {'completed': 0, 'failed': 0}
+        elapsed = 0.0
+        try:
+            for _ in processes:
+                try:
+                    outcome = results.get(timeout=seconds + WORKER_GRACE)
+                except queue.Empty:
+                    raise CommandError('A worker did not report back')
+                if isinstance(outcome, Exception):
+                    raise CommandError(f'Worker failed: {outcome!r}')
+                latencies, errors, completed, failed, seconds_run = outcome
+                part = Recorder()
+                part.latencies.update(latencies)
+                part.errors.update(errors)
+                recorder.merge(part)
+                journeys['completed'] += completed
+                journeys['failed'] += failed
+                elapsed = max(elapsed, seconds_run)
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            manager.shutdown()
+        return recorder, journeys, elapsed
+
+    def report(self, result):
+        self.stdout.write(f"{'url name':<20}{'requests':>9}{'req/s':>9}{'errors':>8}"
+                          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        rows = sorted(result['urls'].items()) + [('TOTAL', result['total'])]
+        for name, stats in rows:
+            self.stdout.write(f"{name:<20}{stats['requests']:>9}{stats['rps']:>9.1f}"
+                              f"{stats['error_rate']:>8.1%}{stats['p50_ms']:>9.1f}"
+                              f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        journeys = result['journeys']
+        self.stdout.write(f"Journeys: {journeys['completed']} completed, "
+                          f"{journeys['failed']} failed")
+
+    def compare(self, result, baseline, tolerance):
+        if baseline.get('config') != result['config']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline ran with different settings: {baseline.get('config')}"))
+        regressions = compare(result, baseline, tolerance)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'Within {tolerance:.0%} of the baseline'))
+            return
+        for name, metric, before, after, change in regressions:
+            self.stdout.write(self.style.ERROR(
+                f'{name} {metric}: {before} -> {after} ({change:+.1%})'))
+        raise CommandError(f'{len(regressions)} regression(s) against the baseline')
@@ -0,0 +1,69 @@
+import gzip
+import logging
+import re
+
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from add_sample_data import create_sample_data
+from main.bench import isolated_database
+from main.models import Product
+
+STYLE_RE = re.compile(rb'<style[^>]*>(.*?)(?:</style>|</head>)', re.S)
+STYLESHEET_RE = re.compile(rb'<link href="/static/([^"]+\.css)"[^>]*rel="stylesheet"')
+
+
+def _gz(data):
+    return len(gzip.compress(data, mtime=0))
+
+
+class Command(BaseCommand):
+    help = 'Report HTML and CSS bytes per page for first and repeat visits'
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        with isolated_database():
+            create_sample_data()
+            product = Product.objects.first()
+            staff = User.objects.create_user('staff@example.com', password='pw', is_staff=True)
+            pages = [
+                ('home', reverse('home'), None),
+                ('products', reverse('products'), None),
+                ('product_detail', reverse('product_detail', args=[product.id]), None),
+                ('search', reverse('search') + '?q=shoe', None),
+                ('aboutus', reverse('aboutus'), None),
+                ('login', reverse('login'), None),
+                ('register', reverse('register'), None),
+                ('view_cart', reverse('view_cart'), staff),
+                ('admin_dashboard', reverse('admin_dashboard'), staff),
+            ]
+            rows = [self.measure(*page) for page in pages]
+
+        self.stdout.write(
+            f"{'page':<16}{'html':>9}{'html gz':>9}{'inline css':>12}"
+            f"{'linked css gz':>15}{'first visit gz':>16}{'repeat gz':>11}"
+        )
+        for name, html, inline, linked in rows:
+            self.stdout.write(
+                f'{name:<16}{len(html):>9}{_gz(html):>9}{inline:>12}'
+                f'{linked:>15}{_gz(html) + linked:>16}{_gz(html):>11}'
+            )
+        self.stdout.write('Linked stylesheets are cached after the first visit; '
+                          'inline CSS is re-sent with every page.')
+
+    def measure(self, name, url, user):
+        client = Client(HTTP_HOST='localhost')
+        if user:
+            client.force_login(user)
+        html = client.get(url).content
+        inline = sum(len(block) for block in STYLE_RE.findall(html))
+        linked = 0
+        for href in dict.fromkeys(STYLESHEET_RE.findall(html)):
+            path = finders.find(href.decode())
+            if path:
+                with open(path, 'rb') as stylesheet:
+                    linked += _gz(stylesheet.read())
+        return name, html, inline, linked
@@ -0,0 +1,73 @@
+import glob
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.bench import percentile
+
+
+class Command(BaseCommand):
+    help = 'Summarise the PerformanceMiddleware log into latency percentiles per URL name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(settings.PERF_LOG_FILE),
+                            help='Log file; rotated siblings (.1, .2, ...) are included')
+        parser.add_argument('--sort', choices=['p50', 'p95', 'p99', 'count', 'total'], default='p95')
+        parser.add_argument('--limit', type=int, default=30)
+        parser.add_argument('--since', type=float, default=None,
+                            help='Only include requests after this UNIX timestamp')
+
+    def handle(self, *args, **options):
+        paths = sorted(glob.glob(glob.escape(options['file']) + '*'))
+        if not paths:
+            raise CommandError(f"No log found at {options['file']}")
+
+        rows = defaultdict(lambda: {'ms': [], 'db_queries': 0, 'db_ms': 0.0,
+                                    'template_ms': 0.0, 'email_ms': 0.0, 'errors': 0})
+        for path in paths:
+            with open(path) as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if options['since'] and entry['ts'] < options['since']:
+                        continue
+                    row = rows[entry['url_name'] or entry['path']]
+                    row['ms'].append(entry['ms'])
+                    row['db_queries'] += entry['db_queries']
+                    row['db_ms'] += entry['db_ms']
+                    row['template_ms'] += entry['template_ms']
+                    row['email_ms'] += entry['email_ms']
+                    if entry['status'] >= 500:
+                        row['errors'] += 1
+
+        summary = []
+        for name, row in rows.items():
+            count = len(row['ms'])
+            summary.append({
+                'name': name,
+                'count': count,
+                'p50': percentile(row['ms'], 50),
+                'p95': percentile(row['ms'], 95),
+                'p99': percentile(row['ms'], 99),
+                'total': sum(row['ms']),
+                'queries': row['db_queries'] / count,
+                'db': row['db_ms'] / count,
+                'tpl': row['template_ms'] / count,
+                'smtp': row['email_ms'] / count,
+                'errors': row['errors'],
+            })
+        summary.sort(key=lambda r: r[options['sort']], reverse=True)
+
+        header = (f"{'URL name':<36}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                  f"{'queries':>9}{'db ms':>9}{'tpl ms':>9}{'smtp ms':>9}{'5xx':>6}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for r in summary[:options['limit']]:
+            self.stdout.write(
+                f"{r['name'][:35]:<36}{r['count']:>8}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}"
+                f"{r['queries']:>9.1f}{r['db']:>9.1f}{r['tpl']:>9.1f}{r['smtp']:>9.1f}{r['errors']:>6}"
+            )
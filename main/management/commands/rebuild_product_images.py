@@ -0,0 +1,62 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from main.cache import invalidate_catalog
+from main.images import render_renditions
+from main.models import Product
+
+
+def _init_worker():
+    # Workers may be spawned rather than forked; make sure Django is ready
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail/card/detail renditions for every product image in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Worker processes (default: one per CPU)')
+        parser.add_argument('--missing', action='store_true',
+                            help='Only products without renditions')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if options['missing']:
+            products = products.filter(image_renditions={})
+        # Several products may share one file; render each file once
+        by_image = {}
+        for pk, image in products.values_list('id', 'image'):
+            by_image.setdefault(image, []).append(pk)
+
+        began = time.perf_counter()
+        renditions = {}
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = {pool.submit(render_renditions, image): image for image in by_image}
+            for future in as_completed(futures):
+                image = futures[future]
+                try:
+                    renditions[image] = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{image}: {e}')
+
+        updates = [
+            Product(pk=pk, image_renditions=result)
+            for image, result in renditions.items()
+            for pk in by_image[image]
+        ]
+        Product.objects.bulk_update(updates, ['image_renditions'], batch_size=500)
+        # bulk_update skips the signals that invalidate cached catalog pages
+        invalidate_catalog()
+
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {len(renditions)} images for {len(updates)} products '
+            f'in {elapsed:.2f}s ({failed} failed)'
+        ))
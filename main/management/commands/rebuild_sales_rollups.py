@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.rollups import rebuild_customer_stats, rebuild_daily_stats, rebuild_product_sales
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the OrderDailyStats sales rollups, ProductSalesStats and CustomerStats rows '
+            'from the order tables')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date on (YYYY-MM-DD); '
+                            'product sales and customer stats are then left as they are')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+        rows = rebuild_daily_stats(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} daily rollup rows'))
+        if since is None:
+            rows = rebuild_product_sales()
+            self.stdout.write(self.style.SUCCESS(f'Wrote {rows} product sales rows'))
+            rows = rebuild_customer_stats()
+            self.stdout.write(self.style.SUCCESS(f'Wrote {rows} customer stats rows'))
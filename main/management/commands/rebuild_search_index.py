@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.models import Product
+from main.search import get_engine
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from the catalog'
+
+    def handle(self, *args, **options):
+        engine = get_engine()
+        began = time.perf_counter()
+        engine.rebuild()
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Product.objects.count()} products with {engine.name} in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Cart
+from main.services import recompute_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached total_items/total_price columns on every cart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Carts updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Cart.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += recompute_cart_totals(Cart.objects.filter(id__in=ids))
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Recomputed totals for {updated} carts'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main.services import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Delete expired stock reservations in small batches, once or periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Reservations deleted per statement')
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help='Seconds between sweeps')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single sweep and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            removed = release_expired_reservations(options['batch_size'])
+            self.stdout.write(f'Released {removed} expired reservations')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
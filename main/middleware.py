@@ -0,0 +1,190 @@
+import contextvars
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import Template
+from django.utils.deprecation import MiddlewareMixin
+
+from .throttle import check_request
+
+perf_logger = logging.getLogger('shop.perf')
+
+# Timings for the request currently being handled on this thread/task
+_current = contextvars.ContextVar('shop_perf_timings', default=None)
+
+
+class _Timings:
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.email_time = 0.0
+        self.email_count = 0
+
+
+def _sql_timer(execute, sql, params, many, context):
+    timings = _current.get()
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_time += time.perf_counter() - began
+
+
+def _wrap_template_render(render):
+    def timed_render(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return render(self, *args, **kwargs)
+        # Only the outermost template counts; includes are part of it
+        timings.template_depth += 1
+        began = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_depth -= 1
+            if not timings.template_depth:
+                timings.template_time += time.perf_counter() - began
+    timed_render.__wrapped__ = render
+    return timed_render
+
+
+def _wrap_email_send(send):
+    def timed_send(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return send(self, *args, **kwargs)
+        began = time.perf_counter()
+        try:
+            return send(self, *args, **kwargs)
+        finally:
+            timings.email_count += 1
+            timings.email_time += time.perf_counter() - began
+    timed_send.__wrapped__ = send
+    return timed_send
+
+
+def _install_hooks():
+    if not hasattr(Template.render, '__wrapped__'):
+        Template.render = _wrap_template_render(Template.render)
+    if not hasattr(EmailMessage.send, '__wrapped__'):
+        EmailMessage.send = _wrap_email_send(EmailMessage.send)
+
+
+class PerformanceMiddleware:
+    """Per-request timing of SQL, template rendering and outbound email.
+
+    Results are returned in a ``Server-Timing`` header and written as one
+    JSON object per request to the ``shop.perf`` logger (a rotating file,
+    see LOGGING in settings). ``manage.py perf_report`` aggregates the log.
+    Peak Python memory is tracked with tracemalloc when PERF_TRACE_MEMORY
+    is on; it slows every allocation, so it is off by default.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.trace_memory = getattr(settings, 'PERF_TRACE_MEMORY', False)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _install_hooks()
+        # Stay async under ASGI so async views aren't pushed onto a thread
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token, began = self._start()
+        try:
+            with self._sql_timers():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, began)
+
+    async def __acall__(self, request):
+        timings, token, began = self._start()
+        try:
+            with self._sql_timers():
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, began)
+
+    def _start(self):
+        timings = _Timings()
+        token = _current.set(timings)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        return timings, token, time.perf_counter()
+
+    def _sql_timers(self):
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(_sql_timer))
+        return stack
+
+    def _finish(self, request, response, timings, began):
+        total = time.perf_counter() - began
+
+        peak_kb = None
+        if self.trace_memory:
+            peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings.db_time * 1000:.1f};desc="{timings.db_queries} queries"',
+            f'tpl;dur={timings.template_time * 1000:.1f}',
+            f'smtp;dur={timings.email_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        match = request.resolver_match
+        perf_logger.info(json.dumps({
+            'ts': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.view_name if match else None,
+            'status': response.status_code,
+            'ms': round(total * 1000, 2),
+            'db_queries': timings.db_queries,
+            'db_ms': round(timings.db_time * 1000, 2),
+            'template_ms': round(timings.template_time * 1000, 2),
+            'email_ms': round(timings.email_time * 1000, 2),
+            'emails': timings.email_count,
+            'peak_kb': peak_kb,
+        }))
+        return response
+
+
+class ThrottleMiddleware(MiddlewareMixin):
+    """Answer 429 for requests over their THROTTLE_RULES limits.
+
+    Runs in process_view, once the URL name is known, and must come right
+    after SessionMiddleware so it runs before CSRF checks and the view.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        wait = check_request(request, url_name)
+        if wait:
+            response = HttpResponse('Too many requests. Please try again later.\n',
+                                    status=429, content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = str(wait)
+            return response
+        return None
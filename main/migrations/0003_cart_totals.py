@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('main', 'Cart')
+    CartItem = apps.get_model('main', 'CartItem')
+    totals = {}
+    for item in CartItem.objects.select_related('product').iterator():
+        items, price = totals.get(item.cart_id, (0, 0))
+        totals[item.cart_id] = (items + item.quantity, price + item.product.price * item.quantity)
+    for cart_id, (items, price) in totals.items():
+        Cart.objects.filter(pk=cart_id).update(total_items=items, total_price=price)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_cart_cartitem_order_orderitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
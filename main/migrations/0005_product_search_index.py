@@ -0,0 +1,40 @@
+from django.db import OperationalError, migrations
+
+FTS_TABLE = 'main_product_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    # FTS5 is optional: without it main.search falls back to an in-process index
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"name, category, description, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except OperationalError:
+            return
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, category, description) "
+            f"SELECT p.id, p.name, c.name, COALESCE(p.description, '') "
+            f"FROM main_product p JOIN main_category c ON c.id = p.category_id"
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
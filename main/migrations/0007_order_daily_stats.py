@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:58
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    Order = apps.get_model('main', 'Order')
+    OrderDailyStats = apps.get_model('main', 'OrderDailyStats')
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at')).order_by()
+        .values('day', 'status')
+        .annotate(order_count=Count('id'), revenue=Sum('total_price'))
+    )
+    OrderDailyStats.objects.bulk_create([
+        OrderDailyStats(date=row['day'], status=row['status'],
+                        order_count=row['order_count'], revenue=row['revenue'] or 0)
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Order daily stats',
+                'constraints': [models.UniqueConstraint(fields=('date', 'status'), name='order_daily_stats_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_product_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='main.cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='main.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'expires_at', 'cart', 'quantity'], name='stock_hold_product_idx'), models.Index(fields=['expires_at'], name='stock_hold_expiry_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cart', 'product'), name='stock_reservation_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # One INSERT ... SELECT; later changes arrive through main.signals
+    quote = schema_editor.connection.ops.quote_name
+    table = quote(apps.get_model('main', 'CustomerStats')._meta.db_table)
+    users = quote(apps.get_model('auth', 'User')._meta.db_table)
+    orders = quote(apps.get_model('main', 'Order')._meta.db_table)
+    schema_editor.execute(
+        f'INSERT INTO {table} (user_id, username, email, order_count, lifetime_spend, last_order_at) '
+        f'SELECT u.id, LOWER(u.username), LOWER(u.email), COUNT(o.id), COALESCE(SUM(o.total_price), 0), '
+        f'MAX(o.created_at) FROM {users} u LEFT JOIN {orders} o '
+        f"ON o.user_id = u.id AND o.status <> 'cancelled' "
+        f'GROUP BY u.id, u.username, u.email'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main', '0012_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='customer_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('order_count', models.IntegerField(default=0)),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Customer stats',
+                'indexes': [models.Index(fields=['username', 'user'], name='customer_username_idx'), models.Index(fields=['email', 'user'], name='customer_email_idx'), models.Index(fields=['lifetime_spend', 'user'], name='customer_spend_idx'), models.Index(fields=['order_count', 'user'], name='customer_orders_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
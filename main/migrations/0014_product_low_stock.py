@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def flag_low_stock(apps, schema_editor):
+    # The old dashboard's fixed threshold is the default; no alerts for
+    # products that were already low
+    Product = apps.get_model('main', 'Product')
+    Product.objects.filter(stock__lt=F('reorder_threshold')).update(low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_customer_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(default=5),
+        ),
+        migrations.RunPython(flag_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('low_stock', True)), fields=['stock', 'id'], name='product_low_stock_idx'),
+        ),
+    ]
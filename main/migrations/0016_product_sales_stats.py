@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # One INSERT ... SELECT; later changes arrive through place_order and main.signals
+    quote = schema_editor.connection.ops.quote_name
+    table = quote(apps.get_model('main', 'ProductSalesStats')._meta.db_table)
+    items = quote(apps.get_model('main', 'OrderItem')._meta.db_table)
+    schema_editor.execute(
+        f'INSERT INTO {table} (product_id, units_sold) '
+        f'SELECT product_id, SUM(quantity) FROM {items} '
+        f'WHERE product_id IS NOT NULL GROUP BY product_id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_stats', serialize=False, to='main.product')),
+                ('units_sold', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Product sales stats',
+                'indexes': [models.Index(fields=['units_sold', 'product'], name='product_units_sold_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -15,12 +15,19 @@ class Category(models.Model):
 
 
 class Product(models.Model):
+    # Stable external identifier; catalog imports upsert on it
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized copies of image, see main.images
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     stock = models.IntegerField(default=0)
+    # Stock below this is low; low_stock is kept by main.inventory
+    reorder_threshold = models.PositiveIntegerField(default=5)
+    low_stock = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -31,11 +38,35 @@ class Product(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Products"
+        # Keyset pagination on the storefront listing (see main.pagination).
+        # Partial indexes: Django filters is_active=True as a bare
+        # "WHERE is_active", which SQLite can match against an index
+        # condition but not against a leading is_active column.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_newest_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], condition=models.Q(is_active=True),
+                         name='product_cat_newest_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_price_idx'),
+            models.Index(fields=['category', 'price', 'id'], condition=models.Q(is_active=True),
+                         name='product_cat_price_idx'),
+            # Conditional GET validators for the listing (see main.cache); a
+            # covering scan of it also answers the unfiltered aggregate
+            models.Index(fields=['category', 'updated_at'], condition=models.Q(is_active=True),
+                         name='product_cat_updated_idx'),
+            # Dashboard low-stock list; holds only the flagged products
+            models.Index(fields=['stock', 'id'], condition=models.Q(low_stock=True, is_active=True),
+                         name='product_low_stock_idx'),
+        ]
 
 
 # Cart Model
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    # Denormalized totals, kept current by main.services and main.signals
+    total_items = models.IntegerField(default=0)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -43,10 +74,10 @@ class Cart(models.Model):
         return f"Cart for {self.user.username}"
 
     def get_total_price(self):
-        return sum(item.get_item_total() for item in self.items.all())
+        return self.total_price
 
     def get_total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.total_items
 
 
 class CartItem(models.Model):
@@ -61,6 +92,39 @@ class CartItem(models.Model):
     def get_item_total(self):
         return self.product.price * self.quantity
 
+    class Meta:
+        # One line per product; main.services upserts on it
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cart_item_unique'),
+        ]
+
+
+class StockReservation(models.Model):
+    """Stock held for a cart line until expires_at (see main.services).
+
+    Available stock is Product.stock minus the unexpired holds of other
+    carts; expired rows are ignored and later deleted by
+    ``manage.py release_expired_reservations``.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.IntegerField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for cart {self.cart_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='stock_reservation_unique'),
+        ]
+        indexes = [
+            # Covers the held-quantity aggregate per product
+            models.Index(fields=['product', 'expires_at', 'cart', 'quantity'],
+                         name='stock_hold_product_idx'),
+            models.Index(fields=['expires_at'], name='stock_hold_expiry_idx'),
+        ]
+
 
 # Order Model
 class Order(models.Model):
@@ -85,6 +149,54 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Admin order list: keyset pages by date, optionally within one status
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+        ]
+
+
+class OrderDailyStats(models.Model):
+    """Orders and revenue per day and status, kept current by main.signals.
+
+    Reports sum a few rows per day instead of scanning Order. Rebuild with
+    ``manage.py rebuild_sales_rollups`` after writes that skip signals.
+    """
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.order_count}"
+
+    class Meta:
+        verbose_name_plural = "Order daily stats"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='order_daily_stats_unique'),
+        ]
+
+
+class ProductSalesStats(models.Model):
+    """Units sold per product over all orders, kept current by
+    main.services and main.signals.
+
+    The report's top products read the head of an index instead of
+    grouping every OrderItem. Rebuild with ``manage.py rebuild_sales_rollups``
+    after writes that skip both.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='sales_stats')
+    units_sold = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.units_sold} sold"
+
+    class Meta:
+        verbose_name_plural = "Product sales stats"
+        indexes = [
+            models.Index(fields=['units_sold', 'product'], name='product_units_sold_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -98,3 +210,59 @@ class OrderItem(models.Model):
 
     def get_item_total(self):
         return self.price * self.quantity
+
+
+class ProductRecommendation(models.Model):
+    """A product's precomputed "bought together" neighbours.
+
+    Written by ``manage.py build_recommendations`` (see
+    main.recommendations); rank 0 is the strongest match.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    # Cosine similarity of the two products' order sets; 0 for same-category
+    # padding when the product has too little history
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
+
+    class Meta:
+        constraints = [
+            # Also the index product_detail reads through, in rank order
+            models.UniqueConstraint(fields=['product', 'rank'], name='recommendation_rank_unique'),
+        ]
+
+
+class CustomerStats(models.Model):
+    """One row per user for the admin customer directory.
+
+    Holds lowercased copies of username and email for indexed prefix
+    search, and the customer's order count, lifetime spend and last order
+    date over orders that are not cancelled. Kept current by main.signals;
+    rebuild with ``manage.py rebuild_sales_rollups`` after writes that skip
+    signals.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='customer_stats')
+    username = models.CharField(max_length=150)
+    email = models.CharField(max_length=254, blank=True)
+    order_count = models.IntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.username}: {self.order_count} orders"
+
+    class Meta:
+        verbose_name_plural = "Customer stats"
+        # Keyset pages of the directory (see adminapp.views.admin_users):
+        # prefix search is a range scan on username/email, the sorts read
+        # the stats indexes backwards
+        indexes = [
+            models.Index(fields=['username', 'user'], name='customer_username_idx'),
+            models.Index(fields=['email', 'user'], name='customer_email_idx'),
+            models.Index(fields=['lifetime_spend', 'user'], name='customer_spend_idx'),
+            models.Index(fields=['order_count', 'user'], name='customer_orders_idx'),
+        ]
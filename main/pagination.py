@@ -0,0 +1,156 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+# Keyset (cursor) pagination
+class KeysetPage:
+    """One page of ``queryset`` ordered by ``ordering``, addressed by cursors.
+
+    ``ordering`` must end in a unique field (normally ``id``) so every row
+    has a distinct position. Instead of OFFSET, the next page is fetched
+    with ``WHERE (a, b) > (last_a, last_b)`` expanded to plain comparisons,
+    which an index on the ordering columns answers without scanning the
+    skipped rows. Nothing is queried until the page is used, so a page
+    rendered inside a cached template fragment costs nothing on a hit.
+    """
+
+    def __init__(self, queryset, ordering, after=None, before=None, per_page=24, total=None):
+        self.queryset = queryset
+        if total is not None:
+            # Already known to the caller; skips the count
+            self.__dict__['total'] = total
+        self.ordering = ordering
+        self.after = after
+        self.before = None if after else before
+        self.per_page = per_page
+        self._seek_values = None
+        if self.after or self.before:
+            # Validate up front so a bad cursor fails in the view, not the template
+            values = decode_cursor(self.after or self.before)
+            fields = self._fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise InvalidCursor('cursor does not match ordering')
+            model = queryset.model
+            try:
+                self._seek_values = [
+                    model._meta.get_field(name).to_python(value)
+                    for (name, _), value in zip(fields, values)
+                ]
+            except ValidationError as e:
+                raise InvalidCursor(str(e))
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _seek(self, backwards):
+        values = self._seek_values
+        fields = self._fields()
+        condition = Q()
+        for i, (name, descending) in enumerate(fields):
+            # Rows after the cursor: equal on every earlier field, past it on this one
+            lookup = 'lt' if descending != backwards else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (earlier, _) in enumerate(fields[:i]):
+                term &= Q(**{earlier: values[j]})
+            condition |= term
+        # Redundant bound on the leading field lets the index seek straight
+        # to the cursor instead of filtering from the start of the range
+        first, descending = fields[0]
+        bound = 'lte' if descending != backwards else 'gte'
+        return Q(**{f'{first}__{bound}': values[0]}) & condition
+
+    def _cursor_for(self, obj):
+        values = []
+        for name, _ in self._fields():
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return encode_cursor(values)
+
+    def _rows_queryset(self):
+        queryset = self.queryset
+        backwards = bool(self.before)
+        if self.before or self.after:
+            queryset = queryset.filter(self._seek(backwards))
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def _build_page(self, rows):
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.before:
+            rows.reverse()
+            return rows, True, more
+        return rows, more, bool(self.after)
+
+    @cached_property
+    def _page(self):
+        return self._build_page(list(self._rows_queryset()))
+
+    async def aload(self):
+        """Fetch the page with the async ORM (templates can't query from async views)"""
+        if '_page' not in self.__dict__:
+            self.__dict__['_page'] = self._build_page([row async for row in self._rows_queryset()])
+        return self
+
+    async def atotal(self):
+        if 'total' not in self.__dict__:
+            self.__dict__['total'] = await self.queryset.acount()
+        return self.total
+
+    @property
+    def object_list(self):
+        return self._page[0]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self._page[1] and bool(self.object_list)
+
+    @property
+    def has_previous(self):
+        return self._page[2] and bool(self.object_list)
+
+    @property
+    def next_cursor(self):
+        return self._cursor_for(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor_for(self.object_list[0]) if self.has_previous else None
+
+    @cached_property
+    def total(self):
+        return self.queryset.count()
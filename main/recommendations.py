@@ -0,0 +1,199 @@
+import heapq
+import math
+import time
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .cache import bump_catalog
+from .models import OrderItem, Product, ProductRecommendation
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional: the pure-Python counter is used without them
+    np = sparse = None
+
+# Product recommendations
+#
+# build_recommendations() reads OrderItem history one window of order ids
+# at a time and counts, for every pair of active products, the orders
+# containing both. Neighbours are scored by cosine similarity
+#
+#     score(a, b) = orders(a and b) / sqrt(orders(a) * orders(b))
+#
+# so bestsellers don't top every list, and each product's best TOP_K are
+# stored in ProductRecommendation. Products with fewer than TOP_K
+# neighbours are padded with the newest products of their category (score
+# 0), so product_detail reads a single indexed range; only products added
+# since the last build fall back to a category query.
+#
+# Memory is one window of order lines plus the co-occurrence counts, which
+# grow with the number of distinct pairs bought together rather than with
+# the number of order lines. With NumPy and SciPy each window becomes a
+# sparse orders x products matrix B and the counts accumulate as B.T @ B;
+# without them a Counter of pairs does the same job more slowly.
+TOP_K = 8
+RELATED_LIMIT = 4
+ORDER_WINDOW = 50000
+# Products whose rows are replaced per transaction
+WRITE_BATCH = 500
+
+
+def vectorized_available():
+    return np is not None
+
+
+def _order_windows(window):
+    """Yield the distinct (order id, product id) lines of each window of order ids"""
+    lines = OrderItem.objects.filter(product__isnull=False).exclude(order__status='cancelled')
+    bounds = lines.aggregate(low=Min('order_id'), high=Max('order_id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, window):
+        yield list(
+            lines.filter(order_id__gte=start, order_id__lt=start + window)
+            .values_list('order_id', 'product_id').distinct()
+        )
+
+
+def _neighbours_numpy(windows, ids):
+    """{position: [(position, score), ...]} best first, for products with history"""
+    n = len(ids)
+    ids = np.asarray(ids, dtype=np.int64)
+    # Positions are indexes into ids; by_id maps sorted order back to them
+    by_id = np.argsort(ids)
+    sorted_ids = ids[by_id]
+    counts = sparse.csr_matrix((n, n), dtype=np.int64)
+    for lines in windows:
+        if not lines:
+            continue
+        lines = np.asarray(lines, dtype=np.int64)
+        found = np.minimum(np.searchsorted(sorted_ids, lines[:, 1]), n - 1)
+        active = sorted_ids[found] == lines[:, 1]
+        lines, columns = lines[active], by_id[found[active]]
+        baskets, rows = np.unique(lines[:, 0], return_inverse=True)
+        basket_matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=(len(baskets), n)
+        )
+        counts = counts + (basket_matrix.T @ basket_matrix).tocsr()
+
+    # The diagonal holds each product's own order count
+    orders = counts.diagonal().astype(np.float64)
+    pairs = counts.tocoo()
+    off_diagonal = pairs.row != pairs.col
+    rows, cols = pairs.row[off_diagonal], pairs.col[off_diagonal]
+    scores = pairs.data[off_diagonal] / np.sqrt(orders[rows] * orders[cols])
+    # Each row's neighbours best first, ties to the lower position, then
+    # keep the first TOP_K of every row
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < TOP_K
+    neighbours = defaultdict(list)
+    for row, col, score in zip(rows[keep].tolist(), cols[keep].tolist(), scores[keep].tolist()):
+        neighbours[row].append((col, score))
+    return neighbours
+
+
+def _neighbours_python(windows, ids):
+    position = {product_id: i for i, product_id in enumerate(ids)}
+    orders = Counter()
+    pairs = Counter()
+    for lines in windows:
+        baskets = defaultdict(list)
+        for order_id, product_id in lines:
+            if product_id in position:
+                baskets[order_id].append(position[product_id])
+        for products in baskets.values():
+            orders.update(products)
+            pairs.update(combinations(sorted(products), 2))
+
+    candidates = defaultdict(list)
+    for (a, b), both in pairs.items():
+        score = both / math.sqrt(orders[a] * orders[b])
+        candidates[a].append((-score, b))
+        candidates[b].append((-score, a))
+    return {
+        a: [(b, -negative) for negative, b in heapq.nsmallest(TOP_K, found)]
+        for a, found in candidates.items()
+    }
+
+
+def build_recommendations(window=ORDER_WINDOW, vectorized=None):
+    """Recompute every active product's ProductRecommendation rows.
+
+    Returns counts for reporting: products, products with history, rows
+    written and seconds taken.
+    """
+    began = time.perf_counter()
+    if vectorized is None:
+        vectorized = vectorized_available()
+    # Newest first, so each category's list below is in display order
+    catalog = list(Product.objects.filter(is_active=True).order_by('-created_at', '-id')
+                   .values_list('id', 'category_id'))
+    ids = [product_id for product_id, category_id in catalog]
+    if not ids:
+        ProductRecommendation.objects.all().delete()
+        return {'products': 0, 'with_history': 0, 'rows': 0, 'seconds': time.perf_counter() - began}
+    newest = defaultdict(list)
+    for product_id, category_id in catalog:
+        if len(newest[category_id]) <= TOP_K:
+            newest[category_id].append(product_id)
+
+    windows = _order_windows(window)
+    neighbours = _neighbours_numpy(windows, ids) if vectorized else _neighbours_python(windows, ids)
+
+    rows = 0
+    for start in range(0, len(catalog), WRITE_BATCH):
+        block = catalog[start:start + WRITE_BATCH]
+        recommendations = []
+        for i, (product_id, category_id) in enumerate(block, start):
+            chosen = [(ids[col], score) for col, score in neighbours.get(i, ())]
+            seen = {product_id, *(recommended for recommended, score in chosen)}
+            chosen += [(other, 0.0) for other in newest[category_id] if other not in seen]
+            recommendations += [
+                ProductRecommendation(product_id=product_id, recommended_id=recommended, rank=rank, score=score)
+                for rank, (recommended, score) in enumerate(chosen[:TOP_K])
+            ]
+        with transaction.atomic():
+            ProductRecommendation.objects.filter(product_id__in=[pk for pk, c in block]).delete()
+            ProductRecommendation.objects.bulk_create(recommendations)
+        rows += len(recommendations)
+    ProductRecommendation.objects.exclude(product__is_active=True).delete()
+    bump_catalog('recommendations')
+    return {
+        'products': len(catalog),
+        'with_history': len(neighbours),
+        'rows': rows,
+        'seconds': time.perf_counter() - began,
+    }
+
+
+# Reading, for product_detail
+def stored_recommendations(product):
+    return Product.objects.filter(
+        recommended_for__product=product.id, is_active=True
+    ).order_by('recommended_for__rank')
+
+
+def _same_category(product):
+    return Product.objects.filter(category=product.category_id, is_active=True).exclude(id=product.id)
+
+
+def related_products(product, limit=RELATED_LIMIT):
+    """Up to ``limit`` products to show with ``product``: its stored
+    recommendations, or the newest of its category when it has none yet"""
+    related = list(stored_recommendations(product)[:limit])
+    if not related:
+        related = list(_same_category(product)[:limit])
+    return related
+
+
+async def arelated_products(product, limit=RELATED_LIMIT):
+    related = [p async for p in stored_recommendations(product)[:limit]]
+    if not related:
+        related = [p async for p in _same_category(product)[:limit]]
+    return related
@@ -0,0 +1,238 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CustomerStats, Order, OrderDailyStats, OrderItem, ProductSalesStats
+
+# Sales rollups
+#
+# OrderDailyStats holds one row per (day, status) with the number of orders
+# and their revenue. main.signals applies each order's change as a delta,
+# so report queries read a few hundred rows at most instead of scanning
+# Order. Days are calendar days in the current time zone.
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def apply_order_delta(day, status, count, revenue):
+    """Add count/revenue to the (day, status) row, creating it if needed"""
+    # One upsert statement, so concurrent writers never race on the insert
+    table = connection.ops.quote_name(OrderDailyStats._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (date, status, order_count, revenue) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (date, status) DO UPDATE SET '
+            f'order_count = {table}.order_count + excluded.order_count, '
+            f'revenue = {table}.revenue + excluded.revenue',
+            [day, status, count, revenue],
+        )
+
+
+def rebuild_daily_stats(since=None):
+    """Recompute rollups from Order in one GROUP BY. Returns rows written.
+
+    With ``since`` (a date) only days from then on are replaced.
+    """
+    orders = Order.objects.all()
+    stats = OrderDailyStats.objects.all()
+    if since is not None:
+        orders = orders.filter(created_at__date__gte=since)
+        stats = stats.filter(date__gte=since)
+    rows = (
+        orders.annotate(day=TruncDate('created_at')).order_by()
+        .values('day', 'status')
+        .annotate(order_count=Count('id'), revenue=Sum('total_price'))
+    )
+    with transaction.atomic():
+        stats.delete()
+        created = OrderDailyStats.objects.bulk_create([
+            OrderDailyStats(date=row['day'], status=row['status'],
+                            order_count=row['order_count'], revenue=row['revenue'] or 0)
+            for row in rows.iterator()
+        ], batch_size=1000)
+    return len(created)
+
+
+def sales_totals():
+    """(order count, revenue) over all orders"""
+    totals = OrderDailyStats.objects.aggregate(orders=Sum('order_count'), revenue=Sum('revenue'))
+    return totals['orders'] or 0, totals['revenue'] or Decimal('0')
+
+
+def status_counts():
+    """Order count per status, zero for statuses with no orders"""
+    counts = dict.fromkeys(dict(Order.STATUS_CHOICES), 0)
+    rows = OrderDailyStats.objects.order_by().values('status').annotate(total=Sum('order_count'))
+    counts.update({row['status']: row['total'] for row in rows})
+    return counts
+
+
+def daily_orders(days):
+    """[(date, order count, revenue)] for the last ``days`` days, oldest first"""
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = (
+        OrderDailyStats.objects.filter(date__gte=start).order_by()
+        .values('date').annotate(orders=Sum('order_count'), revenue=Sum('revenue'))
+    )
+    by_day = {row['date']: (row['orders'], row['revenue']) for row in rows}
+    return [
+        (day, *by_day.get(day, (0, Decimal('0'))))
+        for day in (start + timedelta(days=i) for i in range(days))
+    ]
+
+
+# Product sales
+#
+# ProductSalesStats holds each product's units sold across all orders, of
+# any status, as the report has always counted them. place_order adds a
+# checkout's lines in one upsert; main.signals applies order items saved
+# or deleted one at a time.
+
+
+def apply_product_sales(units):
+    """Add {product id: units} to the products' rows. Adding creates
+    missing rows; subtracting only updates."""
+    added = [(product_id, n) for product_id, n in units.items() if product_id is not None and n > 0]
+    for product_id, n in units.items():
+        if product_id is not None and n < 0:
+            ProductSalesStats.objects.filter(product_id=product_id).update(
+                units_sold=F('units_sold') + n)
+    if not added:
+        return
+    table = connection.ops.quote_name(ProductSalesStats._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (product_id, units_sold) VALUES '
+            + ', '.join(['(%s, %s)'] * len(added))
+            + f' ON CONFLICT (product_id) DO UPDATE SET '
+            f'units_sold = {table}.units_sold + excluded.units_sold',
+            [value for row in added for value in row],
+        )
+
+
+def top_products(limit=5):
+    """Best sellers as [{'product__name', 'total_qty'}], most units first"""
+    return list(
+        ProductSalesStats.objects.filter(units_sold__gt=0).order_by('-units_sold', '-product_id')
+        .values('product__name', total_qty=F('units_sold'))[:limit]
+    )
+
+
+def rebuild_product_sales():
+    """Recompute every product's row from OrderItem. Returns rows written."""
+    rows = (
+        OrderItem.objects.filter(product__isnull=False).order_by()
+        .values('product').annotate(units=Sum('quantity'))
+    )
+    with transaction.atomic():
+        ProductSalesStats.objects.all().delete()
+        created = ProductSalesStats.objects.bulk_create([
+            ProductSalesStats(product_id=row['product'], units_sold=row['units'])
+            for row in rows.iterator()
+        ], batch_size=1000)
+    return len(created)
+
+
+# Customer stats
+#
+# CustomerStats holds each customer's order count, lifetime spend and last
+# order date over orders that are not cancelled, so the admin directory
+# pages through users without aggregating Order. Placing an order is one
+# upsert; cancelling or deleting one subtracts it and looks up the
+# customer's latest remaining order.
+
+
+COUNTED_STATUSES = [value for value, label in Order.STATUS_CHOICES if value != 'cancelled']
+
+
+def sync_customer(user):
+    """Create or refresh the user's row with their current username/email"""
+    CustomerStats.objects.bulk_create(
+        [CustomerStats(user=user, username=user.username.lower(), email=user.email.lower())],
+        update_conflicts=True, unique_fields=['user'], update_fields=['username', 'email'],
+    )
+
+
+def apply_customer_delta(user_id, count, spend, placed_at=None):
+    """Add count/spend to the customer's row and move last_order_at
+    forward to ``placed_at``. Adding creates the row if it is missing (for
+    users written without signals); subtracting only updates."""
+    if count < 0 or spend < 0:
+        CustomerStats.objects.filter(user_id=user_id).update(
+            order_count=F('order_count') + count,
+            lifetime_spend=F('lifetime_spend') + spend,
+        )
+        return
+    table = connection.ops.quote_name(CustomerStats._meta.db_table)
+    users = connection.ops.quote_name(User._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, username, email, order_count, lifetime_spend, last_order_at) '
+            f'SELECT id, LOWER(username), LOWER(email), %s, %s, %s FROM {users} WHERE id = %s '
+            f'ON CONFLICT (user_id) DO UPDATE SET '
+            f'order_count = {table}.order_count + excluded.order_count, '
+            f'lifetime_spend = {table}.lifetime_spend + excluded.lifetime_spend, '
+            f'last_order_at = CASE WHEN {table}.last_order_at IS NULL '
+            f'OR {table}.last_order_at < excluded.last_order_at '
+            f'THEN excluded.last_order_at ELSE {table}.last_order_at END',
+            [count, spend, placed_at, user_id],
+        )
+
+
+def refresh_last_order(user_id):
+    latest = Order.objects.filter(user_id=user_id).exclude(status='cancelled').aggregate(
+        latest=Max('created_at'))['latest']
+    CustomerStats.objects.filter(user_id=user_id).update(last_order_at=latest)
+
+
+def apply_customer_order(order, previous=None, removed=False):
+    """Apply an order's change to its customer's stats.
+
+    ``previous`` is the order's (status, total) before the change, None for
+    a new order; ``removed`` means the order was deleted.
+    """
+    before = previous is not None and previous[0] in COUNTED_STATUSES
+    after = not removed and order.status in COUNTED_STATUSES
+    count = int(after) - int(before)
+    spend = (order.total_price if after else 0) - (previous[1] if before else 0)
+    if count >= 0 and spend >= 0:
+        if count or spend:
+            apply_customer_delta(order.user_id, count, spend, order.created_at)
+        return
+    with transaction.atomic(savepoint=False):
+        apply_customer_delta(order.user_id, count, spend)
+        if count < 0:
+            refresh_last_order(order.user_id)
+
+
+def rebuild_customer_stats(batch_size=2000):
+    """Recompute every user's row from User and Order. Returns rows written."""
+    counted = Q(orders__status__in=COUNTED_STATUSES)
+    rows = (
+        User.objects.order_by()
+        .annotate(order_count=Count('orders', filter=counted),
+                  lifetime_spend=Sum('orders__total_price', filter=counted),
+                  last_order_at=Max('orders__created_at', filter=counted))
+        .values_list('id', 'username', 'email', 'order_count', 'lifetime_spend', 'last_order_at')
+    )
+    written = 0
+    with transaction.atomic():
+        CustomerStats.objects.all().delete()
+        batch = []
+        for user_id, username, email, count, spend, last_order_at in rows.iterator(chunk_size=batch_size):
+            batch.append(CustomerStats(user_id=user_id, username=username.lower(), email=email.lower(),
+                                       order_count=count, lifetime_spend=spend or 0,
+                                       last_order_at=last_order_at))
+            if len(batch) == batch_size:
+                written += len(CustomerStats.objects.bulk_create(batch))
+                batch = []
+        written += len(CustomerStats.objects.bulk_create(batch))
+    return written
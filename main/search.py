@@ -0,0 +1,268 @@
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Product
+
+# Product search
+#
+# Two interchangeable engines index Product.name, category name and
+# description and rank matches with BM25, treating every query term as a
+# prefix ("run" matches "running"):
+#
+#   Fts5Engine     an SQLite FTS5 virtual table kept next to main_product
+#   MemoryEngine   an in-process inverted index, used when FTS5 is missing
+#
+# main.signals keeps the active engine in sync on Product/Category writes;
+# bulk loads call rebuild_index(). PRODUCT_SEARCH_BACKEND picks the engine
+# ('auto', 'fts5' or 'memory').
+
+FTS_TABLE = 'main_product_fts'
+# BM25 column weights: name, category, description
+WEIGHTS = (10.0, 5.0, 1.0)
+MAX_TERMS = 8
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [token.lower() for token in _token_re.findall(text or '')]
+
+
+def _document(product):
+    return (product.name or '', product.category.name if product.category_id else '',
+            product.description or '')
+
+
+_fts5_tables = {}
+
+
+def fts5_available():
+    """Whether the current database has the FTS5 product table (memoized per database)"""
+    if connection.vendor != 'sqlite':
+        return False
+    name = str(connection.settings_dict['NAME'])
+    if name not in _fts5_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts5_tables[name] = cursor.fetchone() is not None
+    return _fts5_tables[name]
+
+
+class Fts5Engine:
+    name = 'fts5'
+
+    def search(self, query, limit):
+        terms = tokenize(query)[:MAX_TERMS]
+        if not terms:
+            return []
+        # Quote every term so user input cannot inject FTS5 syntax
+        match = ' '.join(f'"{term}"*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s',
+                [match, *WEIGHTS, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, products):
+        rows = [(product.id, *_document(product)) for product in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            # OR REPLACE swaps out the old entry for the same rowid in one statement
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, category, description) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, category, description) '
+                f'SELECT p.id, p.name, c.name, COALESCE(p.description, \'\') '
+                f'FROM main_product p JOIN main_category c ON c.id = p.category_id'
+            )
+
+
+class MemoryEngine:
+    """Inverted index held in this process.
+
+    Postings map term -> {product id: term frequency per field}. A sorted
+    term list answers prefix queries with a binary search. Each process
+    builds its own copy on first use and applies its own writes once they
+    commit, so a rolled-back save never reaches the index; writes made by
+    other processes show up after rebuild_index() or a restart.
+    """
+
+    name = 'memory'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+
+    def _reset(self):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.field_totals = [0, 0, 0]
+        self.terms = []
+
+    def _ensure_built(self):
+        if not self._built:
+            self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            for product in Product.objects.select_related('category').iterator(chunk_size=2000):
+                self._add(product)
+            self.terms = sorted(self.postings)
+            self._built = True
+
+    def _add(self, product):
+        lengths = []
+        terms = set()
+        for field, text in enumerate(_document(product)):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            self.field_totals[field] += len(tokens)
+            for token in tokens:
+                freqs = self.postings[token].setdefault(product.id, [0, 0, 0])
+                freqs[field] += 1
+                terms.add(token)
+        self.doc_terms[product.id] = terms
+        self.doc_lengths[product.id] = lengths
+
+    def _discard(self, product_id):
+        for token in self.doc_terms.pop(product_id, ()):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self.postings[token]
+        for field, length in enumerate(self.doc_lengths.pop(product_id, (0, 0, 0))):
+            self.field_totals[field] -= length
+
+    def index(self, products):
+        transaction.on_commit(lambda: self._index(products))
+
+    def _index(self, products):
+        with self._lock:
+            if not self._built:
+                return
+            for product in products:
+                self._discard(product.id)
+                self._add(product)
+            self.terms = sorted(self.postings)
+
+    def remove(self, product_ids):
+        transaction.on_commit(lambda: self._remove(product_ids))
+
+    def _remove(self, product_ids):
+        with self._lock:
+            if not self._built:
+                return
+            for product_id in product_ids:
+                self._discard(product_id)
+            self.terms = sorted(self.postings)
+
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[start:end]
+
+    def search(self, query, limit):
+        prefixes = tokenize(query)[:MAX_TERMS]
+        if not prefixes:
+            return []
+        with self._lock:
+            self._ensure_built()
+            docs = len(self.doc_lengths) or 1
+            averages = [max(total / docs, 1) for total in self.field_totals]
+            scores = None
+            for prefix in prefixes:
+                # Every prefix must match (implicit AND, like FTS5)
+                term_scores = defaultdict(float)
+                for term in self._expand(prefix):
+                    postings = self.postings[term]
+                    idf = math.log(1 + (docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for product_id, freqs in postings.items():
+                        lengths = self.doc_lengths[product_id]
+                        for field, freq in enumerate(freqs):
+                            if not freq:
+                                continue
+                            norm = 1 - self.b + self.b * lengths[field] / averages[field]
+                            term_scores[product_id] += (
+                                WEIGHTS[field] * idf * freq * (self.k1 + 1) / (freq + self.k1 * norm)
+                            )
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, score in ranked[:limit]]
+
+
+_memory_engine = MemoryEngine()
+_fts5_engine = Fts5Engine()
+
+
+def get_engine():
+    backend = getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'auto')
+    if backend == 'memory':
+        return _memory_engine
+    if backend == 'fts5' or fts5_available():
+        return _fts5_engine
+    return _memory_engine
+
+
+def search_product_ids(query, limit=100):
+    """Ids of products matching query, best match first"""
+    return get_engine().search(query, limit)
+
+
+def search_products(query, limit=100, queryset=None):
+    """Products matching query, best match first"""
+    if queryset is None:
+        queryset = Product.objects.filter(is_active=True)
+    queryset = queryset.select_related('category')
+    # The index holds every product, so matches the queryset filters out
+    # (e.g. inactive ones) would take up result slots: over-fetch, and
+    # widen the search until the page is full or the matches run out
+    fetch = limit * 2
+    while True:
+        ids = search_product_ids(query, fetch)
+        found = {product.id: product for product in queryset.filter(id__in=ids)}
+        results = [found[pk] for pk in ids if pk in found]
+        if len(results) >= limit or len(ids) < fetch:
+            return results[:limit]
+        fetch *= 4
+
+
+def index_products(products):
+    get_engine().index(products)
+
+
+def remove_products(product_ids):
+    get_engine().remove(product_ids)
+
+
+def rebuild_index():
+    get_engine().rebuild()
@@ -0,0 +1,295 @@
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_products
+from .inventory import stock_changed
+from .models import Cart, CartItem, Order, OrderItem, Product, StockReservation
+from .rollups import apply_product_sales
+
+
+class EmptyCart(Exception):
+    """Raised when checkout is attempted with no cart lines"""
+
+
+class InvalidQuantity(ValueError):
+    """Raised for a cart or order line quantity below 1"""
+
+    def __init__(self, quantity):
+        self.quantity = quantity
+        super().__init__(f'Quantity must be at least 1, got {quantity}')
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more cart lines cannot be fulfilled"""
+
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(product.name for product in products)
+        super().__init__(f'Not enough stock for: {names}')
+
+
+# Cart totals
+def adjust_cart_totals(cart_id, quantity, amount):
+    """Apply a delta to a cart's cached totals in one UPDATE"""
+    Cart.objects.filter(pk=cart_id).update(
+        total_items=F('total_items') + quantity,
+        total_price=F('total_price') + amount,
+    )
+
+
+def recompute_cart_totals(carts=None):
+    """Rebuild cached totals from the cart lines with a single UPDATE"""
+    if carts is None:
+        carts = Cart.objects.all()
+    lines = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    item_count = lines.annotate(n=Sum('quantity')).values('n')
+    price_total = lines.annotate(
+        t=Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=10, decimal_places=2))
+    ).values('t')
+    return carts.update(
+        total_items=Coalesce(Subquery(item_count), 0),
+        total_price=Coalesce(Subquery(price_total), Value(Decimal('0')),
+                             output_field=DecimalField(max_digits=10, decimal_places=2)),
+    )
+
+
+# Stock reservations
+#
+# Adding or changing a cart line holds its quantity for
+# STOCK_RESERVATION_MINUTES, so the last pairs of a popular product go to
+# whoever carts them first instead of whoever checks out first. Holds are
+# refreshed on every change to the line and released when it's removed or
+# ordered. Writes are serialized by SQLite's IMMEDIATE transactions, so
+# checking availability and then writing the hold can't race.
+def _held_by_other_carts(cart_id, now):
+    return (
+        StockReservation.objects
+        .filter(product=OuterRef('pk'), expires_at__gt=now)
+        .exclude(cart_id=cart_id)
+        .order_by().values('product')
+        .annotate(held=Sum('quantity')).values('held')
+    )
+
+
+def available_stock(product_ids, cart_id=None, now=None):
+    """{product id: stock not held by other carts}, in one query"""
+    held = _held_by_other_carts(cart_id, now or timezone.now())
+    rows = Product.objects.filter(id__in=product_ids).annotate(
+        held=Coalesce(Subquery(held), 0)
+    ).values_list('id', 'stock', 'held')
+    return {product_id: stock - held for product_id, stock, held in rows}
+
+
+def reserve_stock(cart_id, quantities):
+    """Hold {product: quantity} for the cart, replacing its previous holds.
+
+    Quantities <= 0 release the hold. Raises InsufficientStock, naming
+    every short product, when other carts' holds leave too little.
+    """
+    now = timezone.now()
+    released = [product.id for product, quantity in quantities.items() if quantity <= 0]
+    if released:
+        release_stock(cart_id, released)
+    wanted = {product: quantity for product, quantity in quantities.items() if quantity > 0}
+    if not wanted:
+        return
+    available = available_stock([product.id for product in wanted], cart_id, now)
+    short = [product for product, quantity in wanted.items() if available.get(product.id, 0) < quantity]
+    if short:
+        raise InsufficientStock(short)
+    expires_at = now + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+    StockReservation.objects.bulk_create(
+        [StockReservation(cart_id=cart_id, product=product, quantity=quantity, expires_at=expires_at)
+         for product, quantity in wanted.items()],
+        update_conflicts=True, unique_fields=['cart', 'product'],
+        update_fields=['quantity', 'expires_at'],
+    )
+
+
+def release_stock(cart_id, product_ids):
+    StockReservation.objects.filter(cart_id=cart_id, product_id__in=product_ids).delete()
+
+
+def release_expired_reservations(batch_size=1000):
+    """Delete expired holds in batches; returns how many were removed"""
+    expired = StockReservation.objects.filter(expires_at__lte=timezone.now())
+    removed = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if ids:
+            removed += StockReservation.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            return removed
+
+
+# Cart line changes
+#
+# A cart has at most one line per product (cart_item_unique), so lines are
+# written with upserts on (cart, product) instead of get_or_create's
+# SELECT-then-INSERT. Every change runs in one transaction with its stock
+# hold and the cart totals delta.
+def _increment_cart_line(cart_id, product_id, quantity):
+    """Insert a line or add to its quantity in one statement; returns (id, quantity)"""
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (cart_id, product_id, quantity, added_at) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = {table}.quantity + excluded.quantity '
+            'RETURNING id, quantity',
+            [cart_id, product_id, quantity, connection.ops.adapt_datetimefield_value(timezone.now())],
+        )
+        return cursor.fetchone()
+
+
+def add_cart_item(cart, product, quantity):
+    """Add quantity of product to cart, merging with an existing line.
+
+    Raises InvalidQuantity for a quantity below 1, and InsufficientStock
+    (leaving the cart unchanged) when the new line quantity can't be
+    reserved.
+    """
+    if quantity < 1:
+        raise InvalidQuantity(quantity)
+    with transaction.atomic():
+        item_id, line_quantity = _increment_cart_line(cart.pk, product.pk, quantity)
+        reserve_stock(cart.pk, {product: line_quantity})
+        adjust_cart_totals(cart.pk, quantity, product.price * quantity)
+    return CartItem(id=item_id, cart=cart, product=product, quantity=line_quantity)
+
+
+def set_cart_quantities(cart_id, quantities, previous=None):
+    """Set the cart's line quantity for each {product: quantity}.
+
+    A quantity of 0 removes the line; a negative one raises
+    InvalidQuantity. All or nothing: raises InsufficientStock, changing no
+    line, when any quantity can't be reserved. ``previous`` ({product id: quantity} of the existing lines)
+    saves a query when the caller already has them. Returns
+    {product id: CartItem, or None when removed}.
+    """
+    for quantity in quantities.values():
+        if quantity < 0:
+            raise InvalidQuantity(quantity)
+    with transaction.atomic():
+        if previous is None:
+            previous = dict(CartItem.objects.filter(
+                cart_id=cart_id, product__in=[product.id for product in quantities]
+            ).values_list('product_id', 'quantity'))
+        reserve_stock(cart_id, quantities)
+        removed = [product.id for product, quantity in quantities.items()
+                   if quantity == 0 and product.id in previous]
+        if removed:
+            CartItem.objects.filter(cart_id=cart_id, product_id__in=removed).delete()
+        kept = [CartItem(cart_id=cart_id, product=product, quantity=quantity)
+                for product, quantity in quantities.items() if quantity > 0]
+        if kept:
+            CartItem.objects.bulk_create(kept, update_conflicts=True, unique_fields=['cart', 'product'],
+                                         update_fields=['quantity'])
+        deltas = {product: quantity - previous.get(product.id, 0)
+                  for product, quantity in quantities.items()}
+        if any(deltas.values()):
+            adjust_cart_totals(cart_id, sum(deltas.values()),
+                               sum(product.price * delta for product, delta in deltas.items()))
+    lines = {item.product_id: item for item in kept}
+    return {product.id: lines.get(product.id) for product in quantities}
+
+
+def remove_cart_item(cart_item):
+    """Delete a cart line (product must be loaded)"""
+    set_cart_quantities(cart_item.cart_id, {cart_item.product: 0},
+                        previous={cart_item.product_id: cart_item.quantity})
+
+
+def set_cart_item_quantity(cart_item, quantity):
+    """Set a cart line's quantity, removing it when quantity is 0.
+
+    Raises InsufficientStock (leaving the line unchanged) when the new
+    quantity can't be reserved.
+    """
+    set_cart_quantities(cart_item.cart_id, {cart_item.product: quantity},
+                        previous={cart_item.product_id: cart_item.quantity})
+    cart_item.quantity = quantity
+
+
+# Checkout service
+def place_order(user, shipping_address, phone):
+    """Turn the user's cart into an order in a single transaction.
+
+    Stock is decremented with conditional ``UPDATE ... SET stock = stock - n
+    WHERE stock - <held by other carts> >= n`` statements, so concurrent
+    buyers never overwrite each other, lines still covered by the cart's
+    reservation always succeed, and an oversold line rolls the whole order
+    back. That is one UPDATE per distinct product, so checkout runs a fixed
+    number of queries plus one per line. The cart's reservations are
+    released with the cart lines. Raises InvalidQuantity, placing nothing,
+    for a line below 1.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        cart_items = list(
+            CartItem.objects.filter(cart__user=user).select_related('product')
+        )
+        if not cart_items:
+            raise EmptyCart()
+
+        # Merge duplicate lines for the same product
+        lines = OrderedDict()
+        for item in cart_items:
+            if item.product_id in lines:
+                lines[item.product_id][1] += item.quantity
+            else:
+                lines[item.product_id] = [item.product, item.quantity]
+        # A non-positive line would put stock back and discount the order
+        for product, quantity in lines.values():
+            if quantity < 1:
+                raise InvalidQuantity(quantity)
+
+        cart_id = cart_items[0].cart_id
+        held_elsewhere = Coalesce(Subquery(_held_by_other_carts(cart_id, now)), 0)
+        short = []
+        for product_id, (product, quantity) in lines.items():
+            updated = Product.objects.filter(id=product_id, is_active=True).alias(
+                held=held_elsewhere
+            ).filter(stock__gte=F('held') + quantity).update(stock=F('stock') - quantity,
+                                                              updated_at=now)
+            if not updated:
+                short.append(product)
+        if short:
+            raise InsufficientStock(short)
+        # Only lines whose low-stock flag may flip need a look
+        crossing = [product.id for product, quantity in lines.values()
+                    if (product.stock - quantity < product.reorder_threshold) != product.low_stock]
+        if crossing:
+            stock_changed(Product.objects.filter(id__in=crossing))
+
+        order = Order.objects.create(
+            user=user,
+            total_price=sum(product.price * quantity for product, quantity in lines.values()),
+            shipping_address=shipping_address,
+            phone=phone,
+            status='pending'
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product, quantity in lines.values()
+        ])
+        apply_product_sales({product.id: quantity for product, quantity in lines.values()})
+
+        CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+        StockReservation.objects.filter(cart_id=cart_id).delete()
+        adjust_cart_totals(
+            cart_id,
+            -sum(item.quantity for item in cart_items),
+            -sum(item.get_item_total() for item in cart_items),
+        )
+        # Stock shown on catalog pages changed
+        ordered = [product for product, quantity in lines.values()]
+        transaction.on_commit(lambda: invalidate_products(ordered))
+
+    return order
@@ -0,0 +1,193 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from userapp.mail import queue_email
+
+from .cache import bump_catalog, invalidate_products
+from .inventory import low_stock_reached, stock_changed
+from .models import Cart, Category, Order, OrderItem, Product
+from .rollups import (
+    apply_customer_order, apply_order_delta, apply_product_sales, order_day, sync_customer,
+)
+from .search import index_products, remove_products
+from .services import recompute_cart_totals
+
+inventory_logger = logging.getLogger('shop.inventory')
+
+
+# Keep cached cart totals in line with product price changes
+@receiver(post_save, sender=Product)
+def refresh_cart_totals_on_price_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'price' not in update_fields):
+        return
+    recompute_cart_totals(Cart.objects.filter(items__product=instance))
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts_before_product_delete(sender, instance, **kwargs):
+    instance._affected_cart_ids = list(
+        Cart.objects.filter(items__product=instance).values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def refresh_cart_totals_on_product_delete(sender, instance, **kwargs):
+    cart_ids = getattr(instance, '_affected_cart_ids', None)
+    if cart_ids:
+        recompute_cart_totals(Cart.objects.filter(id__in=cart_ids))
+
+
+# Invalidate cached storefront pages when the catalog changes
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, **kwargs):
+    if instance.pk and not instance._state.adding:
+        previous = Product.objects.filter(pk=instance.pk).values_list(
+            'category_id', 'image', 'low_stock').first()
+        if previous:
+            # low_stock belongs to main.inventory: keep the stored flag, not
+            # whatever this instance loaded
+            instance._previous_category_id, instance._previous_image, instance.low_stock = previous
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, **kwargs):
+    scopes = []
+    previous = getattr(instance, '_previous_category_id', None)
+    if previous and previous != instance.category_id:
+        scopes.append(f'category:{previous}')
+    transaction.on_commit(lambda: (invalidate_products([instance]), bump_catalog(*scopes)))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_catalog('categories', 'products', f'category:{instance.id}'))
+
+
+# Drop the old image's renditions when a product gets a new image;
+# rebuild_product_images --missing renders the new one (main.images)
+@receiver(post_save, sender=Product)
+def reset_product_renditions(sender, instance, created, **kwargs):
+    if created or not instance.image_renditions:
+        return
+    previous = getattr(instance, '_previous_image', instance.image.name)
+    if (instance.image.name or '') != (previous or ''):
+        instance.image_renditions = {}
+        Product.objects.filter(pk=instance.pk).update(image_renditions={})
+
+
+# Keep the product search index in step with the catalog. FTS5 rows are
+# written in the same transaction; the in-memory index applies on commit.
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    remove_products([instance.id])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        index_products(instance.products.select_related('category'))
+
+
+# Inventory alerts: stock or threshold edits re-evaluate the low_stock flag
+@receiver(post_save, sender=Product)
+def check_product_stock(sender, instance, created, update_fields=None, **kwargs):
+    if not (created or update_fields is None or {'stock', 'reorder_threshold'} & set(update_fields)):
+        return
+    # Form views may assign the raw strings
+    low = int(instance.stock) < int(instance.reorder_threshold)
+    if low != instance.low_stock:
+        stock_changed(Product.objects.filter(pk=instance.pk))
+        instance.low_stock = low
+
+
+@receiver(low_stock_reached)
+def alert_low_stock(sender, products, **kwargs):
+    lines = [f'{product.name} (#{product.id}): {product.stock} left, '
+             f'reorder at {product.reorder_threshold}' for product in products]
+    for line in lines:
+        inventory_logger.warning('Low stock: %s', line)
+    if settings.INVENTORY_ALERT_EMAILS:
+        queue_email(f'Low stock: {len(products)} product(s)', '\n'.join(lines),
+                    settings.INVENTORY_ALERT_EMAILS)
+
+
+# Keep the daily sales rollups in step with orders
+@receiver(pre_save, sender=Order)
+def remember_previous_order_totals(sender, instance, **kwargs):
+    if instance.pk and not instance._state.adding:
+        instance._previous_rollup = (
+            Order.objects.filter(pk=instance.pk).values_list('status', 'total_price').first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def roll_up_saved_order(sender, instance, created, **kwargs):
+    day = order_day(instance)
+    previous = None if created else getattr(instance, '_previous_rollup', None)
+    if previous == (instance.status, instance.total_price):
+        return
+    if previous is None:
+        apply_order_delta(day, instance.status, 1, instance.total_price)
+        return
+    with transaction.atomic(savepoint=False):
+        apply_order_delta(day, previous[0], -1, -previous[1])
+        apply_order_delta(day, instance.status, 1, instance.total_price)
+
+
+@receiver(post_delete, sender=Order)
+def roll_up_deleted_order(sender, instance, **kwargs):
+    apply_order_delta(order_day(instance), instance.status, -1, -instance.total_price)
+
+
+# Keep the customer directory's stats in step with users and orders
+@receiver(post_save, sender=User)
+def sync_customer_stats(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only
+    if created or update_fields is None or {'username', 'email'} & set(update_fields):
+        sync_customer(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_customer_stats(sender, instance, created, **kwargs):
+    apply_customer_order(instance, None if created else getattr(instance, '_previous_rollup', None))
+
+
+@receiver(post_delete, sender=Order)
+def remove_customer_stats(sender, instance, **kwargs):
+    apply_customer_order(instance, (instance.status, instance.total_price), removed=True)
+
+
+# Keep units sold per product in step with order items saved one at a time
+# (place_order bulk-creates its lines and applies them itself)
+@receiver(pre_save, sender=OrderItem)
+def remember_previous_item_units(sender, instance, **kwargs):
+    if instance.pk and not instance._state.adding:
+        instance._previous_units = (
+            OrderItem.objects.filter(pk=instance.pk).values_list('product_id', 'quantity').first()
+        )
+
+
+@receiver(post_save, sender=OrderItem)
+def roll_up_saved_item(sender, instance, created, **kwargs):
+    units = {instance.product_id: instance.quantity}
+    previous = None if created else getattr(instance, '_previous_units', None)
+    if previous:
+        units[previous[0]] = units.get(previous[0], 0) - previous[1]
+    apply_product_sales(units)
+
+
+@receiver(post_delete, sender=OrderItem)
+def roll_up_deleted_item(sender, instance, **kwargs):
+    apply_product_sales({instance.product_id: -instance.quantity})
@@ -0,0 +1,53 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz siblings are written without it
+    brotli = None
+
+# Static files storage
+#
+# collectstatic writes content-hashed copies (styles.3f2a9c1b.css) listed
+# in staticfiles.json, then precompressed .gz/.br siblings of every text
+# asset so the file server can send them without compressing per request.
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.xml'}
+# Below this, compression overhead outweighs the savings
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Until collectstatic has produced a manifest (fresh checkouts,
+        # tests) serve the unhashed name instead of raising
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        # mtime=0 keeps the .gz bytes identical across builds
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
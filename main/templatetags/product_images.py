@@ -0,0 +1,50 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+# Layout width hints for the browser, per rendition used as the fallback src
+SIZES = {
+    'thumb': '100px',
+    'card': '(max-width: 600px) 50vw, 280px',
+    'detail': '(max-width: 900px) 100vw, 600px',
+}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def _srcset(renditions, fmt):
+    # Small originals are never upscaled, so renditions can share a width
+    widths = {}
+    for entry in renditions.values():
+        if fmt in entry:
+            widths.setdefault(entry['width'], default_storage.url(entry[fmt]))
+    return ', '.join(f'{url} {width}w' for width, url in sorted(widths.items()))
+
+
+@register.simple_tag
+def product_picture(product, rendition='card', sizes=None, loading='lazy'):
+    """<picture> for a product image with a srcset per format.
+
+    Falls back to the original upload until renditions have been rendered.
+    """
+    renditions = product.image_renditions or {}
+    alt = product.name
+    if rendition not in renditions:
+        return format_html('<img src="{}" alt="{}" loading="{}">', product.image.url, alt, loading)
+
+    fallback = renditions[rendition]
+    sizes = sizes or SIZES.get(rendition, '100vw')
+    # Smallest-first preference: AVIF, then the WebP <img> every browser loads
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], _srcset(renditions, fmt), sizes)
+         for fmt in ('avif',) if fmt in fallback),
+    )
+    return format_html(
+        # display: contents keeps the templates' "container img" rules working
+        '<picture style="display: contents">{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" '
+        'loading="{}" decoding="async"></picture>',
+        sources, default_storage.url(fallback['webp']), _srcset(renditions, 'webp'), sizes,
+        fallback['width'], fallback['height'], alt, loading,
+    )
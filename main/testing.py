@@ -0,0 +1,125 @@
+import json
+import os
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from add_sample_data import create_sample_data
+from main.models import Cart, CartItem, Order, OrderItem, Product
+from main.recommendations import build_recommendations
+from main.rollups import rebuild_customer_stats, rebuild_daily_stats, rebuild_product_sales
+from main.services import recompute_cart_totals
+from userapp.models import UserProfile
+
+TEST_PASSWORD = 'shop-test-password'
+
+
+# Seed data for the query budget suites
+def seed_shop(scale=100, users=500, orders=2000, items_per_order=3, seed=7):
+    """Seed a realistic shop: the sample catalog repeated ``scale`` times,
+    customers with profiles and carts, and an order history.
+
+    Everything is written with bulk_create so thousands of rows load fast.
+    """
+    rng = random.Random(seed)
+    create_sample_data(scale=scale)
+    products = list(Product.objects.all())
+
+    password = make_password(TEST_PASSWORD)
+    customers = User.objects.bulk_create([
+        User(username=f'customer{i}@example.com', email=f'customer{i}@example.com',
+             first_name=f'Customer {i}', password=password)
+        for i in range(users)
+    ], batch_size=500)
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, phone=f'9{i:09d}') for i, user in enumerate(customers)
+    ], batch_size=500)
+    Cart.objects.bulk_create([Cart(user=user) for user in customers], batch_size=500)
+
+    statuses = [value for value, label in Order.STATUS_CHOICES]
+    order_rows = Order.objects.bulk_create([
+        Order(user=rng.choice(customers), total_price=Decimal('0'), status=rng.choice(statuses),
+              shipping_address='221B Baker Street', phone='9000000000')
+        for _ in range(orders)
+    ], batch_size=500)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=rng.randint(1, 3), price=product.price)
+        for order in order_rows
+        for product in rng.sample(products, items_per_order)
+    ], batch_size=500)
+    # Derived tables, built by commands in production
+    rebuild_daily_stats()
+    rebuild_product_sales()
+    rebuild_customer_stats()
+    build_recommendations()
+    return customers
+
+
+def make_shopper(username, products=(), orders=0, password=TEST_PASSWORD, **extra):
+    """Create a customer with a profile, a filled cart and ``orders`` past orders"""
+    user = User.objects.create_user(username=username, email=username, password=password,
+                                    first_name='Test', **extra)
+    UserProfile.objects.create(user=user, phone='9999999999')
+    cart = Cart.objects.create(user=user)
+    for product in products:
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+    for _ in range(orders):
+        order = Order.objects.create(user=user, total_price=Decimal('0'),
+                                     shipping_address='221B Baker Street', phone='9000000000')
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for product in products
+        ])
+    recompute_cart_totals(Cart.objects.filter(pk=cart.pk))
+    return user
+
+
+# Query budget enforcement
+class QueryBudgetTestCase(TestCase):
+    """TestCase that checks each request against a declared query budget.
+
+    Subclasses map URL names to the maximum number of SQL queries the view
+    may run in ``query_budgets``. Budgets must not depend on the amount of
+    data, so an N+1 introduced anywhere shows up as a failure. Set
+    ``QUERY_BUDGET_REPORT=<path>`` to append every measurement (query count
+    and wall time) to a JSON-lines file.
+    """
+
+    query_budgets = {}
+
+    def setUp(self):
+        # Budgets measure the uncached path
+        cache.clear()
+        super().setUp()
+
+    def request_within_budget(self, url_name, url, method='get', data=None, **extra):
+        budget = self.query_budgets[url_name]
+        with CaptureQueriesContext(connection) as queries:
+            began = time.perf_counter()
+            response = getattr(self.client, method)(url, data or {}, **extra)
+            elapsed = time.perf_counter() - began
+        self._record(url_name, url, method, len(queries), budget, elapsed)
+        if len(queries) > budget:
+            executed = '\n'.join(
+                f'{i}. {query["sql"]}' for i, query in enumerate(queries.captured_queries, start=1)
+            )
+            self.fail(f'{url_name} ({method.upper()} {url}) ran {len(queries)} queries, '
+                      f'budget is {budget}:\n{executed}')
+        return response
+
+    def _record(self, url_name, url, method, count, budget, elapsed):
+        path = os.environ.get('QUERY_BUDGET_REPORT')
+        if not path:
+            return
+        with open(path, 'a') as report:
+            report.write(json.dumps({
+                'url_name': url_name, 'url': url, 'method': method.upper(),
+                'queries': count, 'budget': budget, 'ms': round(elapsed * 1000, 2),
+            }) + '\n')
@@ -1,3 +1,1332 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from wsgiref.util import setup_testing_defaults
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from userapp.models import OutboundEmail
+
+from . import async_views
+from .bench import percentile
+from .db import read_only
+from .fileserver import FileIndex, ServeFilesASGI, ServeFilesWSGI
+from .inventory import low_stock_products, low_stock_reached, stock_changed
+from .loadtest import Recorder, Shopper, compare, summarize
+from .models import (
+    Cart, CartItem, Category, CustomerStats, Order, OrderDailyStats, OrderItem, Product,
+    ProductRecommendation, StockReservation,
+)
+from .recommendations import build_recommendations, related_products, vectorized_available
+from .rollups import (
+    daily_orders, rebuild_customer_stats, rebuild_daily_stats, rebuild_product_sales, sales_totals,
+    status_counts, top_products,
+)
+from .search import rebuild_index, search_product_ids, search_products
+from .testing import TEST_PASSWORD, QueryBudgetTestCase, make_shopper, seed_shop
+from .throttle import hit
+from .services import (
+    EmptyCart, InsufficientStock, InvalidQuantity, add_cart_item, available_stock, place_order,
+    remove_cart_item, set_cart_item_quantity,
+)
+
+CSRF_TOKEN_RE = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+
+class CheckoutServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer@example.com', password='pw')
+        self.cart = Cart.objects.create(user=self.user)
+        category = Category.objects.create(name='Running')
+        self.shoe = Product.objects.create(name='Shoe', category=category, price=Decimal('100.00'), stock=5)
+        self.boot = Product.objects.create(name='Boot', category=category, price=Decimal('250.00'), stock=1)
+
+    def test_place_order_decrements_stock_and_clears_cart(self):
+        add_cart_item(self.cart, self.shoe, 2)
+        add_cart_item(self.cart, self.boot, 1)
+
+        order = place_order(self.user, '1 Main St', '555')
+
+        self.assertEqual(order.total_price, Decimal('450.00'))
+        self.assertEqual(order.items.count(), 2)
+        self.shoe.refresh_from_db()
+        self.boot.refresh_from_db()
+        self.assertEqual(self.shoe.stock, 3)
+        self.assertEqual(self.boot.stock, 0)
+        self.assertFalse(self.cart.items.exists())
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_items, self.cart.total_price), (0, Decimal('0.00')))
+
+    def test_oversold_line_rolls_back_whole_order(self):
+        CartItem.objects.create(cart=self.cart, product=self.shoe, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.boot, quantity=2)
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            place_order(self.user, '1 Main St', '555')
+
+        self.assertEqual(ctx.exception.products, [self.boot])
+        self.shoe.refresh_from_db()
+        self.assertEqual(self.shoe.stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_empty_cart(self):
+        with self.assertRaises(EmptyCart):
+            place_order(self.user, '1 Main St', '555')
+
+    def test_non_positive_quantities_are_rejected(self):
+        self.client.force_login(self.user)
+        for quantity in ('-3', '0', 'lots'):
+            response = self.client.post(reverse('add_to_cart', args=[self.shoe.id]),
+                                        {'quantity': quantity})
+            self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.assertFalse(self.cart.items.exists())
+
+        item = add_cart_item(self.cart, self.shoe, 2)
+        response = self.client.post(reverse('update_cart_item', args=[item.id]), {'quantity': '-3'})
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 2)
+
+        # Updating a line to 0 still removes it
+        response = self.client.post(reverse('update_cart_item', args=[item.id]), {'quantity': '0'})
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.assertFalse(self.cart.items.exists())
+        item = add_cart_item(self.cart, self.shoe, 2)
+
+        with self.assertRaises(InvalidQuantity):
+            add_cart_item(self.cart, self.shoe, -3)
+        with self.assertRaises(InvalidQuantity):
+            set_cart_item_quantity(item, -3)
+
+        # A bad line written around the services still can't be checked out
+        CartItem.objects.filter(id=item.id).update(quantity=-3)
+        response = self.client.post(reverse('checkout'), {'shipping_address': '1 Main St',
+                                                          'phone': '555'})
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.shoe.refresh_from_db()
+        self.assertEqual(self.shoe.stock, 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_queries_grow_by_one_per_line(self):
+        def checkout_queries(lines):
+            for i in range(lines):
+                product = Product.objects.create(name=f'P{lines}-{i}', category=self.shoe.category,
+                                                 price=Decimal('10.00'), stock=10)
+                CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+            with CaptureQueriesContext(connection) as queries:
+                place_order(self.user, '1 Main St', '555')
+            return len(queries)
+
+        # Fixed: savepoint + select + order insert + bulk insert + product
+        # sales + delete + reservation release + totals update + sales
+        # rollup + customer stats + release. Per line: one conditional
+        # stock UPDATE, so oversold lines are caught without locking rows.
+        self.assertEqual(checkout_queries(2), 11 + 2)
+        self.assertEqual(checkout_queries(10), 11 + 10)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Running')
+        self.boot = Product.objects.create(name='Boot', category=category, price=Decimal('250.00'), stock=2)
+        self.carts = [
+            Cart.objects.create(user=User.objects.create_user(username=f'buyer{i}@example.com', password='pw'))
+            for i in range(2)
+        ]
+
+    def test_holds_reduce_stock_available_to_other_carts(self):
+        first, second = self.carts
+        add_cart_item(first, self.boot, 2)
+        self.assertEqual(available_stock([self.boot.id], second.id), {self.boot.id: 0})
+        self.assertEqual(available_stock([self.boot.id], first.id), {self.boot.id: 2})
+        with self.assertRaises(InsufficientStock):
+            add_cart_item(second, self.boot, 1)
+        self.assertFalse(second.items.exists())
+
+        item = first.items.select_related('product').get()
+        set_cart_item_quantity(item, 1)
+        add_cart_item(second, self.boot, 1)
+        with self.assertRaises(InsufficientStock):
+            set_cart_item_quantity(item, 2)
+        self.assertEqual(first.items.get().quantity, 1)
+
+        remove_cart_item(first.items.select_related('product').get())
+        self.assertEqual(available_stock([self.boot.id], second.id), {self.boot.id: 2})
+
+    def test_checkout_converts_holds_and_respects_other_carts(self):
+        first, second = self.carts
+        add_cart_item(first, self.boot, 1)
+        # A line carted before its stock was held by someone else
+        CartItem.objects.create(cart=second, product=self.boot, quantity=2)
+        with self.assertRaises(InsufficientStock):
+            place_order(second.user, '1 Main St', '555')
+
+        place_order(first.user, '1 Main St', '555')
+        self.boot.refresh_from_db()
+        self.assertEqual(self.boot.stock, 1)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_holds_are_ignored_and_released(self):
+        first, second = self.carts
+        add_cart_item(first, self.boot, 2)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        add_cart_item(second, self.boot, 2)
+
+        out = StringIO()
+        call_command('release_expired_reservations', '--once', '--batch-size', '1', stdout=out)
+        self.assertIn('Released 1 expired reservations', out.getvalue())
+        self.assertEqual(StockReservation.objects.get().cart, second)
+
+    def test_add_to_cart_view_reports_shortage(self):
+        add_cart_item(self.carts[0], self.boot, 2)
+        self.client.force_login(self.carts[1].user)
+        response = self.client.post(reverse('add_to_cart', args=[self.boot.id]), follow=True)
+        self.assertContains(response, 'Not enough stock for: Boot')
+        self.assertFalse(response.context['cart_items'])
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper@example.com', password='pw')
+        self.cart = Cart.objects.create(user=self.user)
+        category = Category.objects.create(name='Casual')
+        self.shoe = Product.objects.create(name='Shoe', category=category, price=Decimal('100.00'), stock=5)
+
+    def assertTotals(self, items, price):
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_items, items)
+        self.assertEqual(self.cart.total_price, Decimal(price))
+
+    def test_line_changes_keep_totals_current(self):
+        item = add_cart_item(self.cart, self.shoe, 2)
+        add_cart_item(self.cart, self.shoe, 1)
+        self.assertTotals(3, '300.00')
+
+        item.refresh_from_db()
+        set_cart_item_quantity(item, 1)
+        self.assertTotals(1, '100.00')
+
+        remove_cart_item(item)
+        self.assertTotals(0, '0.00')
+
+    def test_price_change_updates_carts(self):
+        add_cart_item(self.cart, self.shoe, 2)
+        self.shoe.price = Decimal('80.00')
+        self.shoe.save()
+        self.assertTotals(2, '160.00')
+
+    def test_recompute_repairs_drift(self):
+        CartItem.objects.create(cart=self.cart, product=self.shoe, quantity=4)
+        call_command('recompute_cart_totals', stdout=StringIO())
+        self.assertTotals(4, '400.00')
+
+
+
+class CartApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper@example.com', password='pw')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Casual')
+        self.shoe = Product.objects.create(name='Shoe', category=category, price=Decimal('100.00'), stock=5)
+        self.boot = Product.objects.create(name='Boot', category=category, price=Decimal('250.00'), stock=1)
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), data, content_type='application/json')
+
+    def test_add_merges_into_one_line_and_returns_totals(self):
+        self.post('api_cart_add', {'product_id': self.shoe.id, 'quantity': 2})
+        response = self.post('api_cart_add', {'product_id': self.shoe.id})
+        item = CartItem.objects.get()
+        self.assertEqual(response.json(), {
+            'lines': [{'product_id': self.shoe.id, 'item_id': item.id, 'quantity': 3,
+                       'price': '100.00', 'line_total': '300.00'}],
+            'cart': {'total_items': 3, 'total_price': '300.00'},
+        })
+        self.assertEqual(StockReservation.objects.get().quantity, 3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=item.cart, product=self.shoe)
+
+    def test_set_remove_and_batch(self):
+        self.post('api_cart_add', {'product_id': self.shoe.id, 'quantity': 2})
+        response = self.post('api_cart_set', {'product_id': self.shoe.id, 'quantity': 4})
+        self.assertEqual(response.json()['cart'], {'total_items': 4, 'total_price': '400.00'})
+
+        response = self.post('api_cart_batch', {'lines': [
+            {'product_id': self.shoe.id, 'quantity': 1}, {'product_id': self.boot.id, 'quantity': 1},
+        ]})
+        self.assertEqual([line['quantity'] for line in response.json()['lines']], [1, 1])
+        self.assertEqual(response.json()['cart'], {'total_items': 2, 'total_price': '350.00'})
+
+        # All or nothing: the shoe line is untouched when the boot is short
+        response = self.post('api_cart_batch', {'lines': [
+            {'product_id': self.shoe.id, 'quantity': 3}, {'product_id': self.boot.id, 'quantity': 2},
+        ]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['product_ids'], [self.boot.id])
+        self.assertEqual(CartItem.objects.get(product=self.shoe).quantity, 1)
+
+        response = self.post('api_cart_remove', {'product_id': self.boot.id})
+        self.assertEqual(response.json()['lines'][0]['quantity'], 0)
+        self.assertEqual(response.json()['cart'], {'total_items': 1, 'total_price': '100.00'})
+        response = self.client.get(reverse('api_cart'))
+        self.assertEqual([line['product_id'] for line in response.json()['lines']], [self.shoe.id])
+
+    def test_errors(self):
+        self.assertEqual(self.post('api_cart_add', {'product_id': self.shoe.id, 'quantity': 0}).status_code, 400)
+        self.assertEqual(self.post('api_cart_set', {'product_id': 'x', 'quantity': 1}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api_cart_add'), 'nope',
+                                          content_type='application/json').status_code, 400)
+        self.boot.is_active = False
+        self.boot.save()
+        self.assertEqual(self.post('api_cart_add', {'product_id': self.boot.id}).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.post('api_cart_add', {'product_id': self.shoe.id}).status_code, 401)
+        self.assertFalse(CartItem.objects.exists())
+
+class StorefrontQueryBudgetTests(QueryBudgetTestCase):
+    query_budgets = {
+        'home': 1,
+        'products': 3,
+        'product_detail': 2,
+        'search': 2,
+        'stock': 0,
+        'aboutus': 0,
+        'contact': 0,
+        'view_cart': 4,
+        'add_to_cart': 10,
+        'update_cart_item': 8,
+        'remove_from_cart': 7,
+        'api_cart': 3,
+        'api_cart_add': 10,
+        'api_cart_set': 11,
+        'api_cart_remove': 10,
+        # Five lines, same statements as a single set
+        'api_cart_batch': 11,
+        # POST: one conditional stock UPDATE per cart line (5 in these tests)
+        'checkout': 18,
+        'order_confirmation': 4,
+        'my_orders': 4,
+        'admin:index': 3,
+        'admin:main_cart_changelist': 5,
+        'admin:main_order_changelist': 5,
+        'admin:main_product_changelist': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_shop()
+        cls.products = list(Product.objects.order_by('id')[:5])
+        cls.shopper = make_shopper('shopper@example.com', products=cls.products, orders=40)
+        cls.staff = make_shopper('staff@example.com', is_staff=True, is_superuser=True)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.shopper)
+
+    def test_public_pages(self):
+        self.client.logout()
+        category = Category.objects.first()
+        self.request_within_budget('home', reverse('home'))
+        self.request_within_budget('products', reverse('products'))
+        self.request_within_budget('products', reverse('products') + f'?category={category.name}')
+        self.request_within_budget('product_detail', reverse('product_detail', args=[self.products[0].id]))
+        response = self.request_within_budget('search', reverse('search') + '?q=running sho')
+        self.assertTrue(response.context['results'])
+        for name in ('stock', 'aboutus', 'contact'):
+            self.request_within_budget(name, reverse(name))
+
+    def test_cart_pages(self):
+        response = self.request_within_budget('view_cart', reverse('view_cart'))
+        self.assertEqual(len(response.context['cart_items']), 5)
+        self.request_within_budget('add_to_cart', reverse('add_to_cart', args=[self.products[0].id]),
+                                   method='post', data={'quantity': 2})
+        item = CartItem.objects.filter(cart__user=self.shopper).first()
+        self.request_within_budget('update_cart_item', reverse('update_cart_item', args=[item.id]),
+                                   method='post', data={'quantity': 3})
+        self.request_within_budget('remove_from_cart', reverse('remove_from_cart', args=[item.id]),
+                                   method='post')
+
+    def test_cart_api(self):
+        json_post = {'method': 'post', 'content_type': 'application/json'}
+        response = self.request_within_budget('api_cart', reverse('api_cart'))
+        self.assertEqual(len(response.json()['lines']), 5)
+        product_id = self.products[0].id
+        self.request_within_budget('api_cart_add', reverse('api_cart_add'),
+                                   data={'product_id': product_id, 'quantity': 2}, **json_post)
+        self.request_within_budget('api_cart_set', reverse('api_cart_set'),
+                                   data={'product_id': product_id, 'quantity': 1}, **json_post)
+        self.request_within_budget('api_cart_remove', reverse('api_cart_remove'),
+                                   data={'product_id': product_id}, **json_post)
+        response = self.request_within_budget('api_cart_batch', reverse('api_cart_batch'), data={'lines': [
+            {'product_id': product.id, 'quantity': 1} for product in self.products
+        ]}, **json_post)
+        self.assertEqual(response.json()['cart']['total_items'], 5)
+
+    def test_checkout_and_orders(self):
+        self.request_within_budget('checkout', reverse('checkout'))
+        response = self.request_within_budget('checkout', reverse('checkout'), method='post',
+                                              data={'shipping_address': '1 Main St', 'phone': '555'})
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.filter(user=self.shopper).latest('id')
+        self.request_within_budget('order_confirmation', reverse('order_confirmation', args=[order.id]))
+        response = self.request_within_budget('my_orders', reverse('my_orders'))
+        self.assertEqual(len(response.context['orders']), 41)
+
+    def test_django_admin(self):
+        self.client.force_login(self.staff)
+        for name in ('admin:index', 'admin:main_cart_changelist',
+                     'admin:main_order_changelist', 'admin:main_product_changelist'):
+            self.request_within_budget(name, reverse(name))
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def test_server_timing_header_and_log_line(self):
+        cache.clear()
+        Category.objects.create(name='Running')
+        with self.assertLogs('shop.perf', level='INFO') as logs:
+            response = self.client.get(reverse('products'))
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['url_name'], 'products')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['db_queries'], 3)
+        self.assertGreater(entry['template_ms'], 0)
+
+
+@override_settings(THROTTLE_RULES={
+    'login': [('ip', 5, 60), ('account', 3, 60)],
+    'verify_otp': [('account', 2, 60)],
+})
+class ThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_shopper('throttled@example.com')
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, email='throttled@example.com', ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'email': email, 'password': 'wrong'},
+                                REMOTE_ADDR=ip)
+
+    def test_sliding_window(self):
+        self.assertEqual([hit('k', 3, 60, now=600 + t) for t in (0, 1, 2, 3)], [0, 0, 0, 57])
+        # Half way into the next window half of the old count still applies
+        self.assertEqual(hit('k', 3, 60, now=690), 0)
+        self.assertEqual(hit('k', 3, 60, now=690), 10)
+        self.assertEqual(hit('k', 3, 60, now=720), 0)
+
+    def test_rejected_before_any_query(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Other accounts from the same address still get through, up to the IP limit
+        self.assertEqual(self.login('other@example.com').status_code, 302)
+        self.assertEqual(self.login('other@example.com').status_code, 429)
+        self.assertEqual(self.login('other@example.com', ip='10.0.0.2').status_code, 302)
+        # Viewing the form isn't throttled
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+
+    def test_otp_guesses_limited_per_pending_login(self):
+        self.client.post(reverse('login'), {'email': self.user.username, 'password': TEST_PASSWORD})
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('verify_otp'), {'otp': 'nope'}).status_code, 302)
+        self.assertEqual(self.client.post(reverse('verify_otp'), {'otp': 'nope'}).status_code, 429)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trail')
+        self.other = Category.objects.create(name='Formal')
+        self.shoe = Product.objects.create(name='Trail Shoe', category=self.category,
+                                           price=Decimal('100.00'), stock=5)
+        Product.objects.create(name='Trail Boot', category=self.category, price=Decimal('150.00'), stock=5)
+
+    def warm(self, url):
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            return self.client.get(url)
+
+    def test_anonymous_catalog_pages_served_without_queries(self):
+        for url in (reverse('home'), reverse('products'), reverse('products') + '?category=Trail',
+                    reverse('product_detail', args=[self.shoe.id])):
+            response = self.warm(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Trail Boot')
+
+    def test_product_save_invalidates_its_pages(self):
+        detail = reverse('product_detail', args=[self.shoe.id])
+        listing = reverse('products') + '?category=Trail'
+        self.warm(detail)
+        self.warm(listing)
+        other_listing = reverse('products') + '?category=Formal'
+        self.warm(other_listing)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shoe.name = 'Renamed Runner'
+            self.shoe.save()
+
+        self.assertContains(self.client.get(detail), 'Renamed Runner')
+        self.assertContains(self.client.get(listing), 'Renamed Runner')
+        # Listings for other categories stay cached
+        with self.assertNumQueries(0):
+            self.client.get(other_listing)
+
+    def test_checkout_invalidates_stock(self):
+        user = User.objects.create_user(username='buyer@example.com', password='pw')
+        cart = Cart.objects.create(user=user)
+        add_cart_item(cart, self.shoe, 2)
+        detail = reverse('product_detail', args=[self.shoe.id])
+        self.assertContains(self.warm(detail), '5 pairs')
+
+        with self.assertLogs('shop.inventory', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            place_order(user, '1 Main St', '555')
+
+        self.assertContains(self.client.get(detail), '3 pairs')
+
+    def test_missing_product_is_404(self):
+        self.assertEqual(self.client.get(reverse('product_detail', args=[999])).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trail')
+        self.other = Category.objects.create(name='Formal')
+        self.shoe = Product.objects.create(name='Trail Shoe', category=self.category,
+                                           price=Decimal('100.00'), stock=5)
+        Product.objects.create(name='Trail Boot', category=self.category, price=Decimal('150.00'), stock=5)
+
+    def revalidate(self, url, **headers):
+        """GET ``url``, then again with its validators; the second response"""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return self.client.get(url, headers={'If-None-Match': first['ETag'], **headers})
+
+    def test_repeat_visit_is_not_modified_without_queries_or_rendering(self):
+        for url in (reverse('products'), reverse('products') + '?category=Trail',
+                    reverse('product_detail', args=[self.shoe.id])):
+            first = self.client.get(url)
+            self.assertIn('Last-Modified', first)
+            with self.assertNumQueries(0):
+                response = self.client.get(url, headers={'If-None-Match': first['ETag']})
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.templates, [])
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], first['ETag'])
+            response = self.client.get(url, headers={'If-Modified-Since': first['Last-Modified']})
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_changes_invalidate_the_validators(self):
+        detail = reverse('product_detail', args=[self.shoe.id])
+        listing = reverse('products') + '?category=Trail'
+        etags = {url: self.client.get(url)['ETag'] for url in (detail, listing)}
+
+        # Moving a product out doesn't raise the newest updated_at left behind
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shoe.category = self.other
+            self.shoe.save()
+        for url, etag in etags.items():
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200, url)
+        self.assertNotContains(response, 'Trail Shoe')
+
+        # Checkout changes stock with an UPDATE, which must touch updated_at
+        user = make_shopper('buyer@example.com', products=[self.shoe])
+        self.client.force_login(user)
+        etag = self.client.get(detail)['ETag']
+        with self.assertLogs('shop.inventory', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            place_order(user, '1 Main St', '555')
+        response = self.client.get(detail, headers={'If-None-Match': etag})
+        self.assertContains(response, '4 pairs')
+
+    def test_validators_cover_the_visitor(self):
+        detail = reverse('product_detail', args=[self.shoe.id])
+        etag = self.client.get(detail)['ETag']
+        self.client.force_login(make_shopper('shopper@example.com'))
+        response = self.client.get(detail, headers={'If-None-Match': etag})
+        self.assertContains(response, 'Add to Cart')
+        self.assertEqual(self.revalidate(detail).status_code, 304)
+
+    def test_order_confirmation(self):
+        user = make_shopper('buyer@example.com', orders=1)
+        order = user.orders.get()
+        url = reverse('order_confirmation', args=[order.id])
+        self.client.force_login(user)
+        self.assertEqual(self.revalidate(url).status_code, 304)
+
+        etag = self.client.get(url)['ETag']
+        order.status = 'shipped'
+        order.save()
+        self.assertContains(self.client.get(url, headers={'If-None-Match': etag}), 'Shipped')
+
+        self.client.force_login(make_shopper('other@example.com'))
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='Shop.urls_async')
+class AsyncCatalogViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_shop()
+        cls.products = list(Product.objects.order_by('id')[:3])
+        cls.shopper = make_shopper('async@example.com', products=cls.products[:2])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_catalog_pages_match_sync_views(self):
+        product = self.products[0]
+        urls = [reverse('home'), reverse('products'),
+                reverse('products') + f'?category={product.category.name}&sort=price_asc',
+                reverse('product_detail', args=[product.id])]
+        for url in urls:
+            async_response = self.client.get(url)
+            self.assertEqual(async_response.status_code, 200)
+            cache.clear()
+            with override_settings(ROOT_URLCONF='Shop.urls'):
+                sync_response = self.client.get(url)
+            cache.clear()
+            self.assertEqual(CSRF_TOKEN_RE.sub(b'', async_response.content),
+                             CSRF_TOKEN_RE.sub(b'', sync_response.content), url)
+
+    def test_fragment_evicted_before_render(self):
+        read = async_views._cached_fragment
+
+        async def read_then_evict(*args):
+            fragment = await read(*args)
+            cache.clear()
+            return fragment
+
+        for url in (reverse('home'), reverse('products'),
+                    reverse('product_detail', args=[self.products[0].id])):
+            expected = CSRF_TOKEN_RE.sub(b'', self.client.get(url).content)
+            with mock.patch.object(async_views, '_cached_fragment', read_then_evict):
+                response = self.client.get(url)
+            self.assertEqual(CSRF_TOKEN_RE.sub(b'', response.content), expected, url)
+
+    def test_cached_fragments_skip_catalog_queries(self):
+        for url in (reverse('home'), reverse('products'),
+                    reverse('product_detail', args=[self.products[0].id])):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_conditional_get(self):
+        for url in (reverse('products'), reverse('product_detail', args=[self.products[0].id])):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_missing_product_is_404(self):
+        missing = Product.objects.order_by('-id').first().id + 1
+        self.assertEqual(self.client.get(reverse('product_detail', args=[missing])).status_code, 404)
+
+    def test_cart(self):
+        self.client.force_login(self.shopper)
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(len(response.context['cart_items']), 2)
+
+        response = self.client.post(reverse('add_to_cart', args=[self.products[2].id]), {'quantity': 2})
+        self.assertRedirects(response, reverse('view_cart'))
+        item = CartItem.objects.get(cart__user=self.shopper, product=self.products[2])
+        self.assertEqual(item.quantity, 2)
+
+        Product.objects.filter(id=self.products[2].id).update(is_active=False)
+        response = self.client.post(reverse('add_to_cart', args=[self.products[2].id]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_client_and_server_timing(self):
+        response = await self.async_client.get(reverse('products'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+
+class ProductListingPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Trail')
+        cls.other = Category.objects.create(name='Formal')
+        # Identical timestamps and prices force the id tie-breaker to matter
+        Product.objects.bulk_create(
+            [Product(name=f'Trail {i}', category=cls.category, price=Decimal(100 + i % 7), stock=1)
+             for i in range(60)]
+            + [Product(name=f'Formal {i}', category=cls.other, price=Decimal('90.00'), stock=1)
+               for i in range(5)]
+        )
+        Product.objects.filter(category=cls.category).update(created_at=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, params):
+        seen = []
+        response = self.client.get(reverse('products'), params)
+        while True:
+            page = response.context['page']
+            seen.extend(product.id for product in page)
+            if not page.has_next:
+                return seen, response
+            response = self.client.get(reverse('products'), dict(params, after=page.next_cursor))
+
+    def test_pages_cover_category_exactly_once_in_order(self):
+        for sort, key in (('newest', lambda p: (p.created_at, p.id)),
+                          ('price_low', lambda p: (-p.price, -p.id)),
+                          ('price_high', lambda p: (p.price, p.id))):
+            seen, last = self.walk({'category': self.category.id, 'sort': sort})
+            expected = sorted(Product.objects.filter(category=self.category), key=key, reverse=True)
+            self.assertEqual(seen, [p.id for p in expected], sort)
+            self.assertEqual(last.context['page'].total, 60)
+
+    def test_previous_cursor_returns_prior_page(self):
+        params = {'category': self.category.id}
+        first = self.client.get(reverse('products'), params).context['page']
+        second = self.client.get(reverse('products'), dict(params, after=first.next_cursor)).context['page']
+        back = self.client.get(reverse('products'), dict(params, before=second.previous_cursor)).context['page']
+        self.assertEqual([p.id for p in back], [p.id for p in first])
+        self.assertFalse(back.has_previous)
+
+    def test_legacy_category_name_and_bad_cursor(self):
+        response = self.client.get(reverse('products'), {'category': 'Formal', 'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 5)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.running = Category.objects.create(name='Running')
+        self.formal = Category.objects.create(name='Formal')
+        self.runner = Product.objects.create(name='Nike Pegasus Runner', category=self.running,
+                                             price=Decimal('100.00'), stock=5,
+                                             description='Lightweight daily trainer')
+        self.oxford = Product.objects.create(name='Leather Oxford', category=self.formal,
+                                             price=Decimal('150.00'), stock=5,
+                                             description='Goes with running errands too')
+        self.hidden = Product.objects.create(name='Nike Retired Runner', category=self.running,
+                                             price=Decimal('90.00'), stock=0, is_active=False)
+        rebuild_index()
+
+    def test_prefix_terms_rank_name_matches_first(self):
+        self.assertEqual(search_product_ids('nik peg'), [self.runner.id])
+        # "run" prefixes the runner's name and category but only the oxford's description
+        ids = search_product_ids('run')
+        self.assertEqual(ids[-1], self.oxford.id)
+        self.assertEqual(set(ids), {self.runner.id, self.oxford.id, self.hidden.id})
+        self.assertEqual(search_product_ids('"; DROP TABLE'), [])
+        self.assertEqual(search_product_ids('   '), [])
+
+    def test_index_follows_product_and_category_changes(self):
+        self.oxford.name = 'Suede Derby'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oxford.save()
+        self.assertEqual(search_product_ids('oxford'), [])
+        self.assertEqual(search_product_ids('derby'), [self.oxford.id])
+
+        self.formal.name = 'Office'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.formal.save()
+        self.assertEqual(search_product_ids('office'), [self.oxford.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.runner.delete()
+        self.assertEqual(search_product_ids('pegasus'), [])
+
+    def test_rolled_back_save_is_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Product.objects.create(name='Zebra Slip-on', category=self.formal, price=Decimal('40.00'))
+                Product.objects.create(name='Duplicate', category=self.formal, price=Decimal('40.00'),
+                                       sku='Z-1')
+                Product.objects.create(name='Duplicate', category=self.formal, price=Decimal('40.00'),
+                                       sku='Z-1')
+        self.assertEqual(search_product_ids('zebra'), [])
+
+    def test_inactive_matches_do_not_crowd_out_active_ones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                Product.objects.create(name='Nike Nike Nike', category=self.running,
+                                       price=Decimal('90.00'), is_active=False)
+        self.assertNotEqual(search_product_ids('nike', limit=1), [self.runner.id])
+        self.assertEqual(search_products('nike', limit=1), [self.runner])
+
+    def test_storefront_search_hides_inactive_products(self):
+        response = self.client.get(reverse('search'), {'q': 'nike'})
+        self.assertEqual(response.context['results'], [self.runner])
+        self.assertContains(response, 'Nike Pegasus Runner')
+        self.assertNotContains(response, 'Nike Retired Runner')
+
+    def test_admin_search_uses_index(self):
+        staff = make_shopper('staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('admin_products'), {'search': 'runner'})
+        self.assertEqual({p.id for p in response.context['products']}, {self.runner.id, self.hidden.id})
+
+
+@override_settings(PRODUCT_SEARCH_BACKEND='memory')
+class MemorySearchTests(ProductSearchTests):
+    pass
+
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer@example.com', password='pw')
+        running = Category.objects.create(name='Running')
+        casual = Category.objects.create(name='Casual')
+        self.shoe, self.socks, self.laces = (
+            Product.objects.create(name=name, category=running, price=Decimal('10.00'))
+            for name in ('Shoe', 'Socks', 'Laces')
+        )
+        self.loafer = Product.objects.create(name='Loafer', category=casual, price=Decimal('10.00'))
+        self.basket(self.shoe, self.loafer)
+        self.basket(self.shoe, self.loafer)
+        self.basket(self.shoe, self.socks)
+        self.basket(self.socks, status='cancelled')
+
+    def basket(self, *products, status='delivered'):
+        order = Order.objects.create(user=self.user, total_price=Decimal('0'), shipping_address='x',
+                                     phone='1', status=status)
+        OrderItem.objects.bulk_create([OrderItem(order=order, product=p, quantity=1, price=p.price)
+                                       for p in products])
+
+    def stored(self):
+        return list(ProductRecommendation.objects.order_by('product_id', 'rank')
+                    .values_list('product_id', 'recommended_id', 'rank', 'score'))
+
+    def test_co_purchases_rank_first_then_category(self):
+        call_command('build_recommendations', '--window', '2', '--engine', 'python', stdout=StringIO())
+        shoe = ProductRecommendation.objects.filter(product=self.shoe).order_by('rank')
+        # loafer: 2 / sqrt(3 * 2); socks: 1 / sqrt(3 * 1); laces: same-category padding
+        self.assertEqual([(r.recommended_id, round(r.score, 3)) for r in shoe],
+                         [(self.loafer.id, 0.816), (self.socks.id, 0.577), (self.laces.id, 0.0)])
+
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product_detail', args=[self.shoe.id]))
+        self.assertEqual(response.context['related_products'][:3], [self.loafer, self.socks, self.laces])
+
+    @skipUnless(vectorized_available(), 'NumPy/SciPy not installed')
+    def test_numpy_and_python_builds_agree(self):
+        build_recommendations(window=2, vectorized=False)
+        python_rows = self.stored()
+        build_recommendations(window=2, vectorized=True)
+        self.assertEqual(self.stored(), python_rows)
+
+    def test_products_without_rows_fall_back_to_category(self):
+        build_recommendations()
+        boot = Product.objects.create(name='Boot', category=self.shoe.category, price=Decimal('10.00'))
+        self.assertEqual(related_products(boot), [self.laces, self.socks, self.shoe])
+        self.socks.is_active = False
+        self.socks.save()
+        self.assertEqual(related_products(self.loafer), [self.shoe])
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer@example.com', password='pw')
+        self.cart = Cart.objects.create(user=self.user)
+        category = Category.objects.create(name='Running')
+        self.shoe = Product.objects.create(name='Shoe', category=category, price=Decimal('100.00'), stock=50)
+
+    def buy(self, quantity):
+        add_cart_item(self.cart, self.shoe, quantity)
+        return place_order(self.user, '1 Main St', '555')
+
+    def snapshot(self):
+        return sorted(OrderDailyStats.objects.filter(order_count__gt=0)
+                      .values_list('date', 'status', 'order_count', 'revenue'))
+
+    def test_rollups_follow_order_writes(self):
+        first, second, third = self.buy(1), self.buy(2), self.buy(3)
+        self.assertEqual(sales_totals(), (3, Decimal('600.00')))
+
+        second.status = 'shipped'
+        second.save()
+        first.delete()
+        # Saving without a status or total change leaves the rollups alone
+        third.phone = '999'
+        third.save()
+
+        self.assertEqual(sales_totals(), (2, Decimal('500.00')))
+        self.assertEqual(status_counts()['shipped'], 1)
+        self.assertEqual(status_counts()['pending'], 1)
+        self.assertEqual(daily_orders(7)[-1][1:], (2, Decimal('500.00')))
+        live = self.snapshot()
+        rebuild_daily_stats()
+        self.assertEqual(self.snapshot(), live)
+
+    def test_product_sales_follow_order_items(self):
+        boot = Product.objects.create(name='Boot', category=self.shoe.category,
+                                      price=Decimal('250.00'), stock=50)
+        self.buy(2)
+        add_cart_item(self.cart, boot, 1)
+        order = self.buy(3)
+        self.assertEqual(top_products(), [{'product__name': 'Shoe', 'total_qty': 5},
+                                          {'product__name': 'Boot', 'total_qty': 1}])
+
+        item = order.items.get(product=boot)
+        item.quantity = 7
+        item.save()
+        order.items.get(product=self.shoe).delete()
+        self.assertEqual(top_products(1), [{'product__name': 'Boot', 'total_qty': 7}])
+
+        grouped = sorted(OrderItem.objects.order_by().values_list('product__name')
+                         .annotate(Sum('quantity')))
+        self.assertEqual(sorted((row['product__name'], row['total_qty']) for row in top_products()),
+                         grouped)
+        rebuild_product_sales()
+        self.assertEqual(sorted((row['product__name'], row['total_qty']) for row in top_products()),
+                         grouped)
+
+    def test_rebuild_command_backfills_bulk_orders(self):
+        old = timezone.now() - timezone.timedelta(days=40)
+        Order.objects.bulk_create([
+            Order(user=self.user, total_price=Decimal('10.00'), status='delivered',
+                  shipping_address='x', phone='1')
+            for _ in range(3)
+        ])
+        Order.objects.update(created_at=old)
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        series = daily_orders(90)
+        self.assertEqual(len(series), 90)
+        self.assertIn((timezone.localdate(old), 3, Decimal('30.00')), series)
+        self.assertEqual(sum(orders for day, orders, revenue in daily_orders(30)), 0)
+
+    def customer_stats(self):
+        return CustomerStats.objects.filter(user=self.user).values_list(
+            'username', 'order_count', 'lifetime_spend', 'last_order_at').get()
+
+    def test_customer_stats_follow_orders(self):
+        self.assertEqual(self.customer_stats(), ('buyer@example.com', 0, Decimal('0'), None))
+        first, second = self.buy(1), self.buy(2)
+        self.assertEqual(self.customer_stats(), ('buyer@example.com', 2, Decimal('300.00'), second.created_at))
+
+        # Cancelled orders drop out, and last_order_at falls back
+        second.status = 'cancelled'
+        second.save()
+        self.assertEqual(self.customer_stats()[1:], (1, Decimal('100.00'), first.created_at))
+        first.delete()
+        self.assertEqual(self.customer_stats()[1:], (0, Decimal('0'), None))
+
+        self.user.email = 'New@Example.com'
+        self.user.save()
+        self.assertEqual(CustomerStats.objects.get(user=self.user).email, 'new@example.com')
+        live = list(CustomerStats.objects.values_list())
+        rebuild_customer_stats()
+        self.assertEqual(list(CustomerStats.objects.values_list()), live)
+
+
+class InventoryAlertTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer@example.com', password='pw')
+        self.cart = Cart.objects.create(user=self.user)
+        category = Category.objects.create(name='Running')
+        self.shoe = Product.objects.create(name='Shoe', category=category, price=Decimal('100.00'),
+                                           stock=12, reorder_threshold=10)
+        self.alerts = []
+        low_stock_reached.connect(self.record, sender=Product)
+        self.addCleanup(low_stock_reached.disconnect, self.record, sender=Product)
+
+    def record(self, sender, products, **kwargs):
+        self.alerts.append([product.id for product in products])
+
+    def buy(self, quantity):
+        add_cart_item(self.cart, self.shoe, quantity)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, '1 Main St', '555')
+
+    @override_settings(INVENTORY_ALERT_EMAILS=['stock@example.com'])
+    def test_checkout_crossing_alerts_once(self):
+        self.buy(2)
+        self.assertEqual(self.alerts, [])
+        with self.assertLogs('shop.inventory', 'WARNING') as logs:
+            self.buy(1)
+        self.assertEqual(logs.output, [
+            f'WARNING:shop.inventory:Low stock: Shoe (#{self.shoe.id}): 9 left, reorder at 10',
+        ])
+        self.assertEqual(self.alerts, [[self.shoe.id]])
+        self.assertEqual(list(low_stock_products()), [self.shoe])
+        # Still low: no second alert
+        self.buy(1)
+        self.assertEqual(len(self.alerts), 1)
+        self.assertEqual(OutboundEmail.objects.get().to, 'stock@example.com')
+
+        # Restocking from the admin clears the flag; the next crossing alerts again
+        self.shoe.refresh_from_db()
+        self.shoe.stock = 20
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shoe.save()
+        self.assertFalse(low_stock_products().exists())
+        self.shoe.reorder_threshold = 25
+        with self.assertLogs('shop.inventory', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            self.shoe.save(update_fields=['reorder_threshold'])
+        self.assertEqual(len(self.alerts), 2)
+
+    def test_dashboard_pages_low_stock_products(self):
+        low = Product.objects.bulk_create([
+            Product(name=f'Low {i}', category=self.shoe.category, price=Decimal('10.00'), stock=i % 4)
+            for i in range(25)
+        ])
+        stock_changed(Product.objects.all())
+        staff = make_shopper('staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+        seen = []
+        url = reverse('admin_dashboard')
+        while True:
+            page = self.client.get(url).context['low_stock_products']
+            seen.extend((product.stock, product.id) for product in page)
+            if not page.has_next:
+                break
+            url = reverse('admin_dashboard') + f'?low_after={page.next_cursor}'
+        self.assertEqual(seen, sorted((product.stock, product.id) for product in low))
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', THROTTLE_RULES={},
+                   ALLOWED_HOSTS=['localhost'])
+class LoadTestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers = seed_shop(scale=1, users=2, orders=2)
+        cls.catalog = {
+            'products': list(Product.objects.filter(is_active=True).values_list('id', flat=True)),
+            'categories': list(Category.objects.values_list('id', flat=True)),
+        }
+
+    def test_journeys_complete_including_otp_login(self):
+        recorder = Recorder()
+        shopper = Shopper(self.customers[0].username, self.catalog, recorder, {}, random.Random(1))
+        orders = Order.objects.count()
+        shopper.browse()
+        shopper.buy()
+        shopper.otp_buy()
+        self.assertEqual(Order.objects.count(), orders + 2)
+        self.assertEqual(dict(recorder.errors), {})
+        self.assertEqual(len(recorder.latencies['checkout']), 4)
+        self.assertEqual(len(recorder.latencies['verify_otp']), 2)
+
+    def test_summary_and_baseline_comparison(self):
+        recorder = Recorder()
+        for ms in range(1, 101):
+            recorder.add('home', ms, ok=ms != 100)
+        result = summarize(recorder, seconds=10)
+        self.assertEqual(result['urls']['home']['rps'], 10.0)
+        self.assertEqual(result['urls']['home']['error_rate'], 0.01)
+        self.assertEqual(result['total']['p95_ms'], 95)
+        self.assertEqual(compare(result, result, tolerance=0.1), [])
+
+        slower = Recorder()
+        for ms in range(1, 101):
+            slower.add('home', ms * 2, ok=True)
+        regressions = compare(summarize(slower, seconds=20), result, tolerance=0.1)
+        self.assertEqual({(name, metric) for name, metric, *values in regressions}, {
+            ('total', 'rps'), ('total', 'p50_ms'), ('total', 'p95_ms'),
+            ('home', 'rps'), ('home', 'p50_ms'), ('home', 'p95_ms'),
+        })
+
+    def test_percentile_is_nearest_rank(self):
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 90), 5)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media))
+        self.category = Category.objects.create(name='Running')
+
+    def upload(self, name='shoe.png', size=(1200, 800)):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_missing_renditions_are_rendered_outside_requests(self):
+        product = Product.objects.create(name='Racer', category=self.category, price=Decimal('10.00'),
+                                         image=self.upload())
+        self.assertEqual(Product.objects.get(pk=product.pk).image_renditions, {})
+        response = self.client.get(reverse('product_detail', args=[product.id]))
+        self.assertContains(response, f'src="{product.image.url}"')
+
+        call_command('rebuild_product_images', missing=True, workers=1, stdout=StringIO())
+        product = Product.objects.select_related('category').get(pk=product.pk)
+        renditions = product.image_renditions
+        self.assertEqual(set(renditions), {'thumb', 'card', 'detail'})
+        self.assertEqual((renditions['card']['width'], renditions['card']['height']), (480, 320))
+        self.assertEqual(renditions['detail']['width'], 1000)
+        for entry in renditions.values():
+            self.assertRegex(entry['webp'], r'^products/renditions/shoe-\w+\.[0-9a-f]{12}\.webp$')
+            self.assertTrue(default_storage.exists(entry['webp']))
+
+        # Saving without touching the image keeps the renditions: previous
+        # state lookup, UPDATE, cart totals and search index
+        with self.assertNumQueries(4):
+            product.name = 'Racer II'
+            product.save()
+
+        cache.clear()
+        response = self.client.get(reverse('product_detail', args=[product.id]))
+        self.assertContains(response, 'srcset="/media/products/renditions/shoe-thumb.')
+        self.assertContains(response, 'width="1000" height="667"')
+
+        # A new image drops the old renditions until the next rebuild
+        product.image = self.upload('boot.png')
+        product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).image_renditions, {})
+
+    def test_rebuild_command_renders_existing_images(self):
+        product = Product.objects.create(name='Racer', category=self.category, price=Decimal('10.00'),
+                                         image=self.upload(size=(300, 200)))
+        Product.objects.filter(pk=product.pk).update(image_renditions={})
+        out = StringIO()
+        call_command('rebuild_product_images', workers=2, stdout=out)
+        self.assertIn('Rendered 1 images for 1 products', out.getvalue())
+        renditions = Product.objects.get(pk=product.pk).image_renditions
+        # Never upscaled past the original
+        self.assertEqual(renditions['detail']['width'], 300)
+        self.assertEqual(renditions['thumb']['width'], 160)
+
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.category = Category.objects.create(name='Running')
+
+    def write(self, name, text):
+        path = f'{self.tmpdir}/{name}'
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def import_catalog(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_creates_and_updates_on_sku(self):
+        Product.objects.create(sku='R-1', name='Old racer', category=self.category, price=Decimal('50.00'))
+        path = self.write('catalog.csv', (
+            'sku,name,category,price,stock,description\n'
+            'R-1,Racer,Running,60.00,5,Light trainer\n'
+            'T-1,Trail blazer,Trail,80,3,\n'
+            ',No sku,Running,10,1,\n'
+            'T-2,Bad price,Trail,cheap,1,\n'
+        ))
+        out, err = self.import_catalog(path, batch_size=2)
+        self.assertIn('1 created, 1 updated, 2 rejected', out)
+        self.assertIn('line 4: missing sku', err)
+        self.assertIn("line 5: invalid price 'cheap'", err)
+
+        racer = Product.objects.get(sku='R-1')
+        self.assertEqual((racer.name, racer.price, racer.stock), ('Racer', Decimal('60.00'), 5))
+        trail = Product.objects.get(sku='T-1')
+        self.assertEqual((trail.category.name, trail.price, trail.description), ('Trail', Decimal('80.00'), None))
+        # Bulk writes skip the signals, so the importer indexes itself
+        self.assertEqual(search_product_ids('blazer'), [trail.id])
+
+    def test_partial_jsonl_rows_refresh_price_and_stock(self):
+        product = Product.objects.create(sku='R-1', name='Racer', category=self.category,
+                                         price=Decimal('50.00'), stock=10)
+        cart = Cart.objects.create(user=User.objects.create_user(username='buyer@example.com'))
+        add_cart_item(cart, product, 2)
+        path = self.write('refresh.jsonl', (
+            '{"sku": "R-1", "price": "45.50", "stock": 7}\n'
+            '{"sku": "NOPE", "stock": 1}\n'
+            'not json\n'
+        ))
+        out, err = self.import_catalog(path)
+        self.assertIn('0 created, 1 updated, 2 rejected', out)
+        self.assertIn('line 2: unknown sku', err)
+        self.assertIn('line 3: invalid JSON', err)
+
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.price, product.stock), ('Racer', Decimal('45.50'), 7))
+        cart.refresh_from_db()
+        self.assertEqual(cart.total_price, Decimal('91.00'))
+
+    def test_images_are_copied_into_storage(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media))
+        images = f'{self.tmpdir}/images'
+        os.mkdir(images)
+        with open(f'{images}/racer.png', 'wb') as f:
+            f.write(b'not really a png')
+        path = self.write('catalog.csv', 'sku,name,category,price,image\nR-1,Racer,Running,60,racer.png\n')
+
+        out, err = self.import_catalog(path, images=images)
+        self.assertIn('rebuild_product_images --missing', out)
+        product = Product.objects.get(sku='R-1')
+        self.assertEqual((product.image.name, product.image_renditions), ('products/racer.png', {}))
+        self.assertTrue(default_storage.exists('products/racer.png'))
+
+class StaticBundleTests(TestCase):
+    def test_pages_link_shared_stylesheets_instead_of_inlining(self):
+        for url in (reverse('home'), reverse('products'), reverse('login')):
+            response = self.client.get(url)
+            self.assertNotContains(response, '<style>')
+            self.assertContains(response, 'href="/static/css/nav.css"')
+        # The login form used to sit inside an unclosed <style>
+        self.assertContains(self.client.get(reverse('login')), '<div class="auth-container">')
+
+    def test_collectstatic_writes_hashed_precompressed_bundles(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with self.settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with open(f'{root}/staticfiles.json') as manifest:
+                paths = json.load(manifest)['paths']
+            hashed = paths['css/nav.css']
+            self.assertRegex(hashed, r'^css/nav\.[0-9a-f]{12}\.css$')
+            with open(f'{root}/{hashed}', 'rb') as plain, gzip.open(f'{root}/{hashed}.gz') as packed:
+                self.assertEqual(packed.read(), plain.read())
+            # Image references in the extracted CSS point at hashed copies too
+            with open(f"{root}/{paths['css/index.css']}") as index:
+                self.assertIn(f'url("../{paths["images/hero.jpg"]}")', index.read())
+
+
+class DatabaseConfigTests(TransactionTestCase):
+    databases = {'default', 'readonly'}
+
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+
+    def test_read_only_views_read_from_readonly_connection(self):
+        category = Category.objects.create(name='Trail')
+        product = Product.objects.create(name='Trail Shoe', category=category,
+                                         price=Decimal('100.00'), stock=5)
+        with read_only():
+            self.assertEqual(Product.objects.all().db, 'readonly')
+            loaded = Product.objects.get(id=product.id)
+            self.assertEqual(loaded._state.db, 'readonly')
+            # Saves still go to the writable connection
+            loaded.stock = 4
+            with self.assertLogs('shop.inventory', 'WARNING'):
+                loaded.save()
+            with transaction.atomic():
+                # Inside a transaction reads see its own writes
+                self.assertEqual(Product.objects.all().db, 'default')
+        self.assertEqual(Product.objects.all().db, 'default')
+        self.assertEqual(Product.objects.get(id=product.id).stock, 4)
+
+    def test_readonly_connection_refuses_writes(self):
+        with self.assertRaises(OperationalError):
+            with connections['readonly'].cursor() as cursor:
+                cursor.execute("INSERT INTO main_category (name) VALUES ('x')")
+
+    def test_catalog_view_uses_readonly_connection(self):
+        cache.clear()
+        Category.objects.create(name='Trail')
+        with CaptureQueriesContext(connections['readonly']) as queries:
+            self.assertEqual(self.client.get(reverse('products')).status_code, 200)
+        self.assertTrue(queries.captured_queries)
+
+
+class FileServerTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.css = b'body { color: red; }\n' * 200
+        with open(f'{self.root}/site.0123456789ab.css', 'wb') as f:
+            f.write(self.css)
+        with open(f'{self.root}/site.0123456789ab.css.gz', 'wb') as f:
+            f.write(gzip.compress(self.css))
+        with open(f'{self.root}/photo.jpg', 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        self.app = ServeFilesWSGI(self.fallback, [FileIndex(self.root, '/static/', hash_contents=True).scan()])
+
+    def fallback(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'django']
+
+    def get(self, path, **headers):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path}
+        setup_testing_defaults(environ)
+        environ.update({f'HTTP_{name.upper()}': value for name, value in headers.items()})
+        response = {}
+
+        def start_response(status, response_headers):
+            response['status'] = int(status.split()[0])
+            response['headers'] = dict(response_headers)
+
+        body = b''.join(self.app(environ, start_response))
+        return response['status'], response['headers'], body
+
+    def test_hashed_file_is_immutable_and_revalidates(self):
+        status, headers, body = self.get('/static/site.0123456789ab.css')
+        self.assertEqual((status, body), (200, self.css))
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        status, headers, body = self.get('/static/site.0123456789ab.css', if_none_match=headers['ETag'])
+        self.assertEqual((status, body), (304, b''))
+
+    def test_precompressed_variant_chosen_by_accept_encoding(self):
+        status, headers, body = self.get('/static/site.0123456789ab.css', accept_encoding='br, gzip')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), self.css)
+        self.assertEqual(int(headers['Content-Length']), len(body))
+
+    def test_byte_ranges(self):
+        status, headers, body = self.get('/static/photo.jpg', range='bytes=10-19')
+        self.assertEqual((status, body), (206, bytes(range(10, 20))))
+        self.assertEqual(headers['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(self.get('/static/photo.jpg', range='bytes=-4')[2], bytes(range(252, 256)))
+        self.assertEqual(self.get('/static/photo.jpg', range='bytes=2048-')[0], 416)
+        # A stale If-Range sends the whole file
+        self.assertEqual(self.get('/static/photo.jpg', range='bytes=0-1', if_range='"old"')[0], 200)
+
+    def test_unknown_and_escaping_paths_fall_through(self):
+        for path in ('/static/missing.css', '/static/../settings.py', '/static/%2e%2e/x', '/other/photo.jpg'):
+            self.assertEqual(self.get(path)[2], b'django', path)
+
+    def test_asgi_streams_range(self):
+        app = ServeFilesASGI(None, [FileIndex(self.root, '/static/').scan()])
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/static/photo.jpg',
+                 'headers': [(b'range', b'bytes=1000-')]}
+        asyncio.run(app(scope, None, send))
+        self.assertEqual(messages[0]['status'], 206)
+        self.assertEqual(b''.join(m.get('body', b'') for m in messages[1:]), bytes(range(232, 256)))
@@ -0,0 +1,111 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+
+# Request throttling
+#
+# THROTTLE_RULES maps a URL name to a list of (key, limit, window) rules:
+# at most ``limit`` requests per ``window`` seconds for each value of
+# ``key``. Keys:
+#
+#   'ip'        the client address (THROTTLE_IP_HEADER names a header set
+#               by a trusted proxy; REMOTE_ADDR otherwise)
+#   'account'   the email posted to login, else the session's logged-in
+#               user or the user with a pending OTP
+#
+# Only unsafe methods (POST etc.) are throttled. ThrottleMiddleware checks
+# the rules before the view runs, so a rejected request costs a few cache
+# operations: no ORM query and no password hash.
+#
+# Each key uses a sliding-window counter: two fixed-window counts in the
+# cache (this window and the previous one), with the previous count
+# weighted by how much of it still overlaps the sliding window. That's
+# O(1) memory per key and smooths the burst a plain fixed window allows at
+# window boundaries. Rejected requests are not counted.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+
+def client_ip(request):
+    header = getattr(settings, 'THROTTLE_IP_HEADER', None)
+    if header and request.META.get(header):
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def account_id(request):
+    email = request.POST.get('email')
+    if email:
+        return email.strip().lower()
+    session = getattr(request, 'session', None)
+    if session is not None:
+        user_id = session.get(SESSION_KEY) or session.get('login_user_id')
+        if user_id:
+            return f'user:{user_id}'
+    return None
+
+
+KEY_FUNCTIONS = {
+    'ip': client_ip,
+    'account': account_id,
+}
+
+
+def _digest(value):
+    # Fixed-length, cache-safe keys whatever the client sent
+    return hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+
+
+def hit(scope, limit, window, now=None):
+    """Count a request against ``scope``.
+
+    Returns 0 when allowed, otherwise the seconds to wait before retrying.
+    """
+    now = time.time() if now is None else now
+    current = int(now // window)
+    elapsed = now - current * window
+    current_key = f'throttle:{scope}:{current}'
+    previous_key = f'throttle:{scope}:{current - 1}'
+    cache = _cache()
+    counts = cache.get_many([previous_key, current_key])
+    previous = counts.get(previous_key, 0)
+    count = counts.get(current_key, 0)
+    overlap = 1 - elapsed / window
+    if previous * overlap + count + 1 > limit:
+        if count + 1 > limit or not previous:
+            wait = window - elapsed
+        else:
+            # When the previous window's weight has decayed enough
+            wait = window * (1 - (limit - count - 1) / previous) - elapsed
+        return max(1, math.ceil(round(wait, 6)))
+    try:
+        cache.incr(current_key)
+    except ValueError:
+        # Lives through the next window, where it is the previous count
+        if not cache.add(current_key, 1, 2 * window):
+            cache.incr(current_key)
+    return 0
+
+
+def check_request(request, url_name):
+    """Seconds until the request may be retried, or 0 when it is allowed"""
+    if request.method in SAFE_METHODS:
+        return 0
+    rules = getattr(settings, 'THROTTLE_RULES', {}).get(url_name)
+    if not rules:
+        return 0
+    for key, limit, window in rules:
+        value = KEY_FUNCTIONS[key](request)
+        if value is None:
+            continue
+        wait = hit(f'{url_name}:{key}:{_digest(value)}', limit, window)
+        if wait:
+            return wait
+    return 0
@@ -1,44 +1,146 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.http import require_http_methods
 from .models import Product, Category, Cart, CartItem, Order, OrderItem
+from .db import read_only_view
+from .cache import cached_categories, cached_listing_stamp, cached_product, catalog_key
+from .conditional import conditional_page
+from .pagination import InvalidCursor, KeysetPage
+from .recommendations import related_products
+from .search import search_products
+from .services import (
+    add_cart_item, remove_cart_item, set_cart_item_quantity,
+    place_order, EmptyCart, InsufficientStock, InvalidQuantity,
+)
 
 # Home view - show featured products
+@read_only_view
 def home(request):
     featured_products = Product.objects.filter(is_active=True)[:8]
     context = {
-        'products': featured_products
+        'products': featured_products,
+        'catalog_key': catalog_key('products'),
     }
     return render(request, 'index.html', context)
 
 # Products listing view
-def products(request):
-    category = request.GET.get('category')
+PRODUCT_SORTS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+}
+PRODUCTS_PER_PAGE = 24
+
+
+def _listed_products(category, categories):
+    """Active products under the ``category`` filter, the selected
+    Category (if any) and the catalog cache scope of the listing"""
     products = Product.objects.filter(is_active=True)
+    if not category:
+        return products, None, 'products'
+    # Filter by category id; names are still accepted for old links
+    selected_category = next(
+        (c for c in categories if str(c.id) == category or c.name == category), None
+    )
+    if selected_category is None:
+        return products.none(), None, 'categories'
+    return (products.filter(category_id=selected_category.id), selected_category,
+            f'category:{selected_category.id}')
+
+
+def listing_validators(request):
+    products, selected_category, scope = _listed_products(request.GET.get('category', ''),
+                                                          cached_categories())
+    version = catalog_key('categories', scope)
+    stamp = cached_listing_stamp(version, products)
+    return stamp['modified'], (stamp['count'], version)
+
+
+def _listing_context(request, categories, keys=None):
+    """Context for products.html. The page is fetched lazily, inside the
+    cached fragment, so a fragment hit costs no listing queries.
+
+    ``keys`` is the listing's (catalog_key, cached stamp), when the caller
+    has already read them.
+    """
+    category = request.GET.get('category', '')
+    sort = request.GET.get('sort', 'newest')
+    if sort not in PRODUCT_SORTS:
+        sort = 'newest'
+    products, selected_category, scope = _listed_products(category, categories)
+    products = products.select_related('category')
     
-    if category:
-        products = products.filter(category__name=category)
+    if keys is None:
+        version = catalog_key('categories', scope)
+        # Counted by listing_validators moments ago
+        keys = version, cached_listing_stamp(version)
+    version, stamp = keys
+    total = stamp['count'] if stamp else None
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    try:
+        page = KeysetPage(products, PRODUCT_SORTS[sort], after=after, before=before,
+                          per_page=PRODUCTS_PER_PAGE, total=total)
+    except InvalidCursor:
+        after = before = None
+        page = KeysetPage(products, PRODUCT_SORTS[sort], per_page=PRODUCTS_PER_PAGE, total=total)
     
-    categories = Category.objects.all()
-    context = {
-        'products': products,
+    return {
+        'page': page,
         'categories': categories,
-        'selected_category': category
+        'selected_category': selected_category,
+        'category_param': selected_category.id if selected_category else category,
+        'sort': sort,
+        'sort_choices': [('newest', 'Newest'), ('price_low', 'Price: Low to High'),
+                         ('price_high', 'Price: High to Low')],
+        'catalog_key': version,
+        'cursor_key': f'a{after}' if after else (f'b{before}' if before else ''),
     }
+
+
+@read_only_view
+@conditional_page(listing_validators)
+def products(request):
+    context = _listing_context(request, cached_categories())
     return render(request, 'products.html', context)
 
+# Product search view
+SEARCH_RESULTS = 48
+
+@read_only_view
+def search(request):
+    search_query = request.GET.get('q', '').strip()
+    results = search_products(search_query, limit=SEARCH_RESULTS) if search_query else []
+    context = {
+        'results': results,
+        'search_query': search_query,
+    }
+    return render(request, 'search.html', context)
+
 # Product detail view
+def product_validators(request, product_id):
+    product = cached_product(product_id)
+    if product is None:
+        return None
+    # The category name and the related products section
+    return product.updated_at, (catalog_key('categories', 'products', 'recommendations'),)
+
+
+@read_only_view
+@conditional_page(product_validators)
 def product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id, is_active=True)
-    related_products = Product.objects.filter(
-        category=product.category, 
-        is_active=True
-    ).exclude(id=product_id)[:4]
-    
+    product = cached_product(product_id)
+    if product is None:
+        raise Http404('No Product matches the given query.')
     context = {
         'product': product,
-        'related_products': related_products
+        # Only evaluated when the related fragment isn't cached
+        'related_products': SimpleLazyObject(lambda: related_products(product)),
+        'related_key': catalog_key('products', 'recommendations'),
     }
     return render(request, 'product_detail.html', context)
 
@@ -63,24 +165,33 @@ def get_or_create_cart(request):
     return cart
 
 
+def _posted_quantity(request, minimum=1):
+    """The form's quantity as an int of at least ``minimum``; None (with an
+    error message queued) when it isn't one"""
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except (TypeError, ValueError):
+        quantity = None
+    if quantity is None or quantity < minimum:
+        messages.error(request, f'Please enter a quantity of {minimum} or more.')
+        return None
+    return quantity
+
+
 @login_required(login_url='/login/')
 @require_http_methods(["POST"])
 def add_to_cart(request, product_id):
     """Add product to cart"""
     product = get_object_or_404(Product, id=product_id, is_active=True)
+    quantity = _posted_quantity(request)
+    if quantity is None:
+        return redirect('view_cart')
     cart = get_or_create_cart(request)
     
-    quantity = int(request.POST.get('quantity', 1))
-    
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        defaults={'quantity': quantity}
-    )
-    
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.save()
+    try:
+        add_cart_item(cart, product, quantity)
+    except InsufficientStock as e:
+        messages.error(request, str(e))
     
     return redirect('view_cart')
 
@@ -91,8 +202,8 @@ def view_cart(request):
     cart = get_or_create_cart(request)
     context = {
         'cart': cart,
-        'cart_items': cart.items.all(),
-        'total_price': cart.get_total_price()
+        'cart_items': cart.items.select_related('product'),
+        'total_price': cart.total_price
     }
     return render(request, 'cart.html', context)
 
@@ -101,23 +212,24 @@ def view_cart(request):
 @require_http_methods(["POST"])
 def remove_from_cart(request, item_id):
     """Remove item from cart"""
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-    cart_item.delete()
+    cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id, cart__user=request.user)
+    remove_cart_item(cart_item)
     return redirect('view_cart')
 
 
 @login_required(login_url='/login/')
 @require_http_methods(["POST"])
 def update_cart_item(request, item_id):
-    """Update cart item quantity"""
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-    quantity = int(request.POST.get('quantity', 1))
+    """Update cart item quantity (0 removes the item)"""
+    cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id, cart__user=request.user)
+    quantity = _posted_quantity(request, minimum=0)
+    if quantity is None:
+        return redirect('view_cart')
     
-    if quantity > 0:
-        cart_item.quantity = quantity
-        cart_item.save()
-    else:
-        cart_item.delete()
+    try:
+        set_cart_item_quantity(cart_item, quantity)
+    except InsufficientStock as e:
+        messages.error(request, str(e))
     
     return redirect('view_cart')
 
@@ -127,56 +239,46 @@ def checkout(request):
     """Checkout page"""
     cart = get_or_create_cart(request)
     
-    if not cart.items.exists():
+    if not cart.total_items:
         return redirect('view_cart')
     
     if request.method == 'POST':
         shipping_address = request.POST.get('shipping_address')
         phone = request.POST.get('phone')
         
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            total_price=cart.get_total_price(),
-            shipping_address=shipping_address,
-            phone=phone,
-            status='pending'
-        )
-        
-        # Create order items from cart
-        for cart_item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                price=cart_item.product.price
-            )
-            
-            # Reduce product stock
-            cart_item.product.stock -= cart_item.quantity
-            cart_item.product.save()
-        
-        # Clear cart
-        cart.items.all().delete()
+        try:
+            order = place_order(request.user, shipping_address, phone)
+        except EmptyCart:
+            return redirect('view_cart')
+        except (InsufficientStock, InvalidQuantity) as e:
+            messages.error(request, str(e))
+            return redirect('view_cart')
         
         return redirect('order_confirmation', order_id=order.id)
     
     context = {
         'cart': cart,
-        'cart_items': cart.items.all(),
-        'total_price': cart.get_total_price(),
+        'cart_items': cart.items.select_related('product'),
+        'total_price': cart.total_price,
         'user_phone': request.user.profile.phone if hasattr(request.user, 'profile') else ''
     }
     return render(request, 'checkout.html', context)
 
 
+def order_validators(request, order_id):
+    modified = Order.objects.filter(id=order_id, user=request.user).values_list(
+        'updated_at', flat=True).first()
+    return (modified, ()) if modified else None
+
+
 @login_required(login_url='/login/')
+@conditional_page(order_validators)
 def order_confirmation(request, order_id):
     """Order confirmation page"""
     order = get_object_or_404(Order, id=order_id, user=request.user)
     context = {
         'order': order,
-        'order_items': order.items.all()
+        'order_items': order.items.select_related('product')
     }
     return render(request, 'order_confirmation.html', context)
 
@@ -184,7 +286,9 @@ def order_confirmation(request, order_id):
 @login_required(login_url='/login/')
 def my_orders(request):
     """View user's orders"""
-    orders = Order.objects.filter(user=request.user)
+    orders = Order.objects.filter(user=request.user).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
     context = {
         'orders': orders
     }
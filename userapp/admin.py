@@ -1,8 +1,16 @@
 from django.contrib import admin
-from .models import UserProfile
+from .models import UserProfile, OutboundEmail
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'phone', 'created_at']
     search_fields = ['user__username', 'phone']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['to', 'subject']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
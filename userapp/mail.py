@@ -0,0 +1,105 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+# Retry delay doubles after each failed attempt: 30s, 1m, 2m, 4m, 8m
+RETRY_BASE_DELAY = timedelta(seconds=30)
+# How long a claimed message is hidden from other workers
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def queue_email(subject, body, to, from_email=None):
+    """Queue a plain-text email for the mail worker instead of sending inline"""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=','.join(to),
+    )
+
+
+def claim_due_emails(batch_size):
+    """Lease up to batch_size due messages to this worker.
+
+    Claiming pushes next_attempt_at forward by CLAIM_LEASE, so a worker
+    that dies mid-batch simply lets the messages become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids).update(
+            next_attempt_at=now + CLAIM_LEASE,
+            attempts=F('attempts') + 1,
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def send_batch(batch_size=50):
+    """Send one batch of due messages over a single SMTP connection.
+
+    Returns (sent, failed) counts. Failures are rescheduled with
+    exponential backoff until MAX_ATTEMPTS, then marked failed.
+    """
+    outbox = claim_due_emails(batch_size)
+    if not outbox:
+        return 0, 0
+
+    sent_ids = []
+    failed_ids = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for queued in outbox:
+            message = EmailMessage(
+                subject=queued.subject,
+                body=queued.body,
+                from_email=queued.from_email,
+                to=queued.to.split(','),
+                connection=connection,
+            )
+            try:
+                message.send(fail_silently=False)
+                sent_ids.append(queued.id)
+            except Exception as e:
+                failed_ids.append(queued.id)
+                logger.warning('Email %s failed (attempt %s): %s', queued.id, queued.attempts, e)
+                _reschedule(queued, e)
+    except Exception as e:
+        # Could not reach the mail server at all: retry everything unsent
+        logger.exception('Mail connection failed')
+        for queued in outbox:
+            if queued.id not in sent_ids and queued.id not in failed_ids:
+                failed_ids.append(queued.id)
+                _reschedule(queued, e)
+    finally:
+        connection.close()
+
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(status='sent', sent_at=timezone.now(), last_error='')
+    return len(sent_ids), len(failed_ids)
+
+
+def _reschedule(queued, error):
+    if queued.attempts >= MAX_ATTEMPTS:
+        OutboundEmail.objects.filter(id=queued.id).update(status='failed', last_error=str(error))
+    else:
+        delay = RETRY_BASE_DELAY * (2 ** (queued.attempts - 1))
+        OutboundEmail.objects.filter(id=queued.id).update(
+            next_attempt_at=timezone.now() + delay, last_error=str(error)
+        )
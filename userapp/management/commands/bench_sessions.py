@@ -0,0 +1,82 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.bench import isolated_database, percentile
+from main.testing import TEST_PASSWORD, make_shopper
+from userapp.models import UserProfile
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'shop': 'userapp.sessions',
+}
+# Session cost is what's measured, not password hashing
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class Command(BaseCommand):
+    help = 'Measure session reads/writes per request across OTP logins for each session engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Logins per engine')
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Logged-in page views after each login')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent logins')
+
+    def handle(self, *args, **options):
+        logging.getLogger('shop.perf').disabled = True
+        rows = []
+        with isolated_database(), override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            for name, engine in ENGINES.items():
+                users = [make_shopper(f'{name}{i}@bench.local') for i in range(options['users'])]
+                with override_settings(SESSION_ENGINE=engine):
+                    rows.append((name, *self.count_queries(users[0], options['pages']),
+                                 *self.run(users[1:], options)))
+
+        self.stdout.write(f"{'engine':<11}{'requests':>9}{'session q':>11}{'total q':>9}"
+                          f"{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, requests, session_queries, total_queries, rate, p50, p95 in rows:
+            self.stdout.write(f'{name:<11}{requests:>9}{session_queries:>11}{total_queries:>9}'
+                              f'{rate:>10.1f}{p50:>9.1f}{p95:>9.1f}')
+        self.stdout.write('Query counts are for one login journey: login, OTP check, '
+                          f'{options["pages"]} page views and logout.')
+
+    def journey(self, user, pages):
+        client = Client(HTTP_HOST='localhost')
+        client.post(reverse('login'), {'email': user.username, 'password': TEST_PASSWORD})
+        otp = UserProfile.objects.filter(user=user).values_list('otp', flat=True).get()
+        client.get(reverse('verify_otp'))
+        response = client.post(reverse('verify_otp'), {'otp': otp})
+        assert response.status_code == 302 and response.url == reverse('home'), response
+        for _ in range(pages):
+            client.get(reverse('view_cart'))
+        client.get(reverse('logout'))
+        return 4 + pages
+
+    def count_queries(self, user, pages):
+        with CaptureQueriesContext(connection) as queries:
+            requests = self.journey(user, pages)
+        session_queries = sum('django_session' in query['sql'] for query in queries.captured_queries)
+        return requests, session_queries, len(queries)
+
+    def run(self, users, options):
+        def timed(user):
+            try:
+                began = time.perf_counter()
+                self.journey(user, options['pages'])
+                return (time.perf_counter() - began) * 1000
+            finally:
+                connections.close_all()
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            latencies = list(pool.map(timed, users))
+        elapsed = time.perf_counter() - began
+        return len(users) / elapsed, percentile(latencies, 50), percentile(latencies, 95)
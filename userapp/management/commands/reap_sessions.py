@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from userapp.sessions import REAP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches, once or periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REAP_BATCH_SIZE,
+                            help='Rows deleted per statement')
+        parser.add_argument('--interval', type=float, default=3600.0,
+                            help='Seconds between sweeps')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single sweep and exit')
+
+    def handle(self, *args, **options):
+        store = import_string(settings.SESSION_ENGINE + '.SessionStore')
+        while True:
+            close_old_connections()
+            removed = store.clear_expired(batch_size=options['batch_size'])
+            self.stdout.write(f'Removed {removed} expired sessions')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
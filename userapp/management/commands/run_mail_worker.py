@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from userapp.mail import send_batch
+
+
+class Command(BaseCommand):
+    help = 'Drain the outbound email queue, reusing one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Messages sent per SMTP connection')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no messages are due instead of polling')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            close_old_connections()
+            sent, failed = send_batch(batch_size)
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,128 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+# Session engine (SESSION_ENGINE = 'userapp.sessions')
+#
+# Like Django's cached_db engine, except:
+#
+#   - sessions without a logged-in user (OTP login state, anonymous
+#     messages) live in the cache only; they are cheap to lose, and the
+#     login flow no longer writes and then deletes django_session rows
+#   - a session is written through to the database once it holds a user,
+#     so logins survive cache eviction and restarts
+#   - saves are skipped when the data is unchanged since it was loaded
+#   - clear_expired() (used by clearsessions and reap_sessions) deletes
+#     expired rows in batches instead of one long-running DELETE
+#
+# With more than one server process, SHOP_CACHE must be a shared cache
+# (file or redis) or pre-login state is lost between processes.
+REAP_BATCH_SIZE = 1000
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'shop.session.'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # Whether this key has a database row, and the serialized data as
+        # last loaded or saved (None: never loaded)
+        self._in_db = False
+        self._saved_state = None
+
+    def _state(self, data):
+        return self.serializer().dumps(data)
+
+    def _get_session_from_db(self):
+        s = super()._get_session_from_db()
+        self._in_db = s is not None
+        return s
+
+    async def _aget_session_from_db(self):
+        s = await super()._aget_session_from_db()
+        self._in_db = s is not None
+        return s
+
+    def _loaded(self, data):
+        if self._in_db is None:
+            # Came from the cache: only sessions with a user are in the DB
+            self._in_db = SESSION_KEY in data
+        self._saved_state = self._state(data)
+        return data
+
+    def load(self):
+        self._in_db = None
+        return self._loaded(super().load())
+
+    async def aload(self):
+        self._in_db = None
+        return self._loaded(await super().aload())
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        state = self._state(data)
+        if not must_create and state == self._saved_state:
+            return
+        if SESSION_KEY in data or self._in_db:
+            try:
+                # First save with a user inserts the row
+                super().save(must_create=must_create or not self._in_db)
+            except CreateError:
+                if must_create:
+                    raise
+                raise UpdateError
+            self._in_db = True
+        else:
+            timeout = self.get_expiry_age()
+            if must_create:
+                if not self._cache.add(self.cache_key, data, timeout):
+                    raise CreateError
+            else:
+                self._cache.set(self.cache_key, data, timeout)
+        self._saved_state = state
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create)
+
+    def exists(self, session_key):
+        # Only asked for freshly generated keys; a clash with a row that
+        # isn't cached still fails the INSERT with CreateError
+        return bool(session_key) and (self.cache_key_prefix + session_key) in self._cache
+
+    def _delete_key(self, session_key, in_db):
+        self._cache.delete(self.cache_key_prefix + session_key)
+        if in_db:
+            self.get_model_class().objects.filter(session_key=session_key).delete()
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._delete_key(session_key, session_key != self.session_key or self._in_db)
+
+    def cycle_key(self):
+        data = self._session
+        key, in_db = self.session_key, self._in_db
+        self._in_db = False
+        self.create()
+        self._session_cache = data
+        if key:
+            self._delete_key(key, in_db)
+
+    @classmethod
+    def clear_expired(cls, batch_size=REAP_BATCH_SIZE):
+        """Delete expired rows in batches; returns how many were removed"""
+        model = cls.get_model_class()
+        expired = model.objects.filter(expire_date__lt=timezone.now())
+        removed = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:batch_size])
+            if keys:
+                removed += model.objects.filter(session_key__in=keys).delete()[0]
+            if len(keys) < batch_size:
+                return removed
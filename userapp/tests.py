@@ -1,3 +1,138 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from main.testing import TEST_PASSWORD, QueryBudgetTestCase, make_shopper, seed_shop
+
+from .mail import MAX_ATTEMPTS, queue_email, send_batch
+from .models import OutboundEmail
+from .sessions import SessionStore
+
+
+class AuthQueryBudgetTests(QueryBudgetTestCase):
+    query_budgets = {
+        # POST: includes the customer directory row
+        'register': 5,
+        'login': 5,
+        'verify_otp': 7,
+        'logout': 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_shop(scale=10, users=1000, orders=0)
+        cls.user = make_shopper('otp@example.com')
+
+    def test_register(self):
+        self.request_within_budget('register', reverse('register'))
+        response = self.request_within_budget('register', reverse('register'), method='post', data={
+            'email': 'new@example.com', 'name': 'New', 'phone': '123',
+            'password': 'x-strong-pass-1', 'confirm_password': 'x-strong-pass-1',
+        })
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(to='new@example.com').count(), 1)
+
+    def test_otp_login_flow(self):
+        self.request_within_budget('login', reverse('login'))
+        response = self.request_within_budget('login', reverse('login'), method='post', data={
+            'email': self.user.username, 'password': TEST_PASSWORD,
+        })
+        self.assertRedirects(response, reverse('verify_otp'), fetch_redirect_response=False)
+
+        self.user.profile.refresh_from_db()
+        self.request_within_budget('verify_otp', reverse('verify_otp'))
+        response = self.request_within_budget('verify_otp', reverse('verify_otp'), method='post',
+                                              data={'otp': self.user.profile.otp})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+        self.request_within_budget('logout', reverse('logout'))
+
+
+class MailQueueTests(TestCase):
+    def test_worker_sends_queued_mail_over_one_connection(self):
+        for i in range(3):
+            queue_email('Hello', 'Body', [f'user{i}@example.com'])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as opened:
+            call_command('run_mail_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 3)
+
+    def test_failures_back_off_then_give_up(self):
+        queued = queue_email('Hello', 'Body', ['user@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=OSError('relay down')), self.assertLogs('userapp.mail', 'WARNING'):
+            self.assertEqual(send_batch(), (0, 1))
+            queued.refresh_from_db()
+            self.assertEqual(queued.status, 'pending')
+            self.assertGreater(queued.next_attempt_at, timezone.now())
+            # Not due yet, so nothing is claimed
+            self.assertEqual(send_batch(), (0, 0))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                OutboundEmail.objects.filter(id=queued.id).update(
+                    next_attempt_at=timezone.now() - timedelta(seconds=1))
+                send_batch()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+        self.assertEqual(queued.attempts, MAX_ATTEMPTS)
+        self.assertEqual(queued.last_error, 'relay down')
+
+
+class SessionEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_shopper('session@example.com')
+
+    def test_otp_state_stays_out_of_the_database(self):
+        self.client.post(reverse('login'), {'email': self.user.username, 'password': TEST_PASSWORD})
+        self.assertIn('login_user_id', self.client.session)
+        self.assertFalse(Session.objects.exists())
+
+        self.user.profile.refresh_from_db()
+        self.client.post(reverse('verify_otp'), {'otp': self.user.profile.otp})
+        session = Session.objects.get()
+        self.assertEqual(session.get_decoded()['_auth_user_id'], str(self.user.id))
+        self.assertNotIn('login_user_id', session.get_decoded())
+
+        # Survives losing the cache
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('view_cart')).status_code, 200)
+
+        self.client.get(reverse('logout'))
+        self.assertFalse(Session.objects.exists())
+
+    def test_unchanged_session_is_not_saved(self):
+        self.client.force_login(self.user)
+        store = SessionStore(self.client.session.session_key)
+        store.load()
+        with self.assertNumQueries(0):
+            store.modified = True
+            store.save()
+        store['cart_hint'] = 1
+        store.save()
+        self.assertEqual(Session.objects.get().get_decoded()['cart_hint'], 1)
 
-# Create your tests here.
+    def test_clear_expired_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+             for i in range(5)]
+            + [Session(session_key='fresh', session_data='', expire_date=now + timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command('reap_sessions', '--once', '--batch-size', '2', stdout=out)
+        self.assertIn('Removed 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['fresh'])
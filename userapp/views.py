@@ -2,12 +2,10 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.core.mail import send_mail, EmailMessage, get_connection
-import logging
-from django.conf import settings
 from datetime import datetime, timedelta
 from django.utils import timezone
 from .models import UserProfile
+from .mail import queue_email
 
 # Registration View
 def register(request):
@@ -39,7 +37,7 @@ def register(request):
         # Create user profile
         UserProfile.objects.create(user=user, phone=phone)
         
-        # Send welcome email
+        # Queue the welcome email; the mail worker sends it
         subject = 'Welcome to Nexus Store!'
         welcome_message = f'''
 Hi {name},
@@ -77,16 +75,8 @@ Best regards,
 Nexus Store Team
         '''
         
-        try:
-            # Use explicit connection for clearer errors
-            conn = get_connection(backend=settings.EMAIL_BACKEND, username=settings.EMAIL_HOST_USER, password=settings.EMAIL_HOST_PASSWORD)
-            email_msg = EmailMessage(subject=subject, body=welcome_message, from_email=settings.DEFAULT_FROM_EMAIL, to=[email], connection=conn)
-            email_msg.content_subtype = 'plain'
-            email_msg.send(fail_silently=False)
-            messages.success(request, 'Account created successfully! Welcome email sent. Please login.')
-        except Exception as e:
-            logging.exception('Welcome email send failed')
-            messages.success(request, 'Account created successfully! (Note: Welcome email could not be sent)')
+        queue_email(subject, welcome_message, [email])
+        messages.success(request, "Account created successfully! We'll email you a welcome message shortly. Please login.")
         
         return redirect('login')
     
@@ -127,20 +117,12 @@ Best regards,
 Nexus Store Team
                 '''
                 
-                try:
-                    conn = get_connection(backend=settings.EMAIL_BACKEND, username=settings.EMAIL_HOST_USER, password=settings.EMAIL_HOST_PASSWORD)
-                    email_msg = EmailMessage(subject=subject, body=message, from_email=settings.DEFAULT_FROM_EMAIL, to=[email], connection=conn)
-                    email_msg.content_subtype = 'plain'
-                    email_msg.send(fail_silently=False)
-                    # Store user ID in session for OTP verification
-                    request.session['login_user_id'] = user.id
-                    request.session['login_email'] = email
-                    messages.success(request, 'OTP sent to your email! Please verify.')
-                    return redirect('verify_otp')
-                except Exception as e:
-                    logging.exception('OTP send failed')
-                    messages.error(request, f'Error sending OTP: {str(e)}')
-                    return redirect('login')
+                queue_email(subject, message, [email])
+                # Store user ID in session for OTP verification
+                request.session['login_user_id'] = user.id
+                request.session['login_email'] = email
+                messages.success(request, 'OTP sent to your email! Please verify.')
+                return redirect('verify_otp')
             else:
                 messages.error(request, 'Invalid email or password!')
                 return redirect('login')